@@ -0,0 +1,882 @@
+# benchmark fakes
+#
+# In-process stand-ins for GCS, Vision, Gemini, Elasticsearch, Firestore and BigQuery,
+# registered with services.clients.install() so the real services and routes run
+# unchanged. Every fake sleeps according to a LatencyProfile and can fail a share of
+# its calls with the error the real client raises.
+
+import base64
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+class LatencyProfile:
+    """
+    Latency and error model for one backend. A call costs base_ms plus per_unit_ms for
+    each unit of work (MiB, pages, 1k prompt tokens, documents), scaled by a normally
+    distributed jitter factor; error_rate of the calls fail.
+    """
+
+    def __init__(self, base_ms: float = 0, per_unit_ms: float = 0, jitter: float = 0.1, error_rate: float = 0,
+                 scale: float = 1, seed: int = None):
+        self.base_ms = base_ms
+        self.per_unit_ms = per_unit_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.scale = scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def delay(self, units: float = 1) -> float:
+        """Seconds one call with units of work takes."""
+        with self._lock:
+            factor = max(0.0, self._rng.gauss(1, self.jitter)) if self.jitter else 1.0
+        return (self.base_ms + self.per_unit_ms * units) * factor * self.scale / 1000
+
+    def fails(self) -> bool:
+        with self._lock:
+            self.calls += 1
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    def apply(self, units: float = 1, error=None):
+        """Sleeps for one call, then raises error() if the call is chosen to fail."""
+        time.sleep(self.delay(units))
+        if self.fails() and error is not None:
+            raise error()
+
+    def to_dict(self) -> dict:
+        return {"base_ms": self.base_ms, "per_unit_ms": self.per_unit_ms, "jitter": self.jitter,
+                "error_rate": self.error_rate, "scale": self.scale}
+
+
+def _unavailable(service: str):
+    from google.api_core import exceptions
+
+    return lambda: exceptions.ServiceUnavailable(f"{service} unavailable (injected)")
+
+
+# --- Cloud Storage ---------------------------------------------------------------------
+
+
+class _StoredData:
+    def __init__(self, data: bytes, content_type: str):
+        self.data = data
+        self.content_type = content_type
+        self.md5_hash = base64.b64encode(hashlib.md5(data).digest()).decode()
+        self.crc32c = None
+        self.size = len(data)
+
+
+class FakeBlob:
+    """The subset of google.cloud.storage.Blob the services use."""
+
+    def __init__(self, bucket, name: str, stored: _StoredData = None):
+        self.bucket = bucket
+        self.name = name
+        self.metadata = None
+        self._set(stored)
+
+    def _set(self, stored: _StoredData):
+        self.content_type = stored.content_type if stored else None
+        self.md5_hash = stored.md5_hash if stored else None
+        self.crc32c = stored.crc32c if stored else None
+        self.size = stored.size if stored else None
+
+    def _stored(self) -> _StoredData:
+        stored = self.bucket._objects.get(self.name)
+        if stored is None:
+            from google.api_core import exceptions
+            raise exceptions.NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        return stored
+
+    def exists(self) -> bool:
+        self.bucket.profile.apply(0, _unavailable("GCS"))
+        return self.name in self.bucket._objects
+
+    def download_as_bytes(self, start: int = None, end: int = None) -> bytes:
+        stored = self._stored()
+        data = stored.data[start or 0:None if end is None else end + 1]
+        self.bucket.profile.apply(len(data) / 2 ** 20, _unavailable("GCS"))
+        return data
+
+    def download_as_text(self, encoding: str = "utf-8") -> str:
+        return self.download_as_bytes().decode(encoding)
+
+    def upload_from_string(self, data, content_type: str = "text/plain"):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bucket.profile.apply(len(data) / 2 ** 20, _unavailable("GCS"))
+        stored = _StoredData(data, content_type)
+        with self.bucket._lock:
+            self.bucket._objects[self.name] = stored
+        self._set(stored)
+
+    def open(self, mode: str = "rb", chunk_size: int = None):
+        return io.BytesIO(self.download_as_bytes())
+
+
+class FakeBucket:
+    def __init__(self, name: str, profile: LatencyProfile):
+        self.name = name
+        self.profile = profile
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def put(self, path: str, data: bytes, content_type: str):
+        """Seeds an object without latency or errors (corpus setup)."""
+        with self._lock:
+            self._objects[path] = _StoredData(data, content_type)
+
+    def read(self, path: str) -> bytes:
+        """Object bytes without latency, for the other fakes reading gs:// URIs."""
+        return self._objects[path].data
+
+    def blob(self, path: str) -> FakeBlob:
+        return FakeBlob(self, path)
+
+    def get_blob(self, path: str):
+        self.profile.apply(0, _unavailable("GCS"))
+        stored = self._objects.get(path)
+        return FakeBlob(self, path, stored) if stored is not None else None
+
+    def list_blobs(self, prefix: str = ""):
+        self.profile.apply(0, _unavailable("GCS"))
+        with self._lock:
+            items = sorted((name, stored) for name, stored in self._objects.items() if name.startswith(prefix))
+        return iter([FakeBlob(self, name, stored) for name, stored in items])
+
+    def delete_blobs(self, blobs: list):
+        self.profile.apply(0, _unavailable("GCS"))
+        with self._lock:
+            for blob in blobs:
+                self._objects.pop(blob.name, None)
+
+
+class _ClosableSession:
+    def close(self):
+        pass
+
+
+class FakeStorageClient:
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self._buckets = {}
+        self._http = _ClosableSession()
+
+    def bucket(self, name: str) -> FakeBucket:
+        if name not in self._buckets:
+            self._buckets[name] = FakeBucket(name, self.profile)
+        return self._buckets[name]
+
+
+# --- Synthetic documents ---------------------------------------------------------------
+
+_SYLLABLES = ["ka", "lo", "mer", "tis", "an", "dro", "pel", "su", "vin", "gra", "ol", "te", "nu", "bar", "qui", "zen"]
+
+
+def vocabulary(size: int = 2000, seed: int = 7) -> list:
+    """Deterministic pseudo-words; search benchmarks draw their queries from the same list."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def page_text(rng: random.Random, words: list, chars: int = 1800) -> str:
+    """One page of OCR-like text, Zipf-ish word frequencies, paragraphs of a few lines."""
+    lines, line, length = [], [], 0
+    while length < chars:
+        word = words[min(int(rng.paretovariate(1.1)) - 1, len(words) - 1)] if rng.random() < 0.7 else rng.choice(words)
+        line.append(word)
+        length += len(word) + 1
+        if sum(len(w) + 1 for w in line) > 80:
+            lines.append(" ".join(line))
+            line = []
+            if rng.random() < 0.15:
+                lines.append("")
+    if line:
+        lines.append(" ".join(line))
+    return "\n".join(lines)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_pdf(pages: list) -> bytes:
+    """A minimal but valid PDF with one text page per entry of pages."""
+    count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(count))}] /Count {count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        lines = " ".join(f"({_pdf_escape(line)}) Tj T*" for line in text.split("\n"))
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {lines} ET".encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode())
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return output.getvalue()
+
+
+_STREAM_RE = re.compile(rb"stream\n(.*?)\nendstream", re.S)
+_TEXT_RE = re.compile(rb"\(((?:\\.|[^\\)])*)\) Tj")
+
+
+def pdf_pages(data: bytes) -> list:
+    """Page texts of a PDF written by synthetic_pdf (what a real OCR would read)."""
+    pages = []
+    for stream in _STREAM_RE.findall(data):
+        lines = [re.sub(rb"\\(.)", rb"\1", line).decode("latin-1") for line in _TEXT_RE.findall(stream)]
+        pages.append("\n".join(lines))
+    return pages
+
+
+def image_text(content: bytes, words: list, count: int = 250) -> str:
+    """Stable pseudo-OCR text for an image, seeded by its bytes."""
+    rng = random.Random(zlib.crc32(content))
+    return page_text(rng, words, chars=count * 7)
+
+
+# --- Vision ----------------------------------------------------------------------------
+
+
+def _gcs_path(uri: str) -> tuple:
+    bucket, _, path = uri[len("gs://"):].partition("/")
+    return bucket, path
+
+
+class _FakeOperation:
+    """Long-running async_batch_annotate_files operation writing output shards to GCS."""
+
+    def __init__(self, target):
+        self._error = None
+        self._done = threading.Event()
+
+        def run():
+            try:
+                target()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._done.set()
+
+        threading.Thread(target=run, name="fake-vision-operation", daemon=True).start()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def result(self, timeout: float = None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Operation did not finish in time")
+        if self._error is not None:
+            raise self._error
+        return None
+
+
+class _ClosableTransport:
+    def close(self):
+        pass
+
+
+class FakeVisionClient:
+    """
+    ImageAnnotatorClient stand-in. PDFs are "read" from the fake bucket (see
+    synthetic_pdf); images get stable pseudo-text. One unit of latency is one page.
+    """
+
+    def __init__(self, storage: FakeStorageClient, profile: LatencyProfile, words: list):
+        self.storage = storage
+        self.profile = profile
+        self.words = words
+        self.transport = _ClosableTransport()
+        self._parsed = {}
+
+    def _file_pages(self, uri: str) -> list:
+        # Parsed once per file, so shard requests of long PDFs do not cost the harness CPU
+        bucket, path = _gcs_path(uri)
+        data = self.storage.bucket(bucket).read(path)
+        cached = self._parsed.get(uri)
+        if cached is None or cached[0] is not data:
+            cached = self._parsed[uri] = (data, pdf_pages(data))
+        return cached[1]
+
+    def batch_annotate_files(self, requests: list):
+        from google.cloud import vision
+
+        responses = []
+        for request in requests:
+            texts = self._file_pages(request.input_config.gcs_source.uri)
+            pages = list(request.pages) or list(range(1, min(5, len(texts)) + 1))
+            self.profile.apply(len(pages), _unavailable("Vision"))
+            responses.append(vision.AnnotateFileResponse(
+                responses=[
+                    vision.AnnotateImageResponse(full_text_annotation=vision.TextAnnotation(text=texts[page - 1]))
+                    for page in pages if page <= len(texts)
+                ],
+                total_pages=len(texts),
+            ))
+        return vision.BatchAnnotateFilesResponse(responses=responses)
+
+    def async_batch_annotate_files(self, requests: list):
+        def run():
+            for request in requests:
+                texts = self._file_pages(request.input_config.gcs_source.uri)
+                bucket, prefix = _gcs_path(request.output_config.gcs_destination.uri)
+                batch_size = request.output_config.batch_size or 20
+                for first in range(0, len(texts), batch_size):
+                    shard = texts[first:first + batch_size]
+                    self.profile.apply(len(shard), _unavailable("Vision"))
+                    body = {"responses": [{"fullTextAnnotation": {"text": text}} for text in shard]}
+                    self.storage.bucket(bucket).put(
+                        f"{prefix}output-{first + 1}-to-{first + len(shard)}.json",
+                        json.dumps(body).encode(), "application/json",
+                    )
+
+        return _FakeOperation(run)
+
+    def _detect(self, content: bytes):
+        from google.cloud import vision
+
+        self.profile.apply(1, _unavailable("Vision"))
+        text = image_text(content, self.words)
+        return vision.AnnotateImageResponse(text_annotations=[vision.EntityAnnotation(description=text)])
+
+    def text_detection(self, image=None, **kwargs):
+        return self._detect(image.content)
+
+    def batch_annotate_images(self, requests: list):
+        from google.cloud import vision
+
+        responses = []
+        for request in requests:
+            bucket, path = _gcs_path(request.image.source.image_uri)
+            responses.append(self._detect(self.storage.bucket(bucket).read(path)))
+        return vision.BatchAnnotateImagesResponse(responses=responses)
+
+
+# --- Gemini ----------------------------------------------------------------------------
+
+
+class _GeneratedText:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    GenerativeModel stand-in. The "summary" is a sample of the prompt's words, so
+    summaries stay searchable. One unit of latency is 1k prompt tokens.
+    """
+
+    def __init__(self, profile: LatencyProfile, summary_words: int = 120, stream_chunks: int = 8):
+        self.profile = profile
+        self.summary_words = summary_words
+        self.stream_chunks = stream_chunks
+
+    def _summary(self, prompt: str) -> str:
+        words = prompt.split()
+        rng = random.Random(zlib.crc32(prompt.encode()))
+        return " ".join(rng.choice(words) for _ in range(min(self.summary_words, len(words))))
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        from google.api_core import exceptions
+
+        delay = self.profile.delay(len(prompt) / 4000)
+        error = lambda: exceptions.ResourceExhausted("Gemini quota exceeded (injected)")  # noqa: E731
+        text = self._summary(prompt)
+        if not stream:
+            time.sleep(delay)
+            if self.profile.fails():
+                raise error()
+            return _GeneratedText(text)
+
+        def chunks():
+            words = text.split(" ")
+            step = max(1, len(words) // self.stream_chunks)
+            for start in range(0, len(words), step):
+                time.sleep(delay / self.stream_chunks)
+                yield _GeneratedText(" ".join(words[start:start + step]) + " ")
+
+        if self.profile.fails():
+            time.sleep(delay)
+            raise error()
+        return chunks()
+
+
+# --- Elasticsearch ---------------------------------------------------------------------
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SCORED_FIELDS = {"title": 3.0, "summary": 2.0, "content": 1.0}
+
+
+class FakeCluster:
+    """
+    In-memory Elasticsearch behind the real client (see es_node_classes). Implements
+    the endpoints the services call: index and alias management, _bulk, _search with
+    filters, search_after, point in time, highlighting and the completion suggester,
+    and _doc gets. Scoring is a simple weighted term count, not BM25.
+    """
+
+    def __init__(self):
+        self.indices = {}
+        self.aliases = {}
+        self.pits = {}
+        self._lock = threading.RLock()
+
+    # Index and alias resolution
+
+    def _resolve(self, names: str) -> list:
+        resolved = []
+        for name in names.split(","):
+            if name in self.indices:
+                resolved.append((name, None))
+            for index, alias in self.aliases.get(name, {}).items():
+                resolved.append((index, alias.get("filter")))
+        return resolved
+
+    def _alias_view(self, index: str) -> dict:
+        return {name: body for name, targets in self.aliases.items() for target, body in targets.items() if target == index}
+
+    # Request dispatch
+
+    def handle(self, method: str, target: str, body: bytes) -> tuple:
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        payload = None
+        if body and not parts[-1:] == ["_bulk"]:
+            payload = json.loads(body)
+
+        with self._lock:
+            if parts[-1:] == ["_bulk"]:
+                return self._bulk(body, parts[0] if len(parts) == 2 else None)
+            if parts == ["_aliases"]:
+                return self._update_aliases(payload)
+            if parts[:1] == ["_alias"]:
+                found = {index: {"aliases": {parts[1]: body}} for index, body in self.aliases.get(parts[1], {}).items()}
+                return (200, found) if found else (404, {"error": "alias missing", "status": 404})
+            if len(parts) == 2 and parts[1] == "_alias":
+                return 200, {index: {"aliases": self._alias_view(index)} for index, _ in self._resolve(parts[0])}
+            if parts[-1:] == ["_search"]:
+                return self._search(parts[0] if len(parts) == 2 else None, payload or {})
+            if parts[-1:] == ["_pit"]:
+                if method == "DELETE":
+                    self.pits.pop(payload.get("id"), None)
+                    return 200, {"succeeded": True, "num_freed": 1}
+                pit_id = f"pit-{len(self.pits) + 1}-{time.monotonic_ns()}"
+                self.pits[pit_id] = parts[0]
+                return 200, {"id": pit_id}
+            if len(parts) == 3 and parts[1] == "_doc":
+                return self._get(parts[0], parts[2], params)
+            if parts == ["_reindex"]:
+                return self._reindex(payload)
+            if len(parts) == 2 and parts[1] == "_refresh":
+                return 200, {"_shards": {"failed": 0}}
+            if len(parts) == 1:
+                return self._index_admin(method, parts[0], payload)
+        return 400, {"error": {"type": "illegal_argument_exception", "reason": f"Unsupported: {method} {target}"}, "status": 400}
+
+    def _index_admin(self, method: str, name: str, payload: dict) -> tuple:
+        if method == "HEAD":
+            return (200, None) if name in self.indices else (404, None)
+        if method == "PUT":
+            if name in self.indices:
+                return 400, {"error": {"type": "resource_already_exists_exception"}, "status": 400}
+            self.indices[name] = {"docs": {}, "terms": {}, "settings": payload}
+            return 200, {"acknowledged": True, "index": name}
+        if method == "DELETE":
+            self.indices.pop(name, None)
+            return 200, {"acknowledged": True}
+        return 400, {"error": f"Unsupported {method} on index", "status": 400}
+
+    def _update_aliases(self, payload: dict) -> tuple:
+        for action in payload["actions"]:
+            (kind, spec), = action.items()
+            if kind == "add":
+                body = {key: value for key, value in spec.items() if key not in ("index", "alias")}
+                self.aliases.setdefault(spec["alias"], {})[spec["index"]] = body
+            elif kind == "remove":
+                self.aliases.get(spec["alias"], {}).pop(spec["index"], None)
+            elif kind == "remove_index":
+                self.indices.pop(spec["index"], None)
+        return 200, {"acknowledged": True}
+
+    # Documents
+
+    def _store(self, index: str, doc_id: str, source: dict):
+        terms = {
+            field: Counter(word.lower() for word in _WORD_RE.findall(source.get(field) or ""))
+            for field in _SCORED_FIELDS
+        }
+        created = doc_id not in self.indices[index]["docs"]
+        self.indices[index]["docs"][doc_id] = source
+        self.indices[index]["terms"][doc_id] = terms
+        return created
+
+    def _bulk(self, body: bytes, default_index: str) -> tuple:
+        lines = [line for line in body.split(b"\n") if line.strip()]
+        items, errors, position = [], False, 0
+        while position < len(lines):
+            (op, meta), = json.loads(lines[position]).items()
+            position += 1
+            targets = self._resolve(meta.get("_index") or default_index)
+            index = targets[0][0] if targets else None
+            if op == "delete":
+                removed = index is not None and self.indices[index]["docs"].pop(meta["_id"], None) is not None
+                items.append({op: {"_index": index, "_id": meta["_id"], "status": 200 if removed else 404}})
+                continue
+            source = json.loads(lines[position])
+            position += 1
+            if index is None:
+                errors = True
+                items.append({op: {"_id": meta.get("_id"), "status": 404, "error": {"type": "index_not_found_exception"}}})
+                continue
+            if op == "update":
+                source = {**self.indices[index]["docs"].get(meta["_id"], {}), **source.get("doc", {})}
+            created = self._store(index, meta["_id"], source)
+            items.append({op: {"_index": index, "_id": meta["_id"], "status": 201 if created else 200,
+                               "result": "created" if created else "updated"}})
+        return 200, {"took": 1, "errors": errors, "items": items}
+
+    def _get(self, name: str, doc_id: str, params: dict) -> tuple:
+        for index, _ in self._resolve(name):
+            source = self.indices[index]["docs"].get(doc_id)
+            if source is not None:
+                includes = params.get("_source_includes")
+                if includes:
+                    source = {key: value for key, value in source.items() if key in includes.split(",")}
+                return 200, {"_index": index, "_id": doc_id, "found": True, "_source": source}
+        return 404, {"_index": name, "_id": doc_id, "found": False}
+
+    def _reindex(self, payload: dict) -> tuple:
+        source, dest = self._resolve(payload["source"]["index"]), payload["dest"]["index"]
+        created = 0
+        for index, _ in source:
+            for doc_id, document in list(self.indices[index]["docs"].items()):
+                created += self._store(dest, doc_id, dict(document))
+        return 200, {"created": created, "updated": 0, "failures": []}
+
+    # Search
+
+    @staticmethod
+    def _query_text(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in ("multi_match", "match") and isinstance(value, dict):
+                    return value.get("query")
+                found = FakeCluster._query_text(value)
+                if found:
+                    return found
+        elif isinstance(node, list):
+            for item in node:
+                found = FakeCluster._query_text(item)
+                if found:
+                    return found
+        return None
+
+    @staticmethod
+    def _matches(document: dict, clauses: list) -> bool:
+        for clause in clauses:
+            (kind, spec), = clause.items()
+            (field, value), = spec.items()
+            if kind == "term" and document.get(field) != value:
+                return False
+            if kind == "range":
+                actual = document.get(field) or ""
+                # Date-only upper bounds include the whole day, like a date field does
+                if "gte" in value and actual < value["gte"]:
+                    return False
+                if "lte" in value and actual > value["lte"] + ("\uffff" if len(value["lte"]) == 10 else ""):
+                    return False
+        return True
+
+    @staticmethod
+    def _highlight(text: str, terms: list, fragment_size: int, fallback: bool) -> list:
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in terms if lowered.find(term) >= 0]
+        if not positions:
+            return [text[:fragment_size]] if fallback and text else []
+        start = max(0, min(positions) - fragment_size // 4)
+        fragment = text[start:start + fragment_size]
+        for term in terms:
+            fragment = re.sub(rf"\b({re.escape(term)}\w*)", r"<em>\1</em>", fragment, flags=re.I)
+        return [fragment]
+
+    def _search(self, name: str, body: dict) -> tuple:
+        for spec in body.get("suggest", {}).values():
+            # title_suggest has a context mapping, and Elasticsearch rejects completion queries without one
+            if "contexts" not in spec.get("completion", {}):
+                reason = "Missing mandatory contexts in context query"
+                return 400, {"error": {"type": "illegal_argument_exception", "reason": reason}, "status": 400}
+
+        pit = body.get("pit")
+        if pit is not None:
+            name = self.pits.get(pit["id"])
+            if name is None:
+                return 404, {"error": {"type": "search_context_missing_exception"}, "status": 404}
+
+        targets = self._resolve(name)
+        query = self._query_text(body.get("query")) or ""
+        terms = [word.lower() for word in _WORD_RE.findall(query)]
+        filters = body.get("query", {}).get("bool", {}).get("filter", [])
+        size = body.get("size", 10)
+        fields = body.get("_source", True)
+
+        hits = []
+        for index, alias_filter in targets:
+            docs, postings = self.indices[index]["docs"], self.indices[index]["terms"]
+            for doc_id, document in docs.items():
+                clauses = filters + ([alias_filter] if alias_filter else [])
+                if not self._matches(document, clauses) or not terms or size == 0:
+                    continue
+                score = 0.0
+                for term in terms:
+                    term_score = sum(
+                        weight * count
+                        for field, weight in _SCORED_FIELDS.items()
+                        for word, count in postings[doc_id][field].items() if word.startswith(term)
+                    )
+                    if not term_score:
+                        break
+                    score += 1 + term_score ** 0.5
+                else:
+                    hits.append((round(score, 4), document["unique_id"], index, doc_id, document))
+
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        after = body.get("search_after")
+        if after:
+            hits = [hit for hit in hits if (-hit[0], hit[1]) > (-after[0], after[1])]
+
+        highlight = body.get("highlight", {}).get("fields", {})
+        response_hits = []
+        for score, unique_id, index, doc_id, document in hits[:size]:
+            hit = {
+                "_index": index,
+                "_id": doc_id,
+                "_score": score,
+                "_source": {key: value for key, value in document.items() if fields is True or key in fields},
+                "sort": [score, unique_id],
+            }
+            fragments = {
+                field: self._highlight(document.get(field) or "", terms, spec.get("fragment_size", 100), "no_match_size" in spec)
+                for field, spec in highlight.items()
+            }
+            hit["highlight"] = {field: found for field, found in fragments.items() if found}
+            response_hits.append(hit)
+
+        response = {"took": 1, "timed_out": False, "hits": {"hits": response_hits}}
+        if pit is not None:
+            response["pit_id"] = pit["id"]
+        for suggest_name, spec in body.get("suggest", {}).items():
+            response.setdefault("suggest", {})[suggest_name] = [self._complete(targets, spec)]
+        return 200, response
+
+    def _complete(self, targets: list, spec: dict) -> dict:
+        prefix = spec["prefix"]
+        completion = spec.get("completion", {})
+        users = completion.get("contexts", {}).get("user_id")
+        options, seen = [], set()
+        for index, _ in targets:
+            for document in self.indices[index]["docs"].values():
+                title = (document.get("title") or "")
+                if not title.lower().startswith(prefix) or (users and document.get("user_id") not in users):
+                    continue
+                if completion.get("skip_duplicates") and title in seen:
+                    continue
+                seen.add(title)
+                options.append({"text": title, "_score": 1.0, "_source": document})
+        return {"text": prefix, "offset": 0, "length": len(prefix), "options": options[:completion.get("size", 5)]}
+
+
+def _es_units(method: str, target: str, body: bytes) -> float:
+    # Bulk requests cost per document, everything else per request
+    if body and "_bulk" in target:
+        return body.count(b"\n") / 2
+    return 1
+
+
+def es_node_classes(cluster: FakeCluster, profile: LatencyProfile) -> tuple:
+    """
+    (sync, async) elastic_transport node classes serving requests from cluster, for
+    Elasticsearch(..., node_class=...). The real client, serializers and bulk helpers
+    run unchanged on top of them.
+    """
+    from elastic_transport import ApiResponseMeta, BaseAsyncNode, BaseNode, HttpHeaders
+    from elastic_transport._node import NodeApiResponse
+
+    def respond(node, method, target, body, delay):
+        start = time.perf_counter()
+        if profile.fails():
+            status, payload = (429 if "_bulk" in target else 503), {
+                "error": {"type": "es_rejected_execution_exception", "reason": "injected"}, "status": 503,
+            }
+        else:
+            status, payload = cluster.handle(method, target, body)
+        headers = HttpHeaders({"x-elastic-product": "Elasticsearch", "content-type": "application/json"})
+        data = b"" if method == "HEAD" or payload is None else json.dumps(payload).encode()
+        meta = ApiResponseMeta(
+            status=status, http_version="1.1", headers=headers,
+            duration=delay + time.perf_counter() - start, node=node.config,
+        )
+        return NodeApiResponse(meta, data)
+
+    class FakeNode(BaseNode):
+        _CLIENT_META_HTTP_CLIENT = ("fk", "1")
+
+        def perform_request(self, method, target, body=None, headers=None, request_timeout=None):
+            delay = profile.delay(_es_units(method, target, body))
+            time.sleep(delay)
+            return respond(self, method, target, body, delay)
+
+        def close(self):
+            pass
+
+    class FakeAsyncNode(BaseAsyncNode):
+        _CLIENT_META_HTTP_CLIENT = ("fk", "1")
+
+        async def perform_request(self, method, target, body=None, headers=None, request_timeout=None):
+            import asyncio
+
+            delay = profile.delay(_es_units(method, target, body))
+            await asyncio.sleep(delay)
+            return respond(self, method, target, body, delay)
+
+        async def close(self):
+            pass
+
+    return FakeNode, FakeAsyncNode
+
+
+# --- Firestore and BigQuery ------------------------------------------------------------
+
+
+class _FakeReference:
+    def __init__(self, path: str):
+        self.path = path
+
+    def collection(self, name: str):
+        return _FakeReference(f"{self.path}/{name}".strip("/"))
+
+    def document(self, name: str):
+        return _FakeReference(f"{self.path}/{name}")
+
+
+class _FakeBulkWriter:
+    def __init__(self, db):
+        self.db = db
+        self._writes = []
+
+    def on_write_error(self, callback):
+        pass
+
+    def update(self, reference, data: dict):
+        self._writes.append((reference.path, data))
+
+    def close(self):
+        if self._writes:
+            self.db.profile.apply(len(self._writes) / 500)
+        with self.db._lock:
+            for path, data in self._writes:
+                self.db.documents.setdefault(path, {}).update(data)
+        self._writes = []
+
+
+class FakeFirestore:
+    """Firestore client stand-in for the status writer's bulk updates."""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str):
+        return _FakeReference(name)
+
+    def bulk_writer(self, options=None):
+        return _FakeBulkWriter(self)
+
+
+class FakeBigQuery:
+    """BigQuery client stand-in for streaming activity inserts."""
+
+    def __init__(self, profile: LatencyProfile, project: str = "benchmark"):
+        self.profile = profile
+        self.project = project
+        self.rows = 0
+
+    def insert_rows_json(self, table: str, rows: list, row_ids: list = None) -> list:
+        self.profile.apply(len(rows) / 500, _unavailable("BigQuery"))
+        self.rows += len(rows)
+        return []
+
+    def close(self):
+        pass
+
+
+# --- Installation ----------------------------------------------------------------------
+
+
+def install(profiles: dict, words: list, gemini_models: list) -> dict:
+    """
+    Builds every fake and registers it with services.clients. Returns the fakes by
+    registry name; "bucket" is the FakeBucket for Config.STORAGE_BUCKET.
+
+    :param profiles: LatencyProfile per backend: gcs, vision, gemini, elasticsearch,
+                     firestore, bigquery (missing ones have no latency)
+    :param words: Vocabulary for pseudo-OCR text of images
+    :param gemini_models: Model names to register the fake Gemini model under
+    """
+    from elasticsearch import AsyncElasticsearch, Elasticsearch
+    from config import Config
+    from services import clients
+
+    profile = lambda name: profiles.get(name) or LatencyProfile()  # noqa: E731
+    storage = FakeStorageClient(profile("gcs"))
+    cluster = FakeCluster()
+    node_class, async_node_class = es_node_classes(cluster, profile("elasticsearch"))
+    fakes = {
+        "storage": storage,
+        "vision": FakeVisionClient(storage, profile("vision"), words),
+        "elasticsearch": Elasticsearch(Config.ELASTICSEARCH_URL, node_class=node_class),
+        "async_elasticsearch": AsyncElasticsearch(Config.ELASTICSEARCH_URL, node_class=async_node_class),
+        "firestore": FakeFirestore(profile("firestore")),
+        "bigquery": FakeBigQuery(profile("bigquery")),
+    }
+    gemini = FakeGenerativeModel(profile("gemini"))
+    for model in gemini_models:
+        fakes[f"gemini:{model}"] = gemini
+    for name, client in fakes.items():
+        clients.install(name, client)
+
+    fakes["bucket"] = storage.bucket(Config.STORAGE_BUCKET)
+    fakes["cluster"] = cluster
+    return fakes
@@ -0,0 +1,453 @@
+# pipeline benchmark
+#
+# End-to-end throughput and latency of document processing and search without cloud
+# credentials. GCS, Vision, Gemini, Elasticsearch, Firestore and BigQuery are replaced
+# by the in-process fakes in benchmarks/fakes.py (latency and error rates per backend
+# from a profile); everything else is the real app, served by uvicorn on a local port
+# and driven over HTTP through /api/process/stream and /api/search.
+#
+# Reports docs/sec, per-stage p50/p95/p99 (from the job stages), search latencies and
+# peak RSS. Results can be stored as a JSON baseline and later runs compared against it.
+#
+# Run with: python -m benchmarks.pipeline [--corpus smoke|mixed|large] [--profile instant|realistic|flaky]
+#               [--time-scale 0.1] [--concurrency 8] [--save-baseline | --compare]
+# Before deploy: python -m benchmarks.pipeline --profile realistic --time-scale 0.25 --compare
+#
+# Baselines live in benchmarks/baselines/<corpus>-<profile>.json. They depend on the
+# machine; re-save them (--save-baseline) when the benchmark host changes. Peak RSS
+# includes the fakes, which keep the corpus and the index in memory.
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Document mixes; images are sized in pixels, PDFs in pages
+CORPORA = {
+    "smoke": [
+        {"kind": "image", "count": 4, "size": (1600, 1200)},
+        {"kind": "pdf", "count": 6, "pages": 3},
+        {"kind": "pdf", "count": 2, "pages": 40},
+    ],
+    "mixed": [
+        {"kind": "image", "count": 16, "size": (1600, 1200)},
+        {"kind": "image", "count": 4, "size": (4000, 3000)},
+        {"kind": "pdf", "count": 20, "pages": 6},
+        {"kind": "pdf", "count": 8, "pages": 50},
+        {"kind": "pdf", "count": 2, "pages": 500},
+    ],
+    "large": [
+        {"kind": "pdf", "count": 4, "pages": 500},
+    ],
+}
+
+WARMUP_CORPUS = [
+    {"kind": "image", "count": 1, "size": (1600, 1200)},
+    {"kind": "pdf", "count": 1, "pages": 2},
+]
+
+# Per-backend latency (see fakes.LatencyProfile); units are MiB for GCS, pages for
+# Vision, 1k prompt tokens for Gemini and documents for Elasticsearch _bulk
+_REALISTIC = {
+    "gcs": {"base_ms": 35, "per_unit_ms": 20},
+    "vision": {"base_ms": 600, "per_unit_ms": 120},
+    "gemini": {"base_ms": 1200, "per_unit_ms": 150},
+    "elasticsearch": {"base_ms": 8, "per_unit_ms": 0.5},
+    "firestore": {"base_ms": 40, "per_unit_ms": 20},
+    "bigquery": {"base_ms": 80, "per_unit_ms": 40},
+}
+PROFILES = {
+    "instant": {},
+    "realistic": _REALISTIC,
+    "flaky": {
+        name: {**latency, "error_rate": 0.05 if name == "elasticsearch" else 0.02}
+        for name, latency in _REALISTIC.items()
+    },
+}
+
+# Higher is better for these; every other compared metric is a latency or size
+_THROUGHPUT_METRICS = ("documents.docs_per_sec", "documents.pages_per_sec", "search.searches_per_sec")
+
+# Settings read when config is imported; an explicit environment wins except where a
+# real backend would be contacted
+BENCHMARK_ENV = {
+    "STORAGE_BUCKET": "benchmark-bucket",
+    "GCP_PROJECT_ID": "benchmark",
+    "BIGQUERY_DATASET": "benchmark",
+    "ELASTICSEARCH_URL": "http://elasticsearch.benchmark:9200",
+    "GEMINI_API_KEY": "benchmark",
+}
+FORCED_ENV = {
+    "ANALYTICS_ROLLUP_INTERVAL": "0",  # Rollups run BigQuery queries the fake does not answer
+    "WARMUP_BACKENDS": "",
+}
+
+
+def _configure_environment(workdir: str):
+    for name, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ.update(FORCED_ENV)
+    os.environ.setdefault("SQLITE_SEARCH_PATH", os.path.join(workdir, "search.db"))
+    os.environ.setdefault("LEASE_PATH", os.path.join(workdir, "leases.db"))
+    os.environ["ACTIVITY_SPILL_PATH"] = os.path.join(workdir, "activity_spill.ndjson")
+    os.environ["ACTIVITY_DEAD_LETTER_PATH"] = os.path.join(workdir, "activity_dead_letter.ndjson")
+
+
+def percentiles(values: list) -> dict:
+    """Nearest-rank p50/p95/p99 plus max and count."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[max(0, -(-len(ordered) * p // 100) - 1)], 2)
+
+    return {"count": len(ordered), "p50": rank(50), "p95": rank(95), "p99": rank(99), "max": round(ordered[-1], 2)}
+
+
+def _peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+# --- Corpus ----------------------------------------------------------------------------
+
+
+def build_corpus(spec: list, words: list, users: int = 8, seed: int = 1, prefix: str = "bench") -> list:
+    """
+    Synthetic documents as dicts (user_id, document_id, kind, pages, content, content_type).
+    Every document has distinct bytes, so the OCR cache never short-circuits a run.
+    """
+    from benchmarks.fakes import page_text, synthetic_pdf
+
+    rng = random.Random(seed)
+    documents = []
+    photos = {}
+    for group in spec:
+        for _ in range(group["count"]):
+            number = len(documents)
+            user_id = f"{prefix}-user-{number % users}"
+            document_id = f"{prefix}-doc-{number:05d}"
+            if group["kind"] == "image":
+                size = tuple(group["size"])
+                if size not in photos:
+                    from benchmarks.image_preprocessing import synthetic_photo
+                    photos[size] = synthetic_photo(*size)
+                # Decoders stop at the JPEG end marker; the suffix only changes the hash
+                content = photos[size] + document_id.encode()
+                documents.append({"kind": "image", "pages": 1, "content": content, "content_type": "image/jpeg",
+                                  "user_id": user_id, "document_id": document_id})
+            else:
+                pages = [page_text(rng, words) for _ in range(group["pages"])]
+                documents.append({"kind": "pdf", "pages": group["pages"], "content": synthetic_pdf(pages),
+                                  "content_type": "application/pdf", "user_id": user_id, "document_id": document_id})
+    rng.shuffle(documents)
+    return documents
+
+
+# --- Server and HTTP -------------------------------------------------------------------
+
+
+class _Server:
+    """The real app under uvicorn on a free local port, in a background thread."""
+
+    def __init__(self):
+        import uvicorn
+        from main import app
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self._socket.getsockname()[1]}"
+        self._server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        # Runs the app's shutdown: waits for jobs, flushes the indexer and status writer
+        self._server.should_exit = True
+        self._thread.join()
+        self._socket.close()
+
+
+def _get_json(url: str, timeout: float = 600) -> dict:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _process(base_url: str, document: dict) -> dict:
+    """Runs one document through /api/process/stream; returns client timings and the job."""
+    query = urllib.parse.urlencode({"user_id": document["user_id"], "document_id": document["document_id"]})
+    start = time.perf_counter()
+    first_token_ms = None
+    job_id = None
+    final = None
+    with urllib.request.urlopen(f"{base_url}/api/process/stream?{query}", timeout=3600) as response:
+        for line in response:
+            if not line.startswith(b"data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "queued":
+                job_id = event["job_id"]
+            elif event["type"] == "summary" and first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            elif event["type"] in ("done", "error"):
+                final = event
+                break
+    total_ms = (time.perf_counter() - start) * 1000
+    job = _get_json(f"{base_url}/api/process/{job_id}") if job_id else {}
+    return {"document": document, "total_ms": total_ms, "first_token_ms": first_token_ms,
+            "ok": bool(final) and final["type"] == "done", "job": job}
+
+
+def _timed_get(url: str) -> tuple:
+    start = time.perf_counter()
+    try:
+        body = _get_json(url, timeout=60)
+    except Exception:
+        body = None
+    return (time.perf_counter() - start) * 1000, body
+
+
+def _search_session(base_url: str, query: str, user_id: str, document: dict) -> dict:
+    """One user's search: a results page, the next page, a hit's full text and an autocomplete."""
+    timings = {}
+    params = {"query": query, "size": 5}
+    if user_id:
+        params["user_id"] = user_id
+    timings["search"], results = _timed_get(f"{base_url}/api/search/?{urllib.parse.urlencode(params)}")
+    if results and results.get("next_cursor"):
+        params["cursor"] = results["next_cursor"]
+        timings["next_page"], _ = _timed_get(f"{base_url}/api/search/?{urllib.parse.urlencode(params)}")
+    text_query = urllib.parse.urlencode({"user_id": document["user_id"]})
+    timings["document_text"], _ = _timed_get(f"{base_url}/api/search/documents/{document['document_id']}/text?{text_query}")
+    suggest_query = urllib.parse.urlencode({"prefix": query[:3], "user_id": user_id or document["user_id"]})
+    timings["suggest"], _ = _timed_get(f"{base_url}/api/search/suggest?{suggest_query}")
+    timings["hits"] = len(results["documents"]) if results else 0
+    return timings
+
+
+# --- Run -------------------------------------------------------------------------------
+
+
+def run(corpus: str = "smoke", profile: str = "instant", time_scale: float = 1.0, concurrency: int = 8,
+        searches: int = 200, seed: int = 1) -> dict:
+    workdir = tempfile.mkdtemp(prefix="pipeline-benchmark-")
+    _configure_environment(workdir)
+
+    from benchmarks import fakes
+    from config import Config
+    from services.gcp_summarization import MODEL_NAME
+    from services.search_backend import get_search_backend
+
+    words = fakes.vocabulary()
+    profiles = {
+        name: fakes.LatencyProfile(**PROFILES[profile].get(name, {}), scale=time_scale, seed=seed + index)
+        for index, name in enumerate(_REALISTIC)
+    }
+    installed = fakes.install(profiles, words, [MODEL_NAME])
+
+    documents = build_corpus(CORPORA[corpus], words, seed=seed)
+    # One small document of each kind, processed before timing starts: pays for the
+    # image preprocessing pool, index creation and first-use imports
+    kinds = {group["kind"] for group in CORPORA[corpus]}
+    warmup = build_corpus(
+        [group for group in WARMUP_CORPUS if group["kind"] in kinds], words, users=1, seed=seed, prefix="warmup",
+    )
+    for document in warmup + documents:
+        installed["bucket"].put(
+            f"documents/{document['user_id']}/{document['document_id']}", document["content"], document["content_type"],
+        )
+    rss_before_mb = _peak_rss_mb(resource.RUSAGE_SELF)
+
+    with _Server() as server:
+        for document in warmup:
+            _process(server.url, document)
+        for latency in profiles.values():
+            latency.calls = latency.errors = 0
+
+        # Processing
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            processed = list(executor.map(lambda document: _process(server.url, document), documents))
+        processing_s = time.perf_counter() - start
+
+        # Make every indexed document visible before searching
+        get_search_backend().flush()
+
+        # Search
+        rng = random.Random(seed)
+        indexed = [item["document"] for item in processed if item["ok"]] or documents
+        sessions = [
+            (rng.choice(words[:400]), rng.choice(indexed)["user_id"] if rng.random() < 0.7 else None, rng.choice(indexed))
+            for _ in range(searches)
+        ]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            searched = list(executor.map(lambda session: _search_session(server.url, *session), sessions))
+        search_s = time.perf_counter() - start
+
+    succeeded = [item for item in processed if item["ok"]]
+    pages = sum(item["document"]["pages"] for item in succeeded)
+
+    stages = {"queue": [], "total": [item["total_ms"] for item in succeeded],
+              "first_summary_token": [item["first_token_ms"] for item in succeeded if item["first_token_ms"] is not None]}
+    for item in succeeded:
+        job = item["job"]
+        if job.get("created_at") and job.get("started_at"):
+            from datetime import datetime
+            queued = datetime.fromisoformat(job["started_at"]) - datetime.fromisoformat(job["created_at"])
+            stages["queue"].append(queued.total_seconds() * 1000)
+        for name, stage in job.get("stages", {}).items():
+            if stage.get("duration_ms") is not None:
+                stages.setdefault(name, []).append(stage["duration_ms"])
+
+    by_kind = {}
+    for item in succeeded:
+        key = item["document"]["kind"] if item["document"]["kind"] == "image" else f"pdf-{item['document']['pages']}p"
+        by_kind.setdefault(key, []).append(item["total_ms"])
+
+    search_ms = {
+        name: percentiles([session[name] for session in searched if name in session])
+        for name in ("search", "next_page", "document_text", "suggest")
+    }
+
+    return {
+        "scenario": {
+            "corpus": corpus, "profile": profile, "time_scale": time_scale, "concurrency": concurrency,
+            "searches": searches, "seed": seed, "search_backend": Config.SEARCH_BACKEND,
+            "processing_workers": Config.PROCESSING_WORKERS,
+        },
+        "environment": {
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        },
+        "documents": {
+            "count": len(documents),
+            "failed": len(processed) - len(succeeded),
+            "pages": pages,
+            "elapsed_s": round(processing_s, 2),
+            "docs_per_sec": round(len(succeeded) / processing_s, 3),
+            "pages_per_sec": round(pages / processing_s, 2),
+        },
+        "stages_ms": {name: percentiles(values) for name, values in stages.items()},
+        "document_ms_by_kind": {name: percentiles(values) for name, values in sorted(by_kind.items())},
+        "search": {
+            "sessions": len(searched),
+            "elapsed_s": round(search_s, 2),
+            "searches_per_sec": round(len(searched) / search_s, 2),
+            "mean_hits": round(statistics.mean(session["hits"] for session in searched), 2) if searched else 0,
+        },
+        "search_ms": search_ms,
+        "memory_mb": {
+            "rss_before_processing": rss_before_mb,
+            "peak_rss": _peak_rss_mb(resource.RUSAGE_SELF),
+        },
+        "backend_calls": {
+            name: {"calls": latency.calls, "errors": latency.errors} for name, latency in profiles.items()
+        },
+    }
+
+
+# --- Baselines -------------------------------------------------------------------------
+
+
+def baseline_path(corpus: str, profile: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{corpus}-{profile}.json")
+
+
+def _flatten(result: dict) -> dict:
+    """Metrics checked against a baseline, by dotted name."""
+    metrics = {name: result["documents"][name.split(".")[1]] for name in _THROUGHPUT_METRICS[:2]}
+    metrics["search.searches_per_sec"] = result["search"]["searches_per_sec"]
+    for group in ("stages_ms", "search_ms"):
+        for name, values in result[group].items():
+            if "p95" in values:
+                metrics[f"{group}.{name}.p95"] = values["p95"]
+    metrics["memory_mb.peak_rss"] = result["memory_mb"]["peak_rss"]
+    return metrics
+
+
+def compare(result: dict, baseline: dict, tolerance: float = 0.2, min_delta_ms: float = 10) -> list:
+    """
+    Regressions of result against baseline: throughput more than tolerance lower, or a
+    p95 latency / peak RSS more than tolerance higher. Latency changes under
+    min_delta_ms are ignored as noise.
+    """
+    current, previous = _flatten(result), _flatten(baseline)
+    regressions = []
+    for name, before in previous.items():
+        after = current.get(name)
+        if after is None or not before:
+            continue
+        if name in _THROUGHPUT_METRICS:
+            regressed = after < before * (1 - tolerance)
+        else:
+            regressed = after > before * (1 + tolerance) and (not name.endswith(".p95") or after - before >= min_delta_ms)
+        if regressed:
+            regressions.append({"metric": name, "baseline": before, "current": after,
+                                "change": round(after / before - 1, 3)})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline and search benchmark with local fakes")
+    parser.add_argument("--corpus", choices=sorted(CORPORA), default="smoke")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplies every fake latency")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--searches", type=int, default=200, help="Search sessions after processing")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the result as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail if the result regressed against the baseline")
+    parser.add_argument("--baseline", help="Baseline file, defaults to benchmarks/baselines/<corpus>-<profile>.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change")
+    parser.add_argument("--min-delta-ms", type=float, default=10, help="Ignore p95 changes smaller than this")
+    parser.add_argument("--output", help="Also write the result to this file")
+    args = parser.parse_args()
+
+    result = run(args.corpus, args.profile, args.time_scale, args.concurrency, args.searches, args.seed)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    path = args.baseline or baseline_path(args.corpus, args.profile)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {path}")
+    if args.compare:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # Numbers are only comparable for the same workload
+        scenario_keys = ("corpus", "profile", "time_scale", "concurrency", "searches", "seed")
+        if any(baseline["scenario"].get(key) != result["scenario"][key] for key in scenario_keys):
+            print(f"Baseline {path} was recorded with a different scenario: {baseline['scenario']}")
+            sys.exit(2)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(json.dumps({"regressions": regressions}, indent=2))
+            sys.exit(1)
+        print(f"No regressions against {path}")
@@ -8,6 +8,9 @@ load_dotenv()
 class Config:
     # Firebase
     FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS")
+    STATUS_COALESCE_WINDOW = float(os.getenv("STATUS_COALESCE_WINDOW", "0.5"))
+    STATUS_MAX_OPS_PER_SECOND = int(os.getenv("STATUS_MAX_OPS_PER_SECOND", "500"))
+    STATUS_MAX_RETRIES = int(os.getenv("STATUS_MAX_RETRIES", "10"))
     
     # GCP
     GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
@@ -17,9 +20,119 @@ class Config:
     ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL")
     ELASTICSEARCH_HOST = os.getenv("ELASTICSEARCH_HOST")
     ELASTICSEARCH_INDEX = "documents"
+    INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "500"))
+    INDEX_BATCH_BYTES = int(os.getenv("INDEX_BATCH_BYTES", str(10 * 1024 * 1024)))
+    INDEX_FLUSH_INTERVAL = float(os.getenv("INDEX_FLUSH_INTERVAL", "1"))
+    INDEX_BUFFER_MAX = int(os.getenv("INDEX_BUFFER_MAX", "5000"))
+    INDEX_MAX_RETRIES = int(os.getenv("INDEX_MAX_RETRIES", "5"))
+    INDEX_INITIAL_BACKOFF = float(os.getenv("INDEX_INITIAL_BACKOFF", "1"))
+    INDEX_MAX_BACKOFF = float(os.getenv("INDEX_MAX_BACKOFF", "60"))
+    INDEX_SPILL_PATH = os.getenv("INDEX_SPILL_PATH", "/tmp/index_spill.ndjson")
+    REINDEX_DOWNLOAD_WORKERS = int(os.getenv("REINDEX_DOWNLOAD_WORKERS", "16"))
+    ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "25"))
+    ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "10"))
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "10000"))
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "60"))
+    SEARCH_MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE", "0"))
+    SEARCH_RELATIVE_SCORE = float(os.getenv("SEARCH_RELATIVE_SCORE", "0.2"))
+    SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "elasticsearch")  # elasticsearch | sqlite | dual
+    SQLITE_SEARCH_PATH = os.getenv("SQLITE_SEARCH_PATH", "/tmp/documind_search.db")
+    SEARCH_FALLBACK_TIMEOUT = float(os.getenv("SEARCH_FALLBACK_TIMEOUT", "2"))
+    SEARCH_FALLBACK_COOLDOWN = float(os.getenv("SEARCH_FALLBACK_COOLDOWN", "30"))
+    SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+    SEARCH_PIT_KEEP_ALIVE = os.getenv("SEARCH_PIT_KEEP_ALIVE", "2m")
+    SEARCH_FRAGMENT_SIZE = int(os.getenv("SEARCH_FRAGMENT_SIZE", "160"))
+    SEARCH_FRAGMENTS = int(os.getenv("SEARCH_FRAGMENTS", "3"))
+    # Reindexing at startup blocks the worker and is not coordinated between replicas;
+    # only for single-replica deployments. Otherwise run python -m services.es_migrations
+    ES_AUTO_MIGRATE = os.getenv("ES_AUTO_MIGRATE", "false").lower() == "true"
+    ES_MIGRATION_TIMEOUT = float(os.getenv("ES_MIGRATION_TIMEOUT", "3600"))
+    # Documents are routed by user_id, so a user's searches hit one shard. Shard count
+    # and splits take effect when a new mapping version is created (es_migrations).
+    ES_NUMBER_OF_SHARDS = int(os.getenv("ES_NUMBER_OF_SHARDS", "1"))
+    # Very large tenants spread over several routing values, e.g. "user_a:4,user_b:8"
+    ES_TENANT_SPLITS = {
+        name.split(":")[0].strip(): int(name.split(":")[1])
+        for name in os.getenv("ES_TENANT_SPLITS", "").split(",") if ":" in name
+    }
+    # Maintain a filtered, routed alias per user (documents_user_<id>) for direct per-tenant access
+    ES_TENANT_ALIASES = os.getenv("ES_TENANT_ALIASES", "false").lower() == "true"
+    SUGGEST_CACHE_TTL = float(os.getenv("SUGGEST_CACHE_TTL", "300"))
+    SUGGEST_DEBOUNCE_MS = int(os.getenv("SUGGEST_DEBOUNCE_MS", "25"))
     
     # BigQuery
     BIGQUERY_DATASET = os.getenv("BIGQUERY_DATASET")
-    BIGQUERY_TABLE = os.getenv("BIGQUERY_TABLE")
+    BIGQUERY_TABLE = os.getenv("BIGQUERY_TABLE", "document_activity")
+    ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+    ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5"))
+    ACTIVITY_BUFFER_MAX = int(os.getenv("ACTIVITY_BUFFER_MAX", "10000"))
+    ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+    # Off by default: every replica would run the same rollup DML. Enable it on one
+    # instance, or schedule `python -m services.analytics --refresh` instead
+    ANALYTICS_ROLLUPS_ENABLED = os.getenv("ANALYTICS_ROLLUPS_ENABLED", "false").lower() == "true"
+    ANALYTICS_ROLLUP_INTERVAL = float(os.getenv("ANALYTICS_ROLLUP_INTERVAL", "900"))
+    ANALYTICS_ROLLUP_LOOKBACK_DAYS = int(os.getenv("ANALYTICS_ROLLUP_LOOKBACK_DAYS", "2"))
+    ANALYTICS_BACKFILL_DAYS = int(os.getenv("ANALYTICS_BACKFILL_DAYS", "365"))  # Longest range /api/analytics serves
+    ACTIVITY_SPILL_PATH = os.getenv("ACTIVITY_SPILL_PATH", "/tmp/activity_spill.ndjson")
+    ACTIVITY_DEAD_LETTER_PATH = os.getenv("ACTIVITY_DEAD_LETTER_PATH", "/tmp/activity_dead_letter.ndjson")
+    ACTIVITY_MAX_REPLAYS = int(os.getenv("ACTIVITY_MAX_REPLAYS", "5"))  # Per rejected row
 
-    GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
\ No newline at end of file
+    GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+
+    # Gemini
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+    # Client pools
+    GCS_POOL_CONNECTIONS = int(os.getenv("GCS_POOL_CONNECTIONS", "4"))
+    GCS_POOL_MAXSIZE = int(os.getenv("GCS_POOL_MAXSIZE", "32"))
+    GRPC_KEEPALIVE_MS = int(os.getenv("GRPC_KEEPALIVE_MS", "30000"))
+    GCS_STREAM_CHUNK_BYTES = int(os.getenv("GCS_STREAM_CHUNK_BYTES", str(8 * 1024 * 1024)))
+
+    # Comma-separated backends to build in the lifespan hook, e.g. "storage,vision"
+    WARMUP_BACKENDS = [name.strip() for name in os.getenv("WARMUP_BACKENDS", "").split(",") if name.strip()]
+
+    # Processing
+    PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", "4"))
+    PROCESSING_QUEUE_SIZE = int(os.getenv("PROCESSING_QUEUE_SIZE", "100"))
+    JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "1000"))
+    SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+    # Cross-replica de-duplication of document processing: "" (off) or "sqlite"
+    LEASE_BACKEND = os.getenv("LEASE_BACKEND", "")
+    LEASE_PATH = os.getenv("LEASE_PATH", "/tmp/documind_leases.db")
+    LEASE_TTL = float(os.getenv("LEASE_TTL", "120"))
+    LEASE_POLL_INTERVAL = float(os.getenv("LEASE_POLL_INTERVAL", "2"))
+
+    # OCR / summary cache
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_PREFIX = os.getenv("CACHE_PREFIX", "cache")
+    CACHE_MEMORY_ITEMS = int(os.getenv("CACHE_MEMORY_ITEMS", "256"))
+    CACHE_MEMORY_MAX_ITEM_CHARS = int(os.getenv("CACHE_MEMORY_MAX_ITEM_CHARS", "2000000"))
+
+    # Summarization
+    SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "12000"))
+    SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+    SUMMARY_REDUCE_FANIN = int(os.getenv("SUMMARY_REDUCE_FANIN", "8"))
+    GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "0"))  # 0 = unlimited
+
+    # Vision
+    VISION_SHARD_WORKERS = int(os.getenv("VISION_SHARD_WORKERS", "8"))
+    VISION_POLL_INTERVAL = float(os.getenv("VISION_POLL_INTERVAL", "2"))
+    VISION_PDF_SHARD_PAGES = int(os.getenv("VISION_PDF_SHARD_PAGES", "5"))  # API limit per batch_annotate_files request; 0 = one async operation
+    VISION_PDF_SHARD_WORKERS = int(os.getenv("VISION_PDF_SHARD_WORKERS", "8"))
+
+    # Image preprocessing before OCR (needs Pillow)
+    IMAGE_PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true"
+    IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))
+    IMAGE_PREPROCESS_MIN_BYTES = int(os.getenv("IMAGE_PREPROCESS_MIN_BYTES", "262144"))
+    IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+    IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+    VISION_IMAGE_BATCH_SIZE = int(os.getenv("VISION_IMAGE_BATCH_SIZE", "16"))  # API limit per batch_annotate_images call
+    VISION_FILE_BATCH_SIZE = int(os.getenv("VISION_FILE_BATCH_SIZE", "50"))
+    VISION_BATCH_TIMEOUT = float(os.getenv("VISION_BATCH_TIMEOUT", "1800"))
+    BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "10000"))
+
+    # Observability
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Serve GET /metrics
@@ -1,11 +1,16 @@
 # database
 
-import firebase_admin
-from firebase_admin import firestore
+from services.clients import get_firestore_client, get_async_firestore_client
 
 
-# Use application default credentials instead of explicitly loading JSON
-firebase_admin.initialize_app()
+def get_db():
+    """
+    Firestore client, initialized on first use.
+    Uses application default credentials instead of explicitly loading JSON.
+    """
+    return get_firestore_client()
 
-# Firestore Client
-db = firestore.client()
+
+def get_async_db():
+    """Async Firestore client for use inside async routes."""
+    return get_async_firestore_client()
@@ -1,11 +1,69 @@
+from utils import profiling
+
+# Time first-party imports before any of them run
+profiling.install()
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from config import Config
 from routes.processing import router as processing_router
+from routes.indexing import router as indexing_router
+from routes.analytics import router as analytics_router
+from routes.documents import router as documents_router
 from routes.search import router as search_router
+from services import clients, jobs, image_preprocessing
+from services.elasticsearch import ensure_index, MappingVersionError
+from services.indexer import get_indexer
+from services.search_backend import get_search_backend, uses_elasticsearch
+from services.bigquery import get_activity_logger
+from services import analytics
+from services.firestore import get_status_writer
+from utils import logger as logging_setup, metrics
+
+logger = logging_setup.get_logger(__name__)
+
+profiling.mark("imports")
+profiling.uninstall()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Backends are created on first use; WARMUP_BACKENDS pre-builds selected ones
+    await asyncio.to_thread(clients.startup, Config.WARMUP_BACKENDS)
+    if uses_elasticsearch():
+        try:
+            # Create the index and mapping once; retried on first flush if ES is not up yet
+            await asyncio.to_thread(ensure_index)
+        except MappingVersionError:
+            # Serving an old mapping would break queries; migrate first
+            raise
+        except Exception as e:
+            logger.error("Error ensuring Elasticsearch index", extra={"error": str(e)})
+        get_indexer().start()
+    # Opens the embedded SQLite index, if configured, before the first request
+    await asyncio.to_thread(get_search_backend)
+    get_activity_logger().start()
+    analytics.start_rollups()
+    profiling.mark("ready")
+    logger.info("Startup profile", extra={"profile": profiling.report()})
+    yield
+    # Let in-flight processing jobs finish before the worker exits
+    jobs.shutdown(wait=True)
+    image_preprocessing.shutdown()
+    get_search_backend().stop()
+    get_activity_logger().stop()
+    get_status_writer().stop()
+    analytics.stop_rollups()
+    await clients.shutdown_async()
+    clients.shutdown()
+    logging_setup.shutdown()
 
 
 # Initialize FastAPI App with lifespan
-app = FastAPI(title="Document Processing API", version="1.0")
+app = FastAPI(title="Document Processing API", version="1.0", lifespan=lifespan)
 
 # Enable CORS (Adjust for your frontend domain)
 app.add_middleware(
@@ -16,13 +74,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if Config.METRICS_ENABLED:
+    app.add_middleware(metrics.RequestMetricsMiddleware)
+
 # Include API Routes
 app.include_router(processing_router, prefix="/api")
 app.include_router(search_router, prefix="/api")
+app.include_router(indexing_router, prefix="/api")
+app.include_router(analytics_router, prefix="/api")
+app.include_router(documents_router, prefix="/api")
 
 @app.get("/")
 def root():
     """Root route for health check"""
     return {"message": "API is running"}
 
+
+if Config.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        """Latency histograms and in-flight gauges in the Prometheus text format"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/clients")
+def client_stats():
+    """Shared client construction and connection reuse counters"""
+    return clients.get_stats()
+
+@app.get("/stats/startup")
+def startup_stats():
+    """Import and backend initialization cost per module"""
+    return profiling.report()
+
 # Run with: uvicorn main:app --reload
@@ -1,12 +1,15 @@
 # analytics
 
-from fastapi import APIRouter
-from services.bigquery import get_analytics
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from services.analytics import get_analytics
 
 router = APIRouter()
 
 @router.get("/analytics")
-async def get_document_analytics():
-    analytics = "fetched from backend"
-    # analytics = get_analytics()
-    return {"analytics": analytics}
\ No newline at end of file
+async def get_document_analytics(user_id: str = None, days: int = Query(30, ge=1, le=365)):
+    try:
+        analytics = await run_in_threadpool(get_analytics, user_id, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"analytics": analytics}
@@ -1,14 +1,28 @@
 # documents
 
-from fastapi import APIRouter, Depends, HTTPException
-from services.firestore import get_user_documents
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from services.firestore import list_user_documents, stream_user_documents
 from services.firebase_auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/documents")
-async def get_documents(user_id: str = Depends(get_current_user)):
+async def get_documents(
+    user_id: str = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=500),
+    start_after: str = None,
+    fields: str = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Lists the user's documents a page at a time. Pass next_cursor back as start_after.
+    fields is a comma-separated projection; format=ndjson streams every document.
+    """
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    if format == "ndjson":
+        return StreamingResponse(stream_user_documents(user_id, field_list), media_type="application/x-ndjson")
     try:
-        return get_user_documents(user_id)
+        return await list_user_documents(user_id, limit, start_after, field_list)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,26 @@
+# indexing
+
+from fastapi import APIRouter, HTTPException
+from services.jobs import submit_job, QueueFullError
+from services.indexer import reindex_from_gcs, get_indexer
+
+router = APIRouter()
+
+
+@router.post("/reindex")
+async def reindex(user_id: str = None):
+    """
+    Backfills Elasticsearch from the extracted text in GCS, for one user or everyone.
+    Returns a job id; poll /process/{job_id} for progress.
+    """
+    try:
+        job = submit_job(reindex_from_gcs, user_id, None, ["list", "index"], user_id)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/reindex/stats")
+async def indexer_stats():
+    """Bulk indexer throughput counters."""
+    return get_indexer().stats
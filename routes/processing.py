@@ -1,61 +1,134 @@
 # processing
 
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException
-from services.gcp_vision import extract_text
-from services.gcp_summarization import summarize_text
-from services.elasticsearch import index_document
-from services.firestore import update_document_status
-from services.bigquery import log_document_activity
-from services.storage import save_text_to_file
-from services.elasticsearch import enable_cache
-from google.cloud import storage
+from fastapi.responses import StreamingResponse
+from services.jobs import submit_job, get_job, QueueFullError
+from services.pipeline import process_document as run_pipeline, PIPELINE_STAGES, dedupe_key
+from services.cache import get_stats as get_cache_stats
+from services.batch import process_batch, BATCH_STAGES
+from schemas.models import BatchProcessRequest
 from config import Config
-# from schemas.models import DocumentMetadata
 
 router = APIRouter()
 
-storage_client = storage.Client()
 
 @router.get("/process")
 async def process_document(user_id: str, document_id: str):
+    """
+    Queues OCR, summarization and indexing for a document and returns a job id.
+    Poll /process/{job_id} for per-stage status. A request for a document that is
+    already being processed returns the running job.
+    """
     try:
-        # Step 1: Extract text using GCP Vision
-        summary_path = f"summary/{user_id}/{document_id}"
-        bucket = storage_client.bucket(Config.STORAGE_BUCKET)
-        blob = bucket.blob(summary_path)
-        extracted_text = "Extracted text for deepseek"
-        if not blob.exists():
-            file_path = f"documents/{user_id}/{document_id}"
-            extracted_path = f"extracted_documents/{user_id}/{document_id}"
-            extracted_text = extract_text(file_path,extracted_path,document_id,user_id)
-            
-            # Step 2: Summarize text using GCP Natural Language
-            # return {"message":extracted_text}
-            print("text extracted successfully")
-            summary = summarize_text(extracted_text)
-            save_text_to_file(summary, summary_path)
-            # return {"summary":summary,"extracted_text":extracted_text}
-            # Step 3: Index document in Elasticsearch
-        else :
-            summary = blob.download_as_text() 
-        enable_cache()
-        title="Elastic search test"
-        print(f"before indexing ")
-        index_document(document_id, user_id,title,extracted_text,summary)
-        print("after indexing")
-        
-        # Step 4: Update Firestore document status
-        # update_document_status(user_id, document_id, {
-        #     "ocr_text": extracted_text,
-        #     "summary": summary,
-        #     "status": "processed"
-        # })
-        return {"summary":summary,"extracted_text":"extracted_text"}
-        
-        # Step 5: Log activity in BigQuery
-        log_document_activity(user_id, document_id, "processed")
-        
-        return {"message": "Document processed successfully", "summary": summary}
-    
+        job = submit_job(
+            run_pipeline, user_id, document_id, PIPELINE_STAGES, user_id, document_id,
+            dedupe_key=dedupe_key(user_id, document_id),
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"job_id": job.id, "status": job.status}
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@router.get("/process/stream")
+async def process_document_stream(user_id: str, document_id: str):
+    """
+    Same as /process, but streams Server-Sent Events while the job runs: "queued" with
+    the job id, "status" and "progress" per stage, "summary" deltas as Gemini produces
+    them, and finally "done" (with the result) or "error". The job keeps running and
+    saves the summary if the client disconnects. Requests for a document that is
+    already being processed attach to the running job and replay its events.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event: dict):
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, event)
+        except RuntimeError:
+            # Event loop already closed (server shutting down); the job result still stands
+            pass
+
+    try:
+        job = submit_job(
+            run_pipeline, user_id, document_id, PIPELINE_STAGES, user_id, document_id,
+            dedupe_key=dedupe_key(user_id, document_id),
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    async def stream():
+        yield _sse({"type": "queued", "job_id": job.id})
+        job.subscribe(emit)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=Config.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if job.finished and events.empty():
+                        yield _sse({"type": "error", "error": job.error or "Job ended without a result"})
+                        return
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event)
+                if event["type"] in ("done", "error"):
+                    return
+        finally:
+            job.unsubscribe(emit)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/process/batch")
+async def process_documents_batch(request: BatchProcessRequest):
+    """
+    Queues OCR, summarization and indexing for many documents of one user, given
+    either document_ids or a prefix under documents/{user_id}/. Poll /process/{job_id}
+    for aggregate progress per stage. More than BATCH_MAX_DOCUMENTS document_ids are
+    rejected; a prefix matching more processes the first ones and reports the rest as
+    skipped in the result.
+    """
+    if (request.document_ids is None) == (request.prefix is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of document_ids or prefix")
+    if request.document_ids is not None and len(request.document_ids) > Config.BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {Config.BATCH_MAX_DOCUMENTS} documents per batch, got {len(request.document_ids)}",
+        )
+    try:
+        job = submit_job(
+            process_batch, request.user_id, None, BATCH_STAGES,
+            request.user_id, request.document_ids, request.prefix,
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/process/{job_id}")
+async def get_process_status(job_id: str):
+    """Reports status and per-stage timings for a processing job."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and estimated time saved by the OCR and summary cache."""
+    return get_cache_stats()
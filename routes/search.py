@@ -1,9 +1,25 @@
 # search.py
 
-from fastapi import APIRouter, Query
-from services.elasticsearch import search_documents
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, ORJSONResponse
+from config import Config
+from services.search_backend import get_search_backend
+from utils.logger import get_logger
 
-router = APIRouter(prefix="/search", tags=["Search"])
+logger = get_logger(__name__)
+
+try:
+    import orjson  # noqa: F401
+    _response_class = ORJSONResponse
+except ImportError:
+    _response_class = JSONResponse
+
+router = APIRouter(prefix="/search", tags=["Search"], default_response_class=_response_class)
+
+# Latest autocomplete request per client; older ones are cancelled when superseded
+_inflight_suggest = {}
+_superseded = set()
 
 @router.get("/")
 async def search(
@@ -12,9 +28,13 @@ async def search(
     date_end: str = None,
     user_id: str = None,
     document_id: str = None,  # Changed from doc_id to match indexing function
+    size: int = Query(Config.SEARCH_PAGE_SIZE, ge=1, le=Config.SEARCH_MAX_PAGE_SIZE),
+    cursor: str = None,
 ):
     """
     Search documents in Elasticsearch with optional filters for date, user_id, and document_id.
+    Each hit has metadata and highlighted fragments; fetch the full text from
+    /search/documents/{document_id}/text. Pass next_cursor back as cursor for the next page.
     """
     filters = {}
     
@@ -27,6 +47,66 @@ async def search(
     if document_id:
         filters["document_id"] = document_id  # Changed from doc_id to match indexed field name
 
-    print(f"query:{query} filters:{filters}")
-    results = search_documents(query, filters)
+    logger.debug("Search", extra={"query": query, "filters": filters})
+    try:
+        results = await get_search_backend().search(query, filters, size, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error searching documents", extra={"error": str(e)})
+        results = {"documents": [], "suggestions": [], "next_cursor": None}
     return results
+
+
+@router.get("/documents/{document_id}/text")
+async def document_text(document_id: str, user_id: str):
+    """Full extracted text and summary of one document, kept out of search results."""
+    document = await get_search_backend().get_document(user_id, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return document
+
+
+async def _debounced_suggest(prefix: str, user_id: str, mode: str, size: int):
+    # A newer keystroke arriving during the debounce window cancels this before ES is hit
+    if Config.SUGGEST_DEBOUNCE_MS:
+        await asyncio.sleep(Config.SUGGEST_DEBOUNCE_MS / 1000)
+    try:
+        return await get_search_backend().suggest(prefix, user_id, mode, size)
+    except Exception as e:
+        logger.error("Error fetching suggestions", extra={"error": str(e)})
+        return []
+
+
+@router.get("/suggest")
+async def suggest(
+    prefix: str,
+    user_id: str,
+    client_id: str = None,
+    mode: str = Query("completion", pattern="^(completion|prefix)$"),
+    size: int = Query(5, ge=1, le=20),
+):
+    """
+    Search-as-you-type suggestions from the completion suggester, scoped to user_id.
+    Requests sharing a client_id (or user_id) supersede each other: the older
+    in-flight request is cancelled and returns {"superseded": true}.
+    """
+    key = client_id or user_id
+    task = asyncio.ensure_future(_debounced_suggest(prefix, user_id, mode, size))
+    if key:
+        previous = _inflight_suggest.get(key)
+        if previous is not None and not previous.done():
+            _superseded.add(previous)
+            previous.cancel()
+        _inflight_suggest[key] = task
+
+    try:
+        return {"suggestions": await task}
+    except asyncio.CancelledError:
+        if task in _superseded:
+            return {"suggestions": [], "superseded": True}
+        raise
+    finally:
+        _superseded.discard(task)
+        if key and _inflight_suggest.get(key) is task:
+            del _inflight_suggest[key]
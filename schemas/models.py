@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
 class DocumentMetadata(BaseModel):
     file_name: str
@@ -15,4 +16,9 @@ class DocumentProcessed(DocumentMetadata):
 
 class SearchQuery(BaseModel):
     query: str
-    filters: dict  # e.g., {"uploaded_at": "2023-10-01", "user_id": "12345"}
\ No newline at end of file
+    filters: dict  # e.g., {"uploaded_at": "2023-10-01", "user_id": "12345"}
+
+class BatchProcessRequest(BaseModel):
+    user_id: str
+    document_ids: Optional[List[str]] = None  # Explicit documents to process
+    prefix: Optional[str] = None  # Or every object under documents/{user_id}/{prefix}
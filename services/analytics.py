@@ -0,0 +1,236 @@
+# analytics
+#
+# Backfill the daily rollup from all stored activity with: python -m services.analytics --backfill
+# Refresh it from a scheduled job (cron, Cloud Scheduler) with: python -m services.analytics --refresh
+
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from config import Config
+from services.clients import get_bigquery_client
+from utils.logger import get_logger
+from utils.lru import LRUCache
+from utils.singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+# Dashboard results, shared by concurrent loads (single-flight) and reused for a TTL
+_cache = LRUCache(maxsize=1024, ttl=Config.ANALYTICS_CACHE_TTL)
+_single_flight = SingleFlight()
+
+_rollup_thread = None
+_rollup_stop = threading.Event()
+
+
+def _table(name: str) -> str:
+    project = Config.GCP_PROJECT_ID or get_bigquery_client().project
+    return f"`{project}.{Config.BIGQUERY_DATASET}.{name}`"
+
+
+def _activity_table() -> str:
+    return _table(Config.BIGQUERY_TABLE)
+
+
+def _rollup_table() -> str:
+    return _table(f"{Config.BIGQUERY_TABLE}_daily")
+
+
+def _run_query(sql: str, params: list) -> list:
+    from google.cloud import bigquery
+
+    job_config = bigquery.QueryJobConfig(query_parameters=params, use_query_cache=True)
+    return [dict(row.items()) for row in get_bigquery_client().query(sql, job_config=job_config).result()]
+
+
+def _params(start: datetime, user_id: str = None) -> list:
+    from google.cloud import bigquery
+
+    params = [bigquery.ScalarQueryParameter("start", "TIMESTAMP", start)]
+    if user_id:
+        params.append(bigquery.ScalarQueryParameter("user_id", "STRING", user_id))
+    return params
+
+
+def ensure_tables():
+    """
+    Creates the activity table partitioned by day on timestamp (so date filters prune
+    partitions) and clustered by user and status, plus the daily rollup table.
+    """
+    get_bigquery_client().query(f"""
+        CREATE TABLE IF NOT EXISTS {_activity_table()} (
+            user_id STRING,
+            document_id STRING,
+            status STRING,
+            duration_ms FLOAT64,
+            timestamp TIMESTAMP
+        )
+        PARTITION BY DATE(timestamp)
+        CLUSTER BY user_id, status;
+
+        -- Tables created before latency tracking lack this column
+        ALTER TABLE {_activity_table()} ADD COLUMN IF NOT EXISTS duration_ms FLOAT64;
+
+        CREATE TABLE IF NOT EXISTS {_rollup_table()} (
+            day DATE,
+            user_id STRING,
+            status STRING,
+            events INT64
+        )
+        PARTITION BY day
+        CLUSTER BY user_id, status;
+    """).result()
+
+
+def refresh_rollups(days: int = None):
+    """Recomputes the daily rollup for the last `days` days from the raw activity table."""
+    from google.cloud import bigquery
+
+    days = days or Config.ANALYTICS_ROLLUP_LOOKBACK_DAYS
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+    sql = f"""
+        BEGIN TRANSACTION;
+        DELETE FROM {_rollup_table()} WHERE day >= @since;
+        INSERT INTO {_rollup_table()} (day, user_id, status, events)
+        SELECT DATE(timestamp) AS day, user_id, status, COUNT(*) AS events
+        FROM {_activity_table()}
+        WHERE timestamp >= TIMESTAMP(@since)
+        GROUP BY day, user_id, status;
+        COMMIT TRANSACTION;
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("since", "DATE", since)]
+    )
+    get_bigquery_client().query(sql, job_config=job_config).result()
+
+
+def backfill_rollups(days: int = None) -> bool:
+    """
+    Rebuilds the daily rollup for the last ANALYTICS_BACKFILL_DAYS days when it is
+    empty, e.g. on a fresh deploy over existing activity; the periodic refresh only
+    covers ANALYTICS_ROLLUP_LOOKBACK_DAYS. Passing `days` rebuilds that range regardless.
+    Returns True if the rollup was rebuilt.
+    """
+    if days is None:
+        rows = _run_query(f"SELECT COUNT(*) AS row_count FROM {_rollup_table()}", [])
+        if rows and rows[0]["row_count"]:
+            return False
+    refresh_rollups(days or Config.ANALYTICS_BACKFILL_DAYS)
+    return True
+
+
+def _rollup_loop():
+    try:
+        ensure_tables()
+        if backfill_rollups():
+            logger.info("Backfilled analytics rollups", extra={"days": Config.ANALYTICS_BACKFILL_DAYS})
+    except Exception as e:
+        logger.error("Error preparing analytics tables", extra={"error": str(e)})
+    while not _rollup_stop.is_set():
+        try:
+            refresh_rollups()
+        except Exception as e:
+            logger.error("Error refreshing analytics rollups", extra={"error": str(e)})
+        _rollup_stop.wait(Config.ANALYTICS_ROLLUP_INTERVAL)
+
+
+def start_rollups():
+    """
+    Refreshes the rollup table every ANALYTICS_ROLLUP_INTERVAL seconds in the background.
+    Only runs with ANALYTICS_ROLLUPS_ENABLED, which should be set on a single instance:
+    concurrent rollup transactions conflict and multiply the scanned bytes.
+    """
+    global _rollup_thread
+    if not Config.ANALYTICS_ROLLUPS_ENABLED or Config.ANALYTICS_ROLLUP_INTERVAL <= 0:
+        return
+    if _rollup_thread is None or not _rollup_thread.is_alive():
+        _rollup_stop.clear()
+        _rollup_thread = threading.Thread(target=_rollup_loop, name="analytics-rollups", daemon=True)
+        _rollup_thread.start()
+
+
+def stop_rollups():
+    _rollup_stop.set()
+
+
+def _compute_analytics(user_id: str, days: int) -> dict:
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    user_filter = "AND user_id = @user_id" if user_id else ""
+
+    # Counts come from the pre-aggregated daily rollup
+    counts = _run_query(f"""
+        SELECT user_id, status, SUM(events) AS events
+        FROM {_rollup_table()}
+        WHERE day >= DATE(@start) {user_filter}
+        GROUP BY user_id, status
+    """, _params(start, user_id))
+
+    # Quantiles do not merge across days, so they are computed on the raw table,
+    # limited to the requested partitions
+    latency = _run_query(f"""
+        SELECT
+            COUNT(duration_ms) AS samples,
+            APPROX_QUANTILES(duration_ms, 100) AS quantiles
+        FROM {_activity_table()}
+        WHERE timestamp >= @start AND status = 'processed' AND duration_ms IS NOT NULL {user_filter}
+    """, _params(start, user_id))
+
+    per_user = {}
+    status_breakdown = {}
+    for row in counts:
+        per_user[row["user_id"]] = per_user.get(row["user_id"], 0) + row["events"]
+        status_breakdown[row["status"]] = status_breakdown.get(row["status"], 0) + row["events"]
+
+    quantiles = latency[0]["quantiles"] if latency and latency[0]["quantiles"] else None
+    return {
+        "days": days,
+        "user_id": user_id,
+        "documents_per_user": per_user,
+        "status_breakdown": status_breakdown,
+        "processing_latency_ms": {
+            "samples": latency[0]["samples"] if latency else 0,
+            "p50": quantiles[50] if quantiles else None,
+            "p90": quantiles[90] if quantiles else None,
+            "p99": quantiles[99] if quantiles else None,
+        },
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def get_analytics(user_id: str = None, days: int = 30) -> dict:
+    """
+    Dashboard analytics for the last `days` days, optionally for a single user.
+    Cached for ANALYTICS_CACHE_TTL seconds; concurrent callers share one query.
+    """
+    key = (user_id, days)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    def load():
+        # Another caller may have filled the cache while we waited for the lock
+        result = _cache.get(key)
+        if result is None:
+            result = _compute_analytics(user_id, days)
+            _cache.set(key, result)
+        return result
+
+    return _single_flight.do(key, load)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the analytics tables and rebuild the daily rollup")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild the rollup even if it already has rows")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Refresh the last ANALYTICS_ROLLUP_LOOKBACK_DAYS days, backfilling an empty rollup first")
+    parser.add_argument("--days", type=int, default=Config.ANALYTICS_BACKFILL_DAYS)
+    args = parser.parse_args()
+    ensure_tables()
+    if args.backfill:
+        backfill_rollups(args.days)
+        print(f"Rollup rebuilt for the last {args.days} days")
+    elif args.refresh:
+        if not backfill_rollups():
+            refresh_rollups()
+        print("Rollup refreshed")
+    else:
+        print("Analytics tables ready")
@@ -0,0 +1,247 @@
+# batch processing
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import Config
+from services import cache
+from services.bigquery import log_document_activity
+from services.clients import get_bucket, get_vision_client
+from services.elasticsearch import DEFAULT_TITLE
+from services.firestore import update_document_status
+from services.gcp_summarization import summarize_text
+from services.gcp_vision import (
+    annotate_images_batch,
+    get_extracted_text_from_gcs,
+    resolve_content_type,
+    save_text_to_cloud,
+    submit_pdf_batch,
+)
+from services.search_backend import get_search_backend
+from services.storage import save_text_to_file, StoredObject
+
+BATCH_STAGES = ["list", "ocr", "summarize", "index"]
+
+
+class _Item:
+    def __init__(self, user_id: str, document_id: str, blob):
+        self.user_id = user_id
+        self.document_id = document_id
+        self.blob = blob
+        self.file_path = f"documents/{user_id}/{document_id}"
+        self.extracted_path = f"extracted_documents/{user_id}/{document_id}"
+        self.summary_path = f"summary/{user_id}/{document_id}"
+        self.output_folder = f"processed_results/{user_id}/{document_id}/"
+        self.content_type = None
+        self.content_hash = None
+        self.text = None
+        self.summary = None
+        self.error = None
+
+
+def _chunks(items: list, size: int):
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+def _list_items(user_id: str, document_ids: list, prefix: str) -> tuple:
+    """
+    Resolves the documents of a batch, up to Config.BATCH_MAX_DOCUMENTS.
+    Returns the items and the ids of the documents past the limit, which are not processed.
+    """
+    bucket = get_bucket()
+    limit = Config.BATCH_MAX_DOCUMENTS
+    if prefix is not None:
+        folder = f"documents/{user_id}/"
+        blobs = [blob for blob in bucket.list_blobs(prefix=folder + prefix) if not blob.name.endswith("/")]
+        skipped = [blob.name[len(folder):] for blob in blobs[limit:]]
+        items = [_Item(user_id, blob.name[len(folder):], blob) for blob in blobs[:limit]]
+    else:
+        skipped = list(document_ids[limit:])
+        document_ids = document_ids[:limit]
+        # get_blob returns metadata in one call per document; fetch them concurrently
+        with ThreadPoolExecutor(max_workers=Config.VISION_SHARD_WORKERS) as executor:
+            blobs = executor.map(lambda document_id: bucket.get_blob(f"documents/{user_id}/{document_id}"), document_ids)
+            items = [_Item(user_id, document_id, blob) for document_id, blob in zip(document_ids, blobs)]
+
+    for item in items:
+        if item.blob is None:
+            item.error = f"File {item.file_path} not found"
+            continue
+        try:
+            item.content_type = resolve_content_type(StoredObject(bucket, item.file_path, item.blob))
+        except ValueError as e:
+            item.error = str(e)
+        item.content_hash = cache.content_key(item.blob)
+    return items, skipped
+
+
+def _ocr_images(items: list, client, progress):
+    def run(group):
+        results = annotate_images_batch([item.file_path for item in group], client)
+        for item, result in zip(group, results):
+            if isinstance(result, Exception):
+                item.error = str(result)
+            else:
+                item.text = result
+        return len(group)
+
+    with ThreadPoolExecutor(max_workers=Config.VISION_SHARD_WORKERS) as executor:
+        futures = [executor.submit(run, group) for group in _chunks(items, Config.VISION_IMAGE_BATCH_SIZE)]
+        for future, group in zip(futures, _chunks(items, Config.VISION_IMAGE_BATCH_SIZE)):
+            try:
+                progress(future.result())
+            except Exception as e:
+                for item in group:
+                    item.error = str(e)
+                progress(len(group))
+
+
+def _ocr_pdfs(items: list, client, progress):
+    # Each operation carries many files; submit them all before waiting on any
+    operations = []
+    for group in _chunks(items, Config.VISION_FILE_BATCH_SIZE):
+        try:
+            operation = submit_pdf_batch([(item.file_path, item.output_folder) for item in group], client)
+            operations.append((operation, group))
+        except Exception as e:
+            for item in group:
+                item.error = str(e)
+            progress(len(group))
+
+    def read(item):
+        try:
+            item.text = get_extracted_text_from_gcs(item.output_folder)
+        except Exception as e:
+            item.error = str(e)
+
+    with ThreadPoolExecutor(max_workers=Config.VISION_SHARD_WORKERS) as executor:
+        for operation, group in operations:
+            try:
+                operation.result(timeout=Config.VISION_BATCH_TIMEOUT)
+            except Exception as e:
+                for item in group:
+                    item.error = str(e)
+                progress(len(group))
+                continue
+            for _ in executor.map(read, group):
+                pass
+            progress(len(group))
+
+
+def _save_texts(user_id: str, items: list, fresh: list):
+    """
+    Caches the text of freshly OCRed items and saves it to their extracted_path.
+    Cache hits are only saved where the document has no extracted text yet
+    (e.g. the same file uploaded as another document). Empty text is not written.
+    """
+    bucket = get_bucket()
+    fresh_ids = {id(item) for item in fresh}
+    # One listing instead of an existence check per cache hit
+    existing = {blob.name for blob in bucket.list_blobs(prefix=f"extracted_documents/{user_id}/")}
+
+    def save(item):
+        if id(item) in fresh_ids:
+            cache.put_extracted_text(item.content_hash, item.text)
+        try:
+            save_text_to_cloud(item.text, item.extracted_path, bucket)
+        except Exception as e:
+            item.error = str(e)
+
+    to_save = [
+        item for item in items
+        if item.error is None and item.text and (id(item) in fresh_ids or item.extracted_path not in existing)
+    ]
+    with ThreadPoolExecutor(max_workers=Config.VISION_SHARD_WORKERS, thread_name_prefix="batch-save") as executor:
+        for _ in executor.map(save, to_save):
+            pass
+
+
+def process_batch(job, user_id: str, document_ids: list = None, prefix: str = None) -> dict:
+    """
+    Processes many documents of one user: OCR through batched Vision calls, summaries
+    under the global Gemini concurrency/rate limits, and bulk indexing.
+
+    :param job: services.jobs.Job used to report aggregate progress
+    :param user_id: Owner of the documents
+    :param document_ids: Documents to process
+    :param prefix: Alternatively, process every object under documents/{user_id}/{prefix}
+    :return: Counts, per-document errors, and the documents skipped past Config.BATCH_MAX_DOCUMENTS
+    """
+    with job.stage("list"):
+        items, skipped = _list_items(user_id, document_ids, prefix)
+    total = len(items)
+
+    # OCR: cache hits first, then images and PDFs through the batch APIs
+    with job.stage("ocr"):
+        done = 0
+
+        def ocr_progress(count):
+            nonlocal done
+            done += count
+            job.set_progress("ocr", done, total)
+
+        pending = []
+        for item in items:
+            if item.error is None:
+                item.text = cache.get_extracted_text(item.content_hash)
+                if item.text is None:
+                    pending.append(item)
+                    continue
+            ocr_progress(1)
+
+        client = get_vision_client()
+        ocr_start = time.perf_counter()
+        _ocr_images([item for item in pending if item.content_type.startswith("image/")], client, ocr_progress)
+        _ocr_pdfs([item for item in pending if item.content_type == "application/pdf"], client, ocr_progress)
+        for item in pending:
+            if not item.content_type.startswith("image/") and item.content_type != "application/pdf":
+                item.error = f"Unsupported file type: {item.content_type}"
+                ocr_progress(1)
+        if pending:
+            cache.record_compute("ocr", (time.perf_counter() - ocr_start) / len(pending))
+
+        _save_texts(user_id, items, pending)
+
+    ready = [item for item in items if item.error is None]
+
+    # Summaries: summarize_text enforces the process-wide Gemini semaphore and rate limit
+    with job.stage("summarize"):
+        def summarize(item):
+            try:
+                item.summary = summarize_text(item.text)
+                if item.summary.startswith("Error:"):
+                    item.error = item.summary
+                else:
+                    save_text_to_file(item.summary, item.summary_path)
+            except Exception as e:
+                item.error = str(e)
+
+        with ThreadPoolExecutor(max_workers=Config.SUMMARY_CONCURRENCY, thread_name_prefix="batch-summarize") as executor:
+            futures = [executor.submit(summarize, item) for item in ready]
+            for done, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                job.set_progress("summarize", done, len(futures))
+
+    with job.stage("index"):
+        ready = [item for item in ready if item.error is None]
+        backend = get_search_backend()
+        for item in ready:
+            backend.index_document(item.document_id, user_id, DEFAULT_TITLE, item.text, item.summary)
+        backend.flush()
+        job.set_progress("index", len(ready), len(ready))
+
+    failed = {item.document_id: item.error for item in items if item.error is not None}
+    for item in items:
+        if item.error is None:
+            update_document_status(user_id, item.document_id, {
+                "summary": item.summary,
+                "extracted_path": item.extracted_path,
+                "status": "processed"
+            })
+            # Stages run batched across items, so there is no per-document duration to report;
+            # leaving it out keeps batch runs out of the latency percentiles
+            log_document_activity(user_id, item.document_id, "processed")
+        else:
+            update_document_status(user_id, item.document_id, {"status": "failed", "error": item.error})
+
+    return {"total": total, "processed": total - len(failed), "failed": failed, "skipped": skipped}
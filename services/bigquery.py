@@ -1,45 +1,197 @@
-from google.cloud import bigquery
-from datetime import datetime, timezone
+import json
 import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from config import Config
+from services.clients import get_bigquery_client
+from utils import metrics
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bookkeeping kept with spilled rows, never sent as columns
+_LOCAL_FIELDS = ("insert_id", "attempts")
+
+
+class ActivityLogger:
+    """
+    Buffers activity rows in memory and streams them to BigQuery in batches.
+
+    A background thread flushes every ACTIVITY_FLUSH_INTERVAL seconds or once
+    ACTIVITY_BATCH_SIZE rows are waiting. Rows that cannot be inserted (BigQuery
+    unavailable, buffer full) are appended to ACTIVITY_SPILL_PATH and replayed after
+    the next successful insert. Rows BigQuery rejects as invalid go to
+    ACTIVITY_DEAD_LETTER_PATH instead, so the spill always drains. stop() drains the
+    buffer before shutdown.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=Config.ACTIVITY_BUFFER_MAX)
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"logged": 0, "inserted": 0, "insert_calls": 0, "spilled": 0, "replayed": 0, "dead_lettered": 0}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-logger", daemon=True)
+            self._thread.start()
+
+    def log(self, row: dict):
+        """Queues a row without blocking; spills to disk if the buffer is full."""
+        self.stats["logged"] += 1
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._spill([row])
+        self.start()
+
+    def _take_batch(self, timeout: float) -> list:
+        rows = []
+        deadline = time.monotonic() + timeout
+        while len(rows) < Config.ACTIVITY_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                rows.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            rows = self._take_batch(Config.ACTIVITY_FLUSH_INTERVAL)
+            if rows:
+                self._insert(rows)
+
+    def _table_ref(self) -> str:
+        project = Config.GCP_PROJECT_ID or get_bigquery_client().project
+        return f"{project}.{Config.BIGQUERY_DATASET}.{Config.BIGQUERY_TABLE}"
+
+    def _send(self, rows: list) -> list:
+        # insertId lets BigQuery de-duplicate rows re-sent after a spill
+        with metrics.span("bigquery", "insert_rows", rows=len(rows)):
+            errors = get_bigquery_client().insert_rows_json(
+                self._table_ref(),
+                [{key: value for key, value in row.items() if key not in _LOCAL_FIELDS} for row in rows],
+                row_ids=[row["insert_id"] for row in rows],
+            )
+        self.stats["insert_calls"] += 1
+        return errors
+
+    def _insert(self, rows: list) -> bool:
+        try:
+            errors = self._send(rows)
+        except Exception as e:
+            logger.error("Error logging document activity to BigQuery", extra={"error": str(e)})
+            self._spill(rows)
+            return False
+
+        self._reject(rows, errors)
+        self.stats["inserted"] += len(rows) - len(errors)
+        self._replay_spill()
+        return True
+
+    def _reject(self, rows: list, errors: list):
+        """
+        Spills rows that may be accepted later and dead-letters the rest: rows BigQuery
+        reports as invalid (e.g. a field the table does not have), and rows already
+        rejected ACTIVITY_MAX_REPLAYS times.
+        """
+        if not errors:
+            return
+        logger.error("BigQuery insert errors", extra={"errors": errors})
+        retry, dead = [], []
+        for error in errors:
+            row = rows[error["index"]]
+            attempts = row.get("attempts", 0) + 1
+            if _is_permanent(error) or attempts > Config.ACTIVITY_MAX_REPLAYS:
+                dead.append({**row, "errors": error.get("errors", [])})
+            else:
+                retry.append({**row, "attempts": attempts})
+        self._spill(retry)
+        if dead:
+            with self._spill_lock:
+                with open(Config.ACTIVITY_DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+                    for row in dead:
+                        f.write(json.dumps(row) + "\n")
+            self.stats["dead_lettered"] += len(dead)
+            logger.warning("Dead-lettered activity rows", extra={"rows": len(dead), "path": Config.ACTIVITY_DEAD_LETTER_PATH})
+
+    def _spill(self, rows: list):
+        if not rows:
+            return
+        with self._spill_lock:
+            with open(Config.ACTIVITY_SPILL_PATH, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+        self.stats["spilled"] += len(rows)
+
+    def _replay_spill(self):
+        replay_path = Config.ACTIVITY_SPILL_PATH + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(Config.ACTIVITY_SPILL_PATH):
+                return
+            os.replace(Config.ACTIVITY_SPILL_PATH, replay_path)
+
+        with open(replay_path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        os.remove(replay_path)
+
+        logger.info("Replaying spilled activity rows", extra={"rows": len(rows)})
+        for offset in range(0, len(rows), Config.ACTIVITY_BATCH_SIZE):
+            batch = rows[offset:offset + Config.ACTIVITY_BATCH_SIZE]
+            try:
+                errors = self._send(batch)
+            except Exception as e:
+                logger.error("Error replaying spilled activity rows", extra={"error": str(e)})
+                self._spill(rows[offset:])
+                return
+            self._reject(batch, errors)
+            self.stats["replayed"] += len(batch) - len(errors)
+
+    def stop(self):
+        """Stops the flusher and writes (or spills) everything still buffered."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        while True:
+            rows = self._take_batch(0)
+            if not rows:
+                break
+            self._insert(rows)
+
+
+def _is_permanent(error: dict) -> bool:
+    # "stopped" rows were only held back by another row of the request; "invalid" ones never fit the table
+    return any(reason.get("reason") == "invalid" for reason in error.get("errors", []))
+
+
+_activity_logger = ActivityLogger()
+
 
-# Set up the BigQuery client
-client = bigquery.Client()
+def get_activity_logger() -> ActivityLogger:
+    return _activity_logger
 
-# Replace with your actual GCP project and dataset details
-PROJECT_ID = "your-gcp-project-id"
-DATASET_ID = "your_dataset"
-TABLE_ID = "document_activity"
 
-def log_document_activity(user_id: str, document_id: str, status: str):
+def log_document_activity(user_id: str, document_id: str, status: str, duration_ms: float = None):
     """
     Logs document activity in Google BigQuery.
+    The row is buffered and inserted in a batch by a background thread.
 
     :param user_id: ID of the user who uploaded the document.
     :param document_id: Unique document ID.
     :param status: Status of the document (e.g., 'uploaded', 'processed').
+    :param duration_ms: How long the step took, used for latency percentiles.
     """
-    
-    # Define the full BigQuery table reference
-    table_ref = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
-
-    # Create a dictionary of data to insert
-    row_to_insert = [
-        {
-            "user_id": user_id,
-            "document_id": document_id,
-            "status": status,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-    ]
-
-    try:
-        # Insert the row into BigQuery
-        errors = client.insert_rows_json(table_ref, row_to_insert)
-
-        if errors:
-            print(f"BigQuery Insert Errors: {errors}")
-        else:
-            print(f"Document activity logged successfully in BigQuery: {row_to_insert}")
-
-    except Exception as e:
-        print(f"Error logging document activity to BigQuery: {e}")
+    _activity_logger.log({
+        "insert_id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "document_id": document_id,
+        "status": status,
+        "duration_ms": duration_ms,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
@@ -0,0 +1,135 @@
+# content-addressed cache for OCR text and summaries
+
+import base64
+import hashlib
+import threading
+from config import Config
+from services.clients import get_bucket
+from utils import metrics
+from utils.logger import get_logger
+from utils.lru import LRUCache
+
+logger = get_logger(__name__)
+
+_memory = LRUCache(maxsize=Config.CACHE_MEMORY_ITEMS)
+
+_stats_lock = threading.Lock()
+_stats = {
+    namespace: {"memory_hits": 0, "gcs_hits": 0, "misses": 0, "compute_seconds": 0.0, "computed": 0}
+    for namespace in ("ocr", "summary")
+}
+
+
+def content_key(blob) -> str:
+    """
+    Builds a cache key from GCS object metadata so the payload never has to be downloaded.
+    Composite objects carry no md5, so fall back to crc32c plus size.
+    """
+    if blob.md5_hash:
+        return "md5-" + base64.b64decode(blob.md5_hash).hex()
+    if blob.crc32c:
+        return f"crc32c-{base64.b64decode(blob.crc32c).hex()}-{blob.size}"
+    return None
+
+
+def text_key(text: str) -> str:
+    return "sha256-" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _gcs_path(key: str, *parts: str) -> str:
+    return "/".join((Config.CACHE_PREFIX, key) + parts)
+
+
+def _get(namespace: str, cache_id: str, gcs_path: str):
+    value = _memory.get(cache_id)
+    if value:
+        _count(namespace, "memory_hits")
+        return value
+
+    try:
+        blob = get_bucket().blob(gcs_path)
+        value = blob.download_as_text()
+    except Exception:
+        # NotFound and transient errors both count as a miss
+        value = None
+
+    # An empty entry is a failed computation stored by an older version, not a result
+    if not value:
+        _count(namespace, "misses")
+        return None
+
+    _count(namespace, "gcs_hits")
+    _remember(cache_id, value)
+    return value
+
+
+def _put(cache_id: str, gcs_path: str, value: str):
+    if not value:
+        return
+    _remember(cache_id, value)
+    try:
+        with metrics.span("gcs", "write", size=len(value)):
+            get_bucket().blob(gcs_path).upload_from_string(value, content_type="text/plain")
+    except Exception as e:
+        logger.error("Error writing cache entry", extra={"path": gcs_path, "error": str(e)})
+
+
+def _remember(cache_id: str, value: str):
+    if len(value) <= Config.CACHE_MEMORY_MAX_ITEM_CHARS:
+        _memory.set(cache_id, value)
+
+
+def _count(namespace: str, field: str, amount=1):
+    with _stats_lock:
+        _stats[namespace][field] += amount
+
+
+def get_extracted_text(key: str):
+    if not Config.CACHE_ENABLED or not key:
+        return None
+    return _get("ocr", f"ocr:{key}", _gcs_path(key, "extracted_text.txt"))
+
+
+def put_extracted_text(key: str, text: str):
+    if Config.CACHE_ENABLED and key:
+        _put(f"ocr:{key}", _gcs_path(key, "extracted_text.txt"), text)
+
+
+def get_summary(key: str, summary_type: str, summary_language: str):
+    if not Config.CACHE_ENABLED or not key:
+        return None
+    cache_id = f"summary:{key}:{summary_type}:{summary_language}"
+    return _get("summary", cache_id, _gcs_path(key, "summary", summary_type, f"{summary_language}.txt"))
+
+
+def put_summary(key: str, summary_type: str, summary_language: str, summary: str):
+    if Config.CACHE_ENABLED and key:
+        cache_id = f"summary:{key}:{summary_type}:{summary_language}"
+        _put(cache_id, _gcs_path(key, "summary", summary_type, f"{summary_language}.txt"), summary)
+
+
+def record_compute(namespace: str, seconds: float):
+    """Records how long a cache miss took to compute, used to estimate time saved by hits."""
+    with _stats_lock:
+        _stats[namespace]["computed"] += 1
+        _stats[namespace]["compute_seconds"] += seconds
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        report = {}
+        for namespace, counters in _stats.items():
+            hits = counters["memory_hits"] + counters["gcs_hits"]
+            lookups = hits + counters["misses"]
+            avg = counters["compute_seconds"] / counters["computed"] if counters["computed"] else 0.0
+            report[namespace] = {
+                "memory_hits": counters["memory_hits"],
+                "gcs_hits": counters["gcs_hits"],
+                "misses": counters["misses"],
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "api_calls_saved": hits,
+                "avg_compute_seconds": round(avg, 3),
+                "estimated_seconds_saved": round(hits * avg, 3),
+            }
+        report["memory_items"] = len(_memory)
+        return report
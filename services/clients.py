@@ -0,0 +1,251 @@
+# clients
+
+import threading
+import time
+from config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Shared, thread-safe backend clients, created on first use. Building a client pays
+# for credential discovery and a new connection pool / gRPC channel, so every module
+# gets them from here and nothing connects at import time.
+
+_lock = threading.RLock()
+_clients = {}
+_stats = {}
+_storage_adapter = None
+
+
+def _get_or_create(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                start = time.perf_counter()
+                client = factory()
+                _stats[name] = {
+                    "created": _stats.get(name, {}).get("created", 0) + 1,
+                    "reused": 0,
+                    "init_ms": round((time.perf_counter() - start) * 1000, 2),
+                }
+                _clients[name] = client
+                return client
+    with _lock:
+        _stats[name]["reused"] += 1
+    return client
+
+
+def install(name: str, client):
+    """
+    Registers a ready-made client under a registry name ("storage", "vision",
+    "gemini:<model>", "elasticsearch", ...) so it is used instead of building one,
+    e.g. local stand-ins in benchmarks.
+    """
+    with _lock:
+        _clients[name] = client
+        _stats[name] = {"created": 0, "reused": 0, "init_ms": 0.0}
+
+
+def _build_storage_client():
+    global _storage_adapter
+    import google.auth
+    import requests
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import storage
+
+    credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    # Default requests pools hold 10 connections, fewer than our worker threads
+    _storage_adapter = requests.adapters.HTTPAdapter(
+        pool_connections=Config.GCS_POOL_CONNECTIONS,
+        pool_maxsize=Config.GCS_POOL_MAXSIZE,
+    )
+    session.mount("https://", _storage_adapter)
+    return storage.Client(project=Config.GCP_PROJECT_ID or project, credentials=credentials, _http=session)
+
+
+def _build_vision_client():
+    from google.cloud import vision
+
+    transport_cls = vision.ImageAnnotatorClient.get_transport_class("grpc")
+    channel = transport_cls.create_channel(
+        options=[
+            ("grpc.max_send_message_length", -1),
+            ("grpc.max_receive_message_length", -1),
+            ("grpc.keepalive_time_ms", Config.GRPC_KEEPALIVE_MS),
+        ]
+    )
+    return vision.ImageAnnotatorClient(transport=transport_cls(channel=channel))
+
+
+def _build_es_client():
+    from elasticsearch import Elasticsearch
+
+    return Elasticsearch([Config.ELASTICSEARCH_URL])
+
+
+def _build_async_es_client():
+    from elasticsearch import AsyncElasticsearch
+
+    return AsyncElasticsearch(
+        [Config.ELASTICSEARCH_URL],
+        connections_per_node=Config.ES_CONNECTIONS_PER_NODE,
+        request_timeout=Config.ES_REQUEST_TIMEOUT,
+    )
+
+
+def _build_bigquery_client():
+    from google.cloud import bigquery
+
+    return bigquery.Client(project=Config.GCP_PROJECT_ID)
+
+
+def _build_firebase_app():
+    import firebase_admin
+
+    # Use application default credentials instead of explicitly loading JSON
+    if not firebase_admin._apps:
+        return firebase_admin.initialize_app()
+    return firebase_admin.get_app()
+
+
+def _build_firestore_client():
+    from firebase_admin import firestore
+
+    return firestore.client(get_firebase_app())
+
+
+def _build_async_firestore_client():
+    from firebase_admin import firestore_async
+
+    return firestore_async.client(get_firebase_app())
+
+
+def get_storage_client():
+    return _get_or_create("storage", _build_storage_client)
+
+
+def get_bucket(bucket_name: str = None):
+    """Bucket handle on the shared storage client (no network call)."""
+    return get_storage_client().bucket(bucket_name or Config.STORAGE_BUCKET)
+
+
+def get_vision_client():
+    return _get_or_create("vision", _build_vision_client)
+
+
+def get_generative_model(model_name: str):
+    def build():
+        import google.generativeai as genai
+
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        return genai.GenerativeModel(model_name)
+
+    return _get_or_create(f"gemini:{model_name}", build)
+
+
+def get_es():
+    return _get_or_create("elasticsearch", _build_es_client)
+
+
+def get_async_es():
+    """AsyncElasticsearch for the search path, so queries do not block the event loop."""
+    return _get_or_create("async_elasticsearch", _build_async_es_client)
+
+
+def get_bigquery_client():
+    return _get_or_create("bigquery", _build_bigquery_client)
+
+
+def get_firebase_app():
+    return _get_or_create("firebase", _build_firebase_app)
+
+
+def get_firestore_client():
+    return _get_or_create("firestore", _build_firestore_client)
+
+
+def get_async_firestore_client():
+    return _get_or_create("async_firestore", _build_async_firestore_client)
+
+
+_WARMUP = {
+    "storage": get_storage_client,
+    "vision": get_vision_client,
+    "elasticsearch": get_es,
+    "bigquery": get_bigquery_client,
+    "firestore": get_firestore_client,
+}
+
+
+def startup(backends: list = None):
+    """
+    Optionally creates clients up front so the first request does not pay for them.
+    Every client is otherwise built on first use.
+
+    :param backends: Names from WARMUP_BACKENDS, e.g. ["storage", "vision"]
+    """
+    for name in backends or []:
+        if name not in _WARMUP:
+            logger.warning("Unknown warm-up backend", extra={"backend": name})
+            continue
+        try:
+            _WARMUP[name]()
+        except Exception as e:
+            # A backend that cannot start yet is retried on first use
+            logger.warning("Error warming up backend", extra={"backend": name, "error": str(e)})
+
+
+def shutdown():
+    """Closes pooled HTTP connections and gRPC channels."""
+    with _lock:
+        # AsyncElasticsearch is closed by shutdown_async() on the event loop
+        _clients.pop("async_elasticsearch", None)
+        storage_client = _clients.pop("storage", None)
+        vision_client = _clients.pop("vision", None)
+        es_client = _clients.pop("elasticsearch", None)
+        bigquery_client = _clients.pop("bigquery", None)
+        _clients.clear()
+    try:
+        if storage_client is not None:
+            storage_client._http.close()
+        if vision_client is not None:
+            vision_client.transport.close()
+        if es_client is not None:
+            es_client.close()
+        if bigquery_client is not None:
+            bigquery_client.close()
+    except Exception as e:
+        logger.error("Error closing clients", extra={"error": str(e)})
+
+
+async def shutdown_async():
+    """Closes clients whose connections belong to the event loop."""
+    with _lock:
+        async_es = _clients.pop("async_elasticsearch", None)
+    if async_es is not None:
+        try:
+            await async_es.close()
+        except Exception as e:
+            logger.error("Error closing async Elasticsearch client", extra={"error": str(e)})
+
+
+def get_stats() -> dict:
+    """Construction/reuse counters per client, plus GCS HTTP connection reuse."""
+    with _lock:
+        report = {"clients": {name: dict(stats) for name, stats in _stats.items()}}
+
+    if _storage_adapter is not None:
+        pool_container = _storage_adapter.poolmanager.pools
+        pools = [pool_container[key] for key in pool_container.keys()]
+        connections = sum(pool.num_connections for pool in pools)
+        requests_sent = sum(pool.num_requests for pool in pools)
+        report["storage_http"] = {
+            "pools": len(pools),
+            "connections_opened": connections,
+            "requests": requests_sent,
+            "connections_reused": max(requests_sent - connections, 0),
+        }
+    return report
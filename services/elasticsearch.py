@@ -1,124 +1,321 @@
-from elasticsearch import Elasticsearch
 from config import Config
 from datetime import datetime,timezone
+from services.clients import get_es, get_async_es
+from utils import metrics
+from utils.logger import get_logger
+from utils.lru import LRUCache
+import base64
+import json
+import threading
 import traceback
+import zlib
+
+logger = get_logger(__name__)
+
+INDEX_NAME = Config.ELASTICSEARCH_INDEX
+
+# Placeholder title until uploads carry their file name
+DEFAULT_TITLE = "Elastic search test"
+
+# Bump when INDEX_SETTINGS changes; services/es_migrations.py moves the alias over
+MAPPING_VERSION = 4
+
+# Index-time analyzers differ from search-time ones: n-grams are only produced when
+# indexing, so a query term is matched as-is against the prefix/infix subfields
+# instead of being exploded into n-grams (and fuzzy variants of each) at search time.
+INDEX_SETTINGS = {
+    "settings": {
+        "index.requests.cache.enable": True,
+        "index.number_of_shards": Config.ES_NUMBER_OF_SHARDS,
+        "analysis": {
+            "analyzer": {
+                "text_analyzer": {
+                    "type": "custom",
+                    "tokenizer": "standard",
+                    "filter": ["lowercase", "asciifolding"]
+                },
+                "prefix_index_analyzer": {
+                    "type": "custom",
+                    "tokenizer": "edge_ngram_tokenizer",
+                    "filter": ["lowercase", "asciifolding"]
+                },
+                "infix_analyzer": {
+                    "type": "custom",
+                    "tokenizer": "trigram_tokenizer",
+                    "filter": ["lowercase", "asciifolding"]
+                }
+            },
+            "tokenizer": {
+                "edge_ngram_tokenizer": {
+                    "type": "edge_ngram",
+                    "min_gram": 2,
+                    "max_gram": 15,
+                    "token_chars": ["letter", "digit"]
+                },
+                "trigram_tokenizer": {
+                    "type": "ngram",
+                    "min_gram": 3,
+                    "max_gram": 3,
+                    "token_chars": ["letter", "digit"]
+                }
+            }
+        }
+    },
+    "mappings": {
+        "_routing": {"required": True},  # Every write and get carries the tenant routing
+        "properties": {
+            "user_id": {"type": "keyword"},
+            "document_id": {"type": "keyword"},
+            "unique_id": {"type": "keyword"},
+            "title": {
+                "type": "text",
+                "analyzer": "text_analyzer",
+                "fields": {
+                    "prefix": {"type": "text", "analyzer": "prefix_index_analyzer", "search_analyzer": "text_analyzer"},
+                    "infix": {"type": "text", "analyzer": "infix_analyzer"},
+                    "sayt": {"type": "search_as_you_type"}  # Prefix matching for autocomplete
+                }
+            },
+            "content": {
+                "type": "text",
+                "analyzer": "text_analyzer",
+                "index_options": "offsets",  # Highlighting from postings instead of re-analyzing the text
+                # No infix subfield: trigrams of full OCR text would dominate the index size
+                "fields": {
+                    "prefix": {"type": "text", "analyzer": "prefix_index_analyzer", "search_analyzer": "text_analyzer"}
+                }
+            },
+            "summary": {
+                "type": "text",
+                "analyzer": "text_analyzer",
+                "index_options": "offsets",
+                "fields": {
+                    "prefix": {"type": "text", "analyzer": "prefix_index_analyzer", "search_analyzer": "text_analyzer"},
+                    "infix": {"type": "text", "analyzer": "infix_analyzer"}
+                }
+            },
+            "title_suggest": {  # Autocomplete field, scoped per user
+                "type": "completion",
+                "contexts": [{"name": "user_id", "type": "category"}]
+            },
+            "timestamp": {"type": "date"}
+        }
+    }
+}
+
+# Per-field boosts for the three match strategies in build_search_query
+EXACT_FIELDS = ["title^3", "summary^2", "content"]
+PREFIX_FIELDS = ["title.prefix^2", "summary.prefix", "content.prefix^0.5"]
+INFIX_FIELDS = ["title.infix", "summary.infix^0.5"]
+
+# Returned with each hit; the full text comes from get_document_text
+RESULT_FIELDS = ["document_id", "user_id", "title", "timestamp"]
+
+# Deterministic order for search_after: score, then a unique keyword as tie-breaker
+SEARCH_SORT = [{"_score": "desc"}, {"unique_id": "asc"}]
+
+_index_ready = False
+_index_lock = threading.Lock()
+
+# Filtered per-tenant aliases known to exist (ES_TENANT_ALIASES)
+TENANT_ALIAS_PREFIX = f"{INDEX_NAME}_user_"
+_tenant_aliases = set()
+
+# Search results keyed by (user scope, normalized query, filters)
+_result_cache = LRUCache(maxsize=Config.SEARCH_CACHE_SIZE, ttl=Config.SEARCH_CACHE_TTL)
+
+
+class MappingVersionError(Exception):
+    """Raised when the index predates MAPPING_VERSION and ES_AUTO_MIGRATE is off."""
+
+
+def versioned_index_name(version: int = MAPPING_VERSION) -> str:
+    """Concrete index behind the INDEX_NAME alias for a mapping version."""
+    return f"{INDEX_NAME}_v{version}"
+
+
+def index_version(index_name: str) -> int:
+    """Mapping version of a concrete index, 0 for the legacy un-versioned index."""
+    suffix = index_name[len(f"{INDEX_NAME}_v"):] if index_name.startswith(f"{INDEX_NAME}_v") else ""
+    return int(suffix) if suffix.isdigit() else 0
 
-# Initialize Elasticsearch connection
-es = Elasticsearch( [Config.ELASTICSEARCH_URL])
 
-# Enable Request Caching for Optimized Queries
 def check_index_exists(index_name):
     """Check if the index exists"""
-    return es.indices.exists(index=index_name)
-
-def enable_cache():
-    """Enable request cache for the 'documents' index"""
-    if not check_index_exists("documents"):
-        print("Index not found")
-        return None
-    try:
-        response = es.indices.put_settings(
-            index="documents",
-            body={"index.requests.cache.enable": True}
-        )
-        print("Request caching enabled:", response)
-    except Exception as e:
-        print("Error enabling request caching:", str(e))
+    return get_es().indices.exists(index=index_name)
 
 
-# Index Document in Elasticsearch
-def index_document(document_id: str, user_id: str, title: str, extracted_text: str, summary: str):
+def ensure_index():
     """
-    Indexes a document into the 'documents' index in Elasticsearch.
+    Makes sure the INDEX_NAME alias points at the current mapping version, creating the
+    index if none exists. Runs once per process; later calls return immediately.
 
-    :param document_id: Unique document ID
-    :param user_id: ID of the user who uploaded the document
-    :param title: Title of the document
-    :param extracted_text: Full extracted text of the document
-    :param summary: Summarized text of the document
+    :raises MappingVersionError: If the index has an older mapping version; migrate it
+                                 with python -m services.es_migrations (or set ES_AUTO_MIGRATE)
     """
-    index_name = "documents"
+    global _index_ready
+    if _index_ready:
+        return
+    with _index_lock:
+        if _index_ready:
+            return
+        from services.es_migrations import current_index, migrate_index
 
-    # Check if index exists, if not, create it with proper mappings
-    if not es.indices.exists(index=index_name):
-        print(f"Index '{index_name}' does not exist. Creating index with proper mapping...")
+        current = current_index()
+        if current is None:
+            migrate_index()
+        elif index_version(current) < MAPPING_VERSION:
+            if not Config.ES_AUTO_MIGRATE:
+                raise MappingVersionError(
+                    f"Index '{current}' is behind mapping v{MAPPING_VERSION}; run python -m services.es_migrations"
+                )
+            migrate_index()
+        _index_ready = True
 
-        index_settings = {
-            "settings": {
-                "analysis": {
-                    "analyzer": {
-                        "edge_ngram_analyzer": {
-                            "type": "custom",
-                            "tokenizer": "edge_ngram_tokenizer",
-                            "filter": ["lowercase"]
-                        }
-                    },
-                    "tokenizer": {
-                        "edge_ngram_tokenizer": {
-                            "type": "edge_ngram",
-                            "min_gram": 2,
-                            "max_gram": 10,
-                            "token_chars": ["letter", "digit"]
-                        }
-                    }
-                }
-            },
-            "mappings": {
-                "properties": {
-                    "user_id": {"type": "keyword"},
-                    "title": {"type": "text", "analyzer": "edge_ngram_analyzer"},
-                    "content": {"type": "text", "analyzer": "edge_ngram_analyzer"},
-                    "summary": {"type": "text", "analyzer": "edge_ngram_analyzer"},
-                    "title_suggest": {"type": "completion"},  # Autocomplete field
-                    "timestamp": {"type": "date"}
-                }
-            }
-        }
 
-        es.indices.create(index=index_name, body=index_settings)
+def _java_string_hash(value: str) -> int:
+    # Java's String.hashCode, so the Painless migration script picks the same split
+    units = value.encode("utf-16-be")
+    h = 0
+    for i in range(0, len(units), 2):
+        h = (31 * h + int.from_bytes(units[i:i + 2], "big")) & 0xFFFFFFFF
+    return h - (1 << 32) if h >= (1 << 31) else h
+
+
+def document_routing(user_id: str, document_id: str) -> str:
+    """Routing value for a document: the user id, or one of its splits for large tenants."""
+    splits = Config.ES_TENANT_SPLITS.get(user_id, 1)
+    if splits <= 1:
+        return user_id
+    split = _java_string_hash(document_id) % splits
+    return user_id if split == 0 else f"{user_id}#{split}"
+
 
-    # Prepare document body
+def user_routing(user_id: str) -> str:
+    """Routing for searches over one user's documents: every shard their documents may be on."""
+    splits = Config.ES_TENANT_SPLITS.get(user_id, 1)
+    return ",".join([user_id] + [f"{user_id}#{split}" for split in range(1, splits)])
+
+
+def tenant_alias_name(user_id: str) -> str:
+    # Alias names must be lowercase; keep mixed-case ids (e.g. Firebase uids) distinct
+    name = TENANT_ALIAS_PREFIX + user_id.lower()
+    if user_id != user_id.lower():
+        name += f"_{zlib.crc32(user_id.encode()):08x}"
+    return name
+
+
+def tenant_alias_action(user_id: str, index: str) -> dict:
+    """update_aliases "add" action for a user's filtered, routed alias on index."""
+    alias = {
+        "index": index,
+        "alias": tenant_alias_name(user_id),
+        "filter": {"term": {"user_id": user_id}},
+        "search_routing": user_routing(user_id),
+    }
+    if Config.ES_TENANT_SPLITS.get(user_id, 1) <= 1:
+        alias["index_routing"] = user_id
+    return {"add": alias}
+
+
+def ensure_tenant_alias(user_id: str):
+    """Creates the user's alias on the current index once per process (ES_TENANT_ALIASES)."""
+    if user_id in _tenant_aliases:
+        return
+    from services.es_migrations import current_index
+
+    get_es().indices.update_aliases(body={"actions": [tenant_alias_action(user_id, current_index())]})
+    _tenant_aliases.add(user_id)
+
+
+def build_document(document_id: str, user_id: str, title: str, extracted_text: str, summary: str) -> dict:
+    """Document body as stored in the index."""
     utc_time = datetime.now(timezone.utc).isoformat()
-    doc_body = {
+    return {
         "user_id": user_id,
         "document_id":document_id,
         "unique_id":f"{user_id}_{document_id}",
         "title": title,
-        "title_suggest": {"input": title},  # Autocomplete field
+        "title_suggest": {"input": title, "contexts": {"user_id": [user_id]}},  # Autocomplete field
         "content": extracted_text,
         "summary": summary,
         "timestamp": utc_time  # Proper timestamp format
     }
-    try:
-        response = es.index(index=index_name, id=f"{user_id}_{document_id}", body=doc_body)
-        print(f"Document {document_id} indexed successfully:", response)
-    except Exception as e:
-        print("Error indexing document:", str(e))
 
-def search_documents(query: str, filters: dict = None):
-    """Enhanced search with proper fuzzy matching and filter handling."""
-    if not query or len(query) < 2:  # Ignore very short/random queries
-        return {"documents": [], "suggestions": []}
 
+# Index Document in Elasticsearch
+def index_document(document_id: str, user_id: str, title: str, extracted_text: str, summary: str):
+    """
+    Queues a document for indexing into the 'documents' index in Elasticsearch.
+    Documents are written in _bulk batches by services.indexer, which drops the
+    user's cached search results once they are searchable.
+
+    :param document_id: Unique document ID
+    :param user_id: ID of the user who uploaded the document
+    :param title: Title of the document
+    :param extracted_text: Full extracted text of the document
+    :param summary: Summarized text of the document
+    """
+    from services.indexer import get_indexer
+
+    get_indexer().add(build_index_action(document_id, user_id, title, extracted_text, summary))
+
+
+def build_index_action(document_id: str, user_id: str, title: str, extracted_text: str, summary: str) -> dict:
+    """_bulk index action for a document, routed to its tenant's shard."""
+    return {
+        "_op_type": "index",
+        "_index": INDEX_NAME,
+        "_id": f"{user_id}_{document_id}",
+        "_routing": document_routing(user_id, document_id),
+        "_source": build_document(document_id, user_id, title, extracted_text, summary),
+    }
+
+def invalidate_search_cache(user_id: str):
+    """Drops cached results that could include this user's documents."""
+    _result_cache.discard_where(lambda key: key[0] in (user_id, "*"))
+
+
+def _cache_key(query: str, filters: dict) -> tuple:
+    normalized = " ".join(query.lower().split())
+    scope = (filters or {}).get("user_id") or "*"
+    return scope, normalized, json.dumps(filters or {}, sort_keys=True)
+
+
+def build_search_query(query: str, filters: dict = None, size: int = None) -> dict:
+    """
+    Builds the Elasticsearch request body for a search.
+
+    Whole words (with typo tolerance) score highest, then word prefixes, then
+    infix (trigram) matches for fragments from the middle of a word.
+    Hits carry RESULT_FIELDS plus highlighted fragments, never the full content.
+    """
     search_query = {
         "query": {
             "bool": {
-                "must": [  # Ensure it actually matches meaningful content
+                "should": [
                     {
                         "multi_match": {
                             "query": query,
-                            "fields": ["title", "content", "summary"],
-                            "fuzziness": "AUTO",
+                            "fields": EXACT_FIELDS,
+                            "fuzziness": "AUTO",  # Only on word-analyzed fields, never on n-grams
+                            "prefix_length": 1,
                             "operator": "and"  # Requires stronger match
                         }
-                    }
-                ],
-                "should": [  # Optional conditions to expand results if no strict match
+                    },
+                    {
+                        "multi_match": {
+                            "query": query,
+                            "fields": PREFIX_FIELDS,
+                            "operator": "and"
+                        }
+                    },
                     {
-                        "query_string": {
-                            "query": f"*{query}*",  # Wildcard search for partial terms
-                            "fields": ["title", "content", "summary"],
-                            "default_operator": "AND"
+                        "multi_match": {
+                            "query": query,
+                            "fields": INFIX_FIELDS,
+                            "operator": "and",
+                            "boost": 0.5
                         }
                     }
                 ],
@@ -126,17 +323,32 @@ def search_documents(query: str, filters: dict = None):
                 "filter": []
             }
         },
-        "size": 10,
-        "sort": [
-            {"_score": "desc"}  # Prioritize most relevant matches
-        ],
-        "suggest": {
+        "size": size or Config.SEARCH_PAGE_SIZE,
+        "sort": SEARCH_SORT,  # Prioritize most relevant matches
+        "track_scores": True,
+        "track_total_hits": False,  # Counting every match is not needed to page with search_after
+        "_source": RESULT_FIELDS,
+        "highlight": {
+            "fields": {
+                "content": {"fragment_size": Config.SEARCH_FRAGMENT_SIZE, "number_of_fragments": Config.SEARCH_FRAGMENTS},
+                "summary": {"fragment_size": Config.SEARCH_FRAGMENT_SIZE, "number_of_fragments": 1, "no_match_size": Config.SEARCH_FRAGMENT_SIZE}
+            },
+            # The prefix/infix clauses match on subfields; still mark those terms in the text
+            "require_field_match": False
+        }
+    }
+
+    if Config.SEARCH_MIN_SCORE:
+        search_query["min_score"] = Config.SEARCH_MIN_SCORE
+
+    # title_suggest has a user_id context, and completion queries on it must name one
+    if filters and filters.get("user_id"):
+        search_query["suggest"] = {
             "doc-suggest": {
                 "prefix": query.lower(),
-                "completion": {"field": "title_suggest"}
+                "completion": {"field": "title_suggest", "contexts": {"user_id": [filters["user_id"]]}}
             }
         }
-    }
 
     # Add filters if provided (e.g., date range, user_id)
     if filters:
@@ -146,8 +358,132 @@ def search_documents(query: str, filters: dict = None):
             else:  # Exact match filter
                 search_query["query"]["bool"]["filter"].append({"term": {key: value}})
 
+    return search_query
+
+
+def apply_relevance_threshold(hits: list, cutoff: float = None) -> list:
+    """
+    Drops hits scoring below SEARCH_RELATIVE_SCORE of the best hit. Scores are not
+    comparable across queries, so a fixed cutoff is either too strict for short
+    queries or lets noise through for long ones. Later pages pass the first page's cutoff.
+    """
+    if not hits:
+        return hits
+    if cutoff is None:
+        cutoff = hits[0]["_score"] * Config.SEARCH_RELATIVE_SCORE
+    return [hit for hit in hits if hit["_score"] >= cutoff]
+
+
+def _search_result(hit: dict) -> dict:
+    return {**hit["_source"], "score": hit["_score"], "highlights": hit.get("highlight", {})}
+
+
+def encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Raises ValueError for a cursor that was not produced by encode_cursor."""
     try:
-        result = es.search(index="documents", body=search_query)
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(state.get("after"), list) or "cutoff" not in state:
+            raise ValueError
+        return state
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+
+def _next_cursor(raw_hits: list, hits: list, size: int, cutoff: float, pit_id: str = None) -> str:
+    # A short page, or one cut by the relevance threshold, is the last one
+    if not hits or len(raw_hits) < size or len(hits) < len(raw_hits):
+        return None
+    return encode_cursor({"after": raw_hits[-1]["sort"], "cutoff": cutoff, "pit": pit_id})
+
+
+async def _close_pit(pit_id: str):
+    try:
+        await get_async_es().close_point_in_time(id=pit_id)
+    except Exception as e:
+        logger.warning("Error closing point in time", extra={"error": str(e)})
+
+
+async def _search_page(query: str, filters: dict, size: int, cursor: str, raise_on_error: bool = False) -> dict:
+    """
+    Pages 2+ of a search. They read from a point in time opened on the first follow-up
+    request and carried in the cursor, so later pages are consistent with each other
+    while documents keep being indexed.
+    """
+    state = decode_cursor(cursor)
+    es = get_async_es()
+    pit_id = state.get("pit")
+
+    try:
+        if pit_id is None:
+            # The point in time only covers the shards the routing selects
+            pit_id = (await es.open_point_in_time(
+                index=INDEX_NAME,
+                keep_alive=Config.SEARCH_PIT_KEEP_ALIVE,
+                routing=_search_routing(filters),
+            ))["id"]
+
+        body = build_search_query(query, filters, size)
+        body.pop("suggest", None)
+        body["pit"] = {"id": pit_id, "keep_alive": Config.SEARCH_PIT_KEEP_ALIVE}
+        body["search_after"] = state["after"]
+        with metrics.span("elasticsearch", "search"):
+            result = await es.search(body=body)
+        pit_id = result.get("pit_id", pit_id)
+
+        raw_hits = result["hits"]["hits"]
+        hits = apply_relevance_threshold(raw_hits, state["cutoff"])
+        next_cursor = _next_cursor(raw_hits, hits, size, state["cutoff"], pit_id)
+        if next_cursor is None:
+            await _close_pit(pit_id)
+        return {"documents": [_search_result(hit) for hit in hits], "suggestions": [], "next_cursor": next_cursor}
+
+    except Exception as e:
+        logger.error("Error searching documents", extra={"error": str(e)})
+        if raise_on_error:
+            raise
+        return {"documents": [], "suggestions": [], "next_cursor": None}
+
+
+def _search_routing(filters: dict):
+    # User-scoped searches only need the shards holding that user's documents
+    user_id = (filters or {}).get("user_id")
+    return user_routing(user_id) if user_id else None
+
+
+async def search_documents(query: str, filters: dict = None, size: int = None, cursor: str = None, raise_on_error: bool = False):
+    """
+    Enhanced search with proper fuzzy matching and filter handling.
+    Runs on the async client; repeated queries are served from an in-process TTL cache
+    that is invalidated per user whenever that user's documents are indexed.
+
+    Returns metadata and highlighted fragments per hit plus a next_cursor; pass it
+    back as cursor (with the same query and filters) for the next page.
+    Cluster errors return empty results unless raise_on_error is set (used for fallback).
+
+    :raises ValueError: If cursor is malformed
+    """
+    if not query or len(query) < 2:  # Ignore very short/random queries
+        return {"documents": [], "suggestions": [], "next_cursor": None}
+
+    size = size or Config.SEARCH_PAGE_SIZE
+    if cursor:
+        return await _search_page(query, filters, size, cursor, raise_on_error)
+
+    cache_key = _cache_key(query, filters) + (size,)
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        # Shared with other callers, treat as read-only
+        return cached
+
+    search_query = build_search_query(query, filters, size)
+
+    try:
+        with metrics.span("elasticsearch", "search"):
+            result = await get_async_es().search(index=INDEX_NAME, body=search_query, routing=_search_routing(filters))
 
         # Extract suggestions safely
         suggestions = []
@@ -157,15 +493,112 @@ def search_documents(query: str, filters: dict = None):
                 for option in result["suggest"]["doc-suggest"][0].get("options", [])
             ]
 
-        # Extract valid documents with a score threshold (avoid garbage results)
-        documents = [
-            hit["_source"]
-            for hit in result["hits"]["hits"]
-            if hit["_score"] > 1.5  # Ignore extremely weak matches
-        ]
+        # Extract valid documents with a relevance threshold (avoid garbage results)
+        raw_hits = result["hits"]["hits"]
+        hits = apply_relevance_threshold(raw_hits)
+        cutoff = hits[0]["_score"] * Config.SEARCH_RELATIVE_SCORE if hits else None
+
+        results = {
+            "documents": [_search_result(hit) for hit in hits],
+            "suggestions": suggestions,
+            "next_cursor": _next_cursor(raw_hits, hits, size, cutoff),
+        }
+        _result_cache.set(cache_key, results)
+        return results
+
+    except Exception as e:
+        logger.error("Error searching documents", extra={"error": str(e)})
+        if raise_on_error:
+            raise
+        return {"documents": [], "suggestions": [], "next_cursor": None}
+
+
+async def get_document_text(user_id: str, document_id: str):
+    """
+    Full extracted text and summary of one indexed document, for the detail view.
+    Returns None if the document is not indexed.
+    """
+    from elasticsearch import NotFoundError
+
+    with metrics.span("elasticsearch", "get"):
+        try:
+            result = await get_async_es().get(
+                index=INDEX_NAME,
+                id=f"{user_id}_{document_id}",
+                routing=document_routing(user_id, document_id),
+                _source_includes=["document_id", "user_id", "title", "content", "summary", "timestamp"],
+            )
+        except NotFoundError:
+            return None
+    return result["_source"]
 
-        return {"documents": documents, "suggestions": suggestions}
 
+async def suggest_titles(prefix: str, user_id: str, mode: str = "completion", size: int = 5, raise_on_error: bool = False):
+    """
+    Autocomplete for the search box. Only touches the completion suggester (or the
+    search_as_you_type field with mode="prefix"), never the full-text query.
+
+    :param prefix: What the user has typed so far
+    :param user_id: Owner of the suggested documents; the completion contexts need it
+    :param mode: "completion" (FST suggester) or "prefix" (search_as_you_type bool_prefix)
+    :param size: Maximum number of suggestions
+    """
+    if not user_id:
+        raise ValueError("Suggestions are scoped to a user; user_id is required")
+    prefix = " ".join(prefix.lower().split())
+    if not prefix:
+        return []
+
+    cache_key = (user_id, f"suggest:{mode}:{size}:{prefix}", "")
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if mode == "prefix":
+        body = {
+            "size": size,
+            "_source": ["document_id", "title"],
+            "query": {
+                "bool": {
+                    "must": {
+                        "multi_match": {
+                            "query": prefix,
+                            "type": "bool_prefix",
+                            "fields": ["title.sayt", "title.sayt._2gram", "title.sayt._3gram"]
+                        }
+                    },
+                    "filter": [{"term": {"user_id": user_id}}]
+                }
+            }
+        }
+    else:
+        completion = {
+            "field": "title_suggest", "size": size, "skip_duplicates": True, "contexts": {"user_id": [user_id]},
+        }
+        body = {
+            "size": 0,
+            "_source": ["document_id", "title"],
+            "suggest": {"title-suggest": {"prefix": prefix, "completion": completion}}
+        }
+
+    try:
+        with metrics.span("elasticsearch", "suggest", mode=mode):
+            result = await get_async_es().search(
+                index=INDEX_NAME, body=body, request_cache=True, routing=user_routing(user_id)
+            )
     except Exception as e:
-        print(f"Error searching documents: {str(e)}")
-        return {"documents": [], "suggestions": []}
+        logger.error("Error fetching suggestions", extra={"error": str(e)})
+        if raise_on_error:
+            raise
+        return []
+
+    if mode == "prefix":
+        hits = result["hits"]["hits"]
+    else:
+        hits = result.get("suggest", {}).get("title-suggest", [{}])[0].get("options", [])
+    suggestions = [
+        {"text": hit["_source"].get("title"), "document_id": hit["_source"].get("document_id")}
+        for hit in hits
+    ]
+    _result_cache.set(cache_key, suggestions, ttl=Config.SUGGEST_CACHE_TTL)
+    return suggestions
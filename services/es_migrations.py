@@ -0,0 +1,154 @@
+# elasticsearch mapping migrations
+#
+# The application reads and writes through the INDEX_NAME alias. Each mapping version
+# lives in its own concrete index (documents_v2, documents_v3, ...). Migrating creates
+# the new index, copies documents with _reindex and swaps the alias atomically.
+#
+# Run with: python -m services.es_migrations [--delete-old] [--tenant-aliases]
+
+import argparse
+from config import Config
+from services.clients import get_es
+from services.elasticsearch import (
+    INDEX_NAME,
+    INDEX_SETTINGS,
+    MAPPING_VERSION,
+    TENANT_ALIAS_PREFIX,
+    index_version,
+    tenant_alias_action,
+    versioned_index_name,
+)
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rebuilds fields whose shape changed between versions and routes every document by
+# tenant, matching services.elasticsearch.document_routing (params.splits = ES_TENANT_SPLITS)
+REINDEX_SCRIPT = """
+if (ctx._source.title != null) {
+  ctx._source.title_suggest = ['input': ctx._source.title, 'contexts': ['user_id': [ctx._source.user_id]]];
+}
+String user = ctx._source.user_id;
+if (user != null) {
+  def splits = params.splits.get(user);
+  int split = (splits == null || splits <= 1) ? 0 : Math.floorMod(ctx._source.document_id.hashCode(), (int) splits);
+  ctx._routing = split == 0 ? user : user + '#' + split;
+}
+"""
+
+
+def current_index():
+    """
+    Concrete index currently serving INDEX_NAME: the alias target, the legacy
+    un-versioned index, or None if nothing exists yet.
+    """
+    es = get_es()
+    if es.indices.exists_alias(name=INDEX_NAME):
+        targets = list(es.indices.get_alias(name=INDEX_NAME).keys())
+        return max(targets, key=index_version)
+    if es.indices.exists(index=INDEX_NAME):
+        return INDEX_NAME
+    return None
+
+
+def migrate_index(version: int = MAPPING_VERSION, delete_old: bool = False) -> dict:
+    """
+    Moves the INDEX_NAME alias to the index for the given mapping version.
+
+    Documents written to the old index while _reindex runs are not copied; run
+    POST /api/reindex afterwards (or migrate during a quiet period) to catch up.
+    """
+    from elasticsearch import BadRequestError
+
+    es = get_es()
+    source = current_index()
+    target = versioned_index_name(version)
+    if source == target:
+        return {"source": source, "target": target, "copied": 0}
+
+    if not es.indices.exists(index=target):
+        logger.info("Creating index", extra={"index": target, "mapping_version": version})
+        try:
+            es.indices.create(index=target, body=INDEX_SETTINGS)
+        except BadRequestError as e:
+            # Another replica creating the first index at the same time is not an error
+            if e.error != "resource_already_exists_exception":
+                raise
+
+    copied = 0
+    if source is not None:
+        logger.info("Reindexing", extra={"source": source, "target": target})
+        response = es.options(request_timeout=Config.ES_MIGRATION_TIMEOUT).reindex(
+            body={
+                "source": {"index": source, "size": Config.INDEX_BATCH_SIZE},
+                "dest": {"index": target},
+                "script": {"source": REINDEX_SCRIPT, "lang": "painless", "params": {"splits": Config.ES_TENANT_SPLITS}},
+            },
+            wait_for_completion=True,
+            refresh=True,
+        )
+        copied = response.get("created", 0) + response.get("updated", 0)
+        if response.get("failures"):
+            raise RuntimeError(f"Reindex into {target} failed: {response['failures'][:5]}")
+
+    actions = [{"add": {"index": target, "alias": INDEX_NAME}}]
+    # Tenant aliases follow the main alias, with routing recomputed for the new index
+    actions += [tenant_alias_action(user_id, target) for user_id in _tenant_alias_users(source)]
+    if source == INDEX_NAME:
+        # Legacy concrete index has the alias name; drop it in the same atomic update
+        actions.insert(0, {"remove_index": {"index": source}})
+    elif source is not None:
+        actions.insert(0, {"remove": {"index": source, "alias": INDEX_NAME}})
+    es.indices.update_aliases(body={"actions": actions})
+    logger.info("Alias moved", extra={"alias": INDEX_NAME, "target": target, "copied": copied})
+
+    if delete_old and source not in (None, INDEX_NAME):
+        es.indices.delete(index=source)
+
+    return {"source": source, "target": target, "copied": copied}
+
+
+def _tenant_alias_users(index: str) -> list:
+    """User ids of the per-tenant aliases currently on index."""
+    if index is None:
+        return []
+    aliases = get_es().indices.get_alias(index=index).get(index, {}).get("aliases", {})
+    return [
+        alias["filter"]["term"]["user_id"]
+        for name, alias in aliases.items()
+        if name.startswith(TENANT_ALIAS_PREFIX) and "filter" in alias
+    ]
+
+
+def create_tenant_aliases() -> int:
+    """Creates a filtered, routed alias for every user with indexed documents."""
+    es = get_es()
+    index = current_index()
+    created = 0
+    after = None
+    while True:
+        composite = {"size": 500, "sources": [{"user_id": {"terms": {"field": "user_id"}}}]}
+        if after:
+            composite["after"] = after
+        response = es.search(index=INDEX_NAME, body={"size": 0, "aggs": {"users": {"composite": composite}}})
+        buckets = response["aggregations"]["users"]["buckets"]
+        if not buckets:
+            return created
+        es.indices.update_aliases(body={"actions": [
+            tenant_alias_action(bucket["key"]["user_id"], index) for bucket in buckets
+        ]})
+        created += len(buckets)
+        after = response["aggregations"]["users"].get("after_key")
+        if after is None:
+            return created
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the search index to a new mapping version")
+    parser.add_argument("--version", type=int, default=MAPPING_VERSION)
+    parser.add_argument("--delete-old", action="store_true", help="Delete the previous versioned index")
+    parser.add_argument("--tenant-aliases", action="store_true", help="Create a filtered alias per user afterwards")
+    args = parser.parse_args()
+    print(migrate_index(args.version, args.delete_old))
+    if args.tenant_aliases:
+        print(f"Created {create_tenant_aliases()} tenant aliases")
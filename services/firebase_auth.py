@@ -0,0 +1,23 @@
+# firebase auth
+
+from fastapi import Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from services.clients import get_firebase_app
+
+
+async def get_current_user(authorization: str = Header(None)) -> str:
+    """
+    Verifies the Firebase ID token from the "Authorization: Bearer <token>" header
+    and returns the user's uid.
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+
+    from firebase_admin import auth
+
+    token = authorization.split(" ", 1)[1]
+    try:
+        decoded = await run_in_threadpool(auth.verify_id_token, token, get_firebase_app())
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    return decoded["uid"]
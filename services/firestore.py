@@ -1,13 +1,180 @@
 # firestore
 
-from database import db
+import json
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+from database import get_db, get_async_db
+from utils import metrics
+from utils.logger import get_logger
 
-def update_document_status(user_id: str, document_id: str, update_data: dict):
-    doc_ref = db.collection("users").document(user_id).collection("documents").document(document_id)
-    doc_ref.update(update_data)  
+logger = get_logger(__name__)
 
-def get_user_documents(user_id: str):
-    docs_ref = db.collection("users").document(user_id).collection("documents")
-    docs = docs_ref.stream()  
+# Fields returned by list views; ocr_text and summary are only sent when asked for
+LIST_FIELDS = ["file_name", "file_size", "status", "uploaded_at", "user_id", "document_id"]
+
+class StatusWriter:
+    """
+    Coalesces status updates per document and writes them with a Firestore BulkWriter.
+
+    Updates to the same document within STATUS_COALESCE_WINDOW seconds are merged
+    into one write (later fields win). BulkWriter applies the 500/50/5 ramp-up,
+    caps throughput at STATUS_MAX_OPS_PER_SECOND and retries transient failures
+    (RESOURCE_EXHAUSTED, UNAVAILABLE, ABORTED, DEADLINE_EXCEEDED) with backoff; other
+    failures, such as NOT_FOUND for a deleted document, are logged and dropped at once.
+    flush() writes everything pending before returning, for callers that need to read
+    their own writes.
+    """
+
+    def __init__(self):
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.stats = {"updates": 0, "writes": 0, "failed": 0, "flushes": 0}
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+                self._thread.start()
+
+    def update(self, user_id: str, document_id: str, update_data: dict):
+        with self._cond:
+            key = (user_id, document_id)
+            self._pending[key] = self._pending.get(key, {}) | update_data
+            self.stats["updates"] += 1
+            self._cond.notify_all()
+        self.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                stopping = self._stopping
+            if not stopping:
+                # Let further transitions for the same documents pile up before writing
+                time.sleep(Config.STATUS_COALESCE_WINDOW)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Error flushing status updates", extra={"error": str(e)})
+            if stopping:
+                return
+
+    def flush(self):
+        """Writes every pending update and waits for Firestore to acknowledge them."""
+        from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+        from google.rpc import code_pb2
+
+        retryable = {code_pb2.RESOURCE_EXHAUSTED, code_pb2.UNAVAILABLE, code_pb2.ABORTED, code_pb2.DEADLINE_EXCEEDED}
+
+        with self._flush_lock:
+            with self._cond:
+                pending, self._pending = self._pending, OrderedDict()
+            if not pending:
+                return
+
+            failed = []
+
+            def on_write_error(error, bulk_writer) -> bool:
+                # Returning True retries; BulkWriter backs off between attempts
+                if error.code in retryable and error.attempts < Config.STATUS_MAX_RETRIES:
+                    return True
+                failed.append(error)
+                return False
+
+            db = get_db()
+            writer = db.bulk_writer(options=BulkWriterOptions(
+                initial_ops_per_second=min(500, Config.STATUS_MAX_OPS_PER_SECOND),
+                max_ops_per_second=Config.STATUS_MAX_OPS_PER_SECOND,
+            ))
+            writer.on_write_error(on_write_error)
+            for (user_id, document_id), update_data in pending.items():
+                doc_ref = db.collection("users").document(user_id).collection("documents").document(document_id)
+                writer.update(doc_ref, update_data)
+            with metrics.span("firestore", "bulk_write", documents=len(pending)):
+                writer.close()
+
+            self.stats["writes"] += len(pending) - len(failed)
+            self.stats["failed"] += len(failed)
+            self.stats["flushes"] += 1
+            for error in failed:
+                logger.error("Error updating document status", extra={
+                    "path": error.operation.reference.path, "code": error.code, "error": error.message,
+                })
+
+    def stop(self):
+        """Writes the remaining updates and stops the background flusher."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+
+_status_writer = StatusWriter()
+
+
+def get_status_writer() -> StatusWriter:
+    return _status_writer
+
+
+def update_document_status(user_id: str, document_id: str, update_data: dict, wait: bool = False):
+    """
+    Queues a status update. Updates to the same document are coalesced and written in bulk.
+
+    :param wait: Flush before returning, so a following read sees this update
+    """
+    _status_writer.update(user_id, document_id, update_data)
+    if wait:
+        _status_writer.flush()
+
+def get_user_documents(user_id: str, limit: int = None, fields: list = None):
+    docs_ref = get_db().collection("users").document(user_id).collection("documents")
+    query = docs_ref.select(fields or LIST_FIELDS)
+    if limit:
+        query = query.limit(limit)
+    docs = query.stream()  
 
     return [doc.to_dict() | {"id": doc.id} for doc in docs] 
+
+
+def _user_documents_query(user_id: str, fields: list = None):
+    docs_ref = get_async_db().collection("users").document(user_id).collection("documents")
+    # Ordering by document id gives a stable cursor for start_after
+    return docs_ref, docs_ref.select(fields or LIST_FIELDS).order_by("__name__")
+
+
+async def list_user_documents(user_id: str, limit: int = 50, start_after: str = None, fields: list = None) -> dict:
+    """
+    One page of a user's documents, projected to `fields` (LIST_FIELDS by default).
+
+    :param user_id: Owner of the documents
+    :param limit: Page size
+    :param start_after: Document id returned as next_cursor by the previous page
+    :param fields: Fields to return; include "ocr_text" explicitly if it is needed
+    :return: {"documents": [...], "next_cursor": id or None}
+    """
+    docs_ref, query = _user_documents_query(user_id, fields)
+    if start_after:
+        # Only the reference is needed for a __name__ cursor, so fetch no fields
+        cursor = await docs_ref.document(start_after).get(field_paths=[])
+        query = query.start_after(cursor)
+
+    documents = [doc.to_dict() | {"id": doc.id} async for doc in query.limit(limit).stream()]
+    next_cursor = documents[-1]["id"] if len(documents) == limit else None
+    return {"documents": documents, "next_cursor": next_cursor}
+
+
+async def stream_user_documents(user_id: str, fields: list = None):
+    """Yields every document of a user as NDJSON lines, for large exports."""
+    _, query = _user_documents_query(user_id, fields)
+    async for doc in query.stream():
+        yield json.dumps(doc.to_dict() | {"id": doc.id}, default=str) + "\n"
@@ -1,13 +1,14 @@
 #summarize using gemini
 
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Configure API Key
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import Config
+from services import cache
+from services.clients import get_generative_model
+from utils import metrics
+from utils.ratelimit import RateLimiter
 
 # Dictionary of summary prompts by type
 SUMMARY_PROMPTS = {
@@ -22,34 +23,248 @@ SUMMARY_PROMPTS = {
     "scientific": "Summarize this research paper and highlight its main findings",
     "business": "Summarize this business report, highlighting key financial insights",
     "multi_language": "Summarize the following text (in multiple languages if needed)",
+    "combine": "Combine the following partial summaries of consecutive sections into one coherent summary without repeating points",
     # Add more ia needed
 }
 
-def summarize_text(text: str, summary_type: str = "basic", summary_language: str = "English") -> str:
+MODEL_NAME = "gemini-1.5-pro"
+
+# Rough chars-per-token ratio for Gemini on mostly-English OCR text
+CHARS_PER_TOKEN = 4
+
+# Separates pages in extracted text; split_text prefers to cut chunks here
+PAGE_BREAK = "\f"
+
+# Caps concurrent Gemini calls across all jobs, not just within one document
+_gemini_slots = threading.BoundedSemaphore(Config.SUMMARY_CONCURRENCY)
+
+# Keeps the whole process under the Gemini requests-per-minute quota
+_gemini_rate = RateLimiter(Config.GEMINI_REQUESTS_PER_MINUTE / 60)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_text(text: str, max_tokens: int) -> list:
+    """
+    Splits text into chunks of at most max_tokens, breaking on page then paragraph
+    boundaries and only cutting inside a paragraph when it is larger than the budget.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for page in text.split(PAGE_BREAK):
+        for paragraph in re.split(r"\n\s*\n", page):
+            paragraph = paragraph.strip()
+            while len(paragraph) > max_chars:
+                # Prefer cutting at the last whitespace inside the budget
+                cut = paragraph.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(paragraph[:cut])
+                paragraph = paragraph[cut:].strip()
+            if paragraph:
+                pieces.append(paragraph)
+
+    chunks = []
+    current = []
+    current_len = 0
+    for piece in pieces:
+        if current and current_len + len(piece) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+        current.append(piece)
+        current_len += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _generate(prompt: str, on_token=None) -> str:
+    _gemini_rate.acquire()
+    with _gemini_slots:
+        model = get_generative_model(MODEL_NAME)
+        if on_token is None:
+            with metrics.span("gemini", "generate", prompt_chars=len(prompt)):
+                response = model.generate_content(prompt)
+            return response.text.strip()
+
+        # Streamed: hand each text delta to on_token as Gemini produces it
+        parts = []
+        with metrics.span("gemini", "generate_stream", prompt_chars=len(prompt)):
+            for chunk in model.generate_content(prompt, stream=True):
+                parts.append(chunk.text)
+                on_token(chunk.text)
+    return "".join(parts).strip()
+
+
+def _build_prompt(prompt_template: str, summary_language: str, text: str) -> str:
+    # We specify the summary language in the instructions to the model
+    return f"{prompt_template} in {summary_language}:\n\n{text}"
+
+
+def iter_chunk_summaries(chunks: list, summary_language: str = "English", prompt_template: str = SUMMARY_PROMPTS["chunked"]):
+    """
+    Summarizes chunks concurrently and yields (index, summary) as each one completes.
+    Pass SUMMARY_PROMPTS["combine"] as prompt_template when the chunks are groups of partial summaries.
+    """
+    with ThreadPoolExecutor(max_workers=Config.SUMMARY_CONCURRENCY, thread_name_prefix="summarize") as executor:
+        futures = {
+            executor.submit(_generate, _build_prompt(prompt_template, summary_language, chunk)): index
+            for index, chunk in enumerate(chunks)
+        }
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def reduce_summaries(partials: list, prompt_template: str, summary_language: str = "English", on_token=None) -> str:
+    """
+    Hierarchically merges ordered partial summaries until they fit a single prompt,
+    then produces the final summary with the requested prompt (streamed to on_token if given).
+    """
+    budget = Config.SUMMARY_CHUNK_TOKENS
+    while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > budget:
+        groups = []
+        for summary in partials:
+            if groups and len(groups[-1]) < Config.SUMMARY_REDUCE_FANIN and \
+                    estimate_tokens("\n\n".join(groups[-1] + [summary])) <= budget:
+                groups[-1].append(summary)
+            else:
+                groups.append([summary])
+        if len(groups) == len(partials):
+            # Every partial already fills the budget, merge pairwise to make progress
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+
+        merged = [None] * len(groups)
+        groups = ["\n\n".join(group) for group in groups]
+        for index, summary in iter_chunk_summaries(groups, summary_language, SUMMARY_PROMPTS["combine"]):
+            merged[index] = summary
+        partials = merged
+
+    return _generate(_build_prompt(prompt_template, summary_language, "\n\n".join(partials)), on_token)
+
+
+def iter_chunked_summary(text: str, summary_type: str = "basic", summary_language: str = "English", on_token=None):
+    """
+    Map-reduce summarization for documents larger than SUMMARY_CHUNK_TOKENS.
+
+    Yields {"type": "chunk", "index", "total", "summary"} events as chunk summaries complete,
+    followed by a single {"type": "summary", "summary"} event with the reduced result.
+    """
+    prompt_template = SUMMARY_PROMPTS.get(summary_type.lower(), SUMMARY_PROMPTS["basic"])
+    chunks = split_text(text, Config.SUMMARY_CHUNK_TOKENS)
+    partials = [None] * len(chunks)
+    for index, summary in iter_chunk_summaries(chunks, summary_language):
+        partials[index] = summary
+        yield {"type": "chunk", "index": index, "total": len(chunks), "summary": summary}
+
+    yield {"type": "summary", "summary": reduce_summaries(partials, prompt_template, summary_language, on_token)}
+
+
+def summarize_stream(pieces, summary_type: str = "basic", summary_language: str = "English", on_progress=None, on_token=None) -> str:
+    """
+    Summarizes text that arrives in pieces, such as OCR pages, in order.
+    Once more than SUMMARY_CHUNK_TOKENS have arrived, full chunks are summarized while
+    later pieces are still being produced; the partial summaries are reduced at the end.
+    Text that arrives in one piece, or fits one chunk, goes through summarize_text and its cache.
+    :param pieces: Iterable of text pieces; its exceptions propagate to the caller
+    :param summary_type: One of the keys in SUMMARY_PROMPTS or defaults to "basic"
+    :param summary_language: The desired language of the summary
+    :param on_progress: Optional callback(done, total) invoked as chunk summaries complete
+    :param on_token: Optional callback(text) receiving the final summary as it is generated
+    :return: The summary text or an error message
+    """
+    budget = Config.SUMMARY_CHUNK_TOKENS
+    prompt_template = SUMMARY_PROMPTS["chunked"]
+    texts = []
+    buffer = ""
+    futures = []
+    start = None
+
+    with ThreadPoolExecutor(max_workers=Config.SUMMARY_CONCURRENCY, thread_name_prefix="summarize") as executor:
+        try:
+            for piece in pieces:
+                # Only cut chunks once more text has arrived, so text that comes in a
+                # single piece (e.g. an OCR cache hit) still reaches the summary cache
+                if estimate_tokens(buffer) > budget:
+                    start = start or time.perf_counter()
+                    chunks = split_text(buffer, budget)
+                    buffer = chunks.pop()
+                    futures.extend(
+                        executor.submit(_generate, _build_prompt(prompt_template, summary_language, chunk))
+                        for chunk in chunks
+                    )
+                texts.append(piece)
+                buffer = f"{buffer}{PAGE_BREAK}{piece}" if buffer else piece
+
+            text = PAGE_BREAK.join(texts).strip()
+            if not futures:
+                return summarize_text(text, summary_type, summary_language, on_progress=on_progress, on_token=on_token)
+
+            try:
+                futures.extend(
+                    executor.submit(_generate, _build_prompt(prompt_template, summary_language, chunk))
+                    for chunk in split_text(buffer, budget)
+                )
+                for done, _ in enumerate(as_completed(futures), start=1):
+                    if on_progress:
+                        on_progress(done, len(futures))
+                partials = [future.result() for future in futures]
+
+                final_template = SUMMARY_PROMPTS.get(summary_type.lower(), SUMMARY_PROMPTS["basic"])
+                summary = reduce_summaries(partials, final_template, summary_language, on_token)
+            except Exception as e:
+                return f"Error: {str(e)}"
+        finally:
+            for future in futures:
+                future.cancel()
+
+    cache.record_compute("summary", time.perf_counter() - start)
+    cache.put_summary(cache.text_key(text), summary_type, summary_language, summary)
+    return summary
+
+
+def summarize_text(text: str, summary_type: str = "basic", summary_language: str = "English", cache_key: str = None, on_progress=None, on_token=None) -> str:
     """
     Summarizes the given text using Google Gemini 1.5 Pro.
+    Texts above SUMMARY_CHUNK_TOKENS are summarized chunk by chunk and reduced.
     :param text: The text to be summarized
     :param summary_type: One of the keys in SUMMARY_PROMPTS or defaults to "basic"
     :param summary_language: The desired language of the summary (e.g., "English", "Spanish", etc.)
+    :param cache_key: Content hash to cache the summary under, defaults to a hash of the text
+    :param on_progress: Optional callback(done, total) invoked as chunk summaries complete
+    :param on_token: Optional callback(text) receiving the final summary as Gemini streams it
     :return: The summary text or an error message
     """
+    cache_key = cache_key or cache.text_key(text)
+    cached_summary = cache.get_summary(cache_key, summary_type, summary_language)
+    if cached_summary is not None:
+        if on_token:
+            on_token(cached_summary)
+        return cached_summary
+
     try:
-        # Retrieve the prompt template based on summary_type, fallback to "basic"
-        prompt_template = SUMMARY_PROMPTS.get(summary_type.lower(), SUMMARY_PROMPTS["basic"])
-        
-        # Construct final prompt
-        # We specify the summary language in the instructions to the model
-        final_prompt = (
-            f"{prompt_template} in {summary_language}:\n\n"
-            f"{text}"
-        )
-
-        # Create the Gemini 1.5 Pro model
-        model = genai.GenerativeModel("gemini-1.5-pro")
-
-        # Generate the content
-        response = model.generate_content(final_prompt)
-
-        return response.text.strip()
+        start = time.perf_counter()
+        if estimate_tokens(text) > Config.SUMMARY_CHUNK_TOKENS:
+            done = 0
+            for event in iter_chunked_summary(text, summary_type, summary_language, on_token):
+                if event["type"] == "chunk":
+                    done += 1
+                    if on_progress:
+                        on_progress(done, event["total"])
+                else:
+                    summary = event["summary"]
+        else:
+            # Retrieve the prompt template based on summary_type, fallback to "basic"
+            prompt_template = SUMMARY_PROMPTS.get(summary_type.lower(), SUMMARY_PROMPTS["basic"])
+            summary = _generate(_build_prompt(prompt_template, summary_language, text), on_token)
+        cache.record_compute("summary", time.perf_counter() - start)
+
+        # Errors are returned as text, so only successful summaries are cached
+        cache.put_summary(cache_key, summary_type, summary_language, summary)
+        return summary
     except Exception as e:
         return f"Error: {str(e)}"
@@ -1,30 +1,59 @@
-from google.cloud import vision, storage
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-import os
+from services import cache
+from services.clients import get_bucket, get_vision_client
+# Pages of extracted text are joined with the separator summarization chunks at
+from services.gcp_summarization import PAGE_BREAK
+from services.image_preprocessing import MULTI_FRAME_TYPES, count_frames, preprocess_image
+from services.storage import StorageSession, StoredObject
+from utils import metrics
+from utils.logger import get_logger
+import re
 import mimetypes
 import json
+import time
+
+try:
+    # Incremental parser: pulls out the text fields without building the full annotation tree
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = get_logger(__name__)
 
 bucket_name = Config.STORAGE_BUCKET
 
+# Most pages the synchronous batch_annotate_files call accepts per file
+MAX_SYNC_FILE_PAGES = 5
+
 def process_pdf(gcs_file_path: str, client, user_id, document_id) -> str:
     """
     Processes a PDF stored in Google Cloud Storage using Google Cloud Vision API.
     """
-    print(f"Processing PDF for user: {user_id}, document: {document_id}")
+    return PAGE_BREAK.join(iter_pdf_pages(gcs_file_path, client, user_id, document_id)).strip()
+
+
+def _pdf_request(gcs_file_path: str, output_folder: str, mime_type: str = "application/pdf"):
+    """Builds the async OCR request for one file, clearing stale output shards first."""
+    from google.cloud import vision
 
     feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
-    
-    # Ensure proper output folder path (ending with '/')
-    output_folder = f"processed_results/{user_id}/{document_id}/"
-    
+
     # Correctly set the GCS destination folder
     output_uri_prefix = f"gs://{bucket_name}/{output_folder}"
 
-    async_request = vision.AsyncAnnotateFileRequest(
+    # Shards left over from an earlier run would be streamed before the new ones arrive
+    bucket = get_bucket(bucket_name)
+    stale = list(bucket.list_blobs(prefix=output_folder))
+    if stale:
+        bucket.delete_blobs(stale)
+
+    return vision.AsyncAnnotateFileRequest(
         features=[feature],
         input_config=vision.InputConfig(
             gcs_source=vision.GcsSource(uri=f"gs://{bucket_name}/{gcs_file_path}"),
-            mime_type="application/pdf"
+            mime_type=mime_type
         ),
         output_config=vision.OutputConfig(
             gcs_destination=vision.GcsDestination(uri=output_uri_prefix),
@@ -32,15 +61,180 @@ def process_pdf(gcs_file_path: str, client, user_id, document_id) -> str:
         )
     )
 
+
+def _annotate_file_pages(gcs_file_path: str, pages: list, client, mime_type: str = "application/pdf") -> tuple:
+    """
+    Runs DOCUMENT_TEXT_DETECTION synchronously on a page range of a PDF/TIFF in GCS.
+
+    Args:
+        gcs_file_path (str): Path of the file in the bucket.
+        pages (list): 1-based page numbers, at most MAX_SYNC_FILE_PAGES. None lets
+            Vision pick the first MAX_SYNC_FILE_PAGES pages, which is safe for short files.
+        client: Google Cloud Vision API client.
+        mime_type (str): "application/pdf" or "image/tiff".
+
+    Returns:
+        tuple: (text of each processed page in order, total page count of the file)
+    """
+    from google.cloud import vision
+
+    request = vision.AnnotateFileRequest(
+        input_config=vision.InputConfig(
+            gcs_source=vision.GcsSource(uri=f"gs://{bucket_name}/{gcs_file_path}"),
+            mime_type=mime_type
+        ),
+        features=[vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)],
+        pages=pages or [],
+    )
+    with metrics.span("vision", "annotate_file_pages", path=gcs_file_path, pages=len(pages or [])):
+        file_response = client.batch_annotate_files(requests=[request]).responses[0]
+    if file_response.error.message:
+        raise RuntimeError(f"Error in Vision API: {file_response.error.message}")
+
+    texts = []
+    for page_response in file_response.responses:
+        if page_response.error.message:
+            raise RuntimeError(f"Error in Vision API: {page_response.error.message}")
+        texts.append(page_response.full_text_annotation.text)
+    return texts, file_response.total_pages
+
+
+def iter_file_shards(gcs_file_path: str, client, mime_type: str = "application/pdf"):
+    """
+    OCRs a multi-page file as page-range shards of VISION_PDF_SHARD_PAGES pages, with up
+    to VISION_PDF_SHARD_WORKERS shards in flight, and yields each shard's page texts
+    (blank pages dropped) in page order as soon as it and every earlier shard are done.
+
+    The first shard also returns the page count, so the rest are submitted after it.
+    """
+    shard_pages = min(Config.VISION_PDF_SHARD_PAGES, MAX_SYNC_FILE_PAGES)
+    texts, total_pages = _annotate_file_pages(gcs_file_path, None, client, mime_type)
+    yield [text for text in texts if text]
+
+    ranges = [
+        list(range(first, min(first + shard_pages, total_pages + 1)))
+        for first in range(len(texts) + 1, total_pages + 1, shard_pages)
+    ]
+    if not ranges:
+        return
+    logger.info("Sharded OCR", extra={"path": gcs_file_path, "pages": total_pages, "shards": len(ranges) + 1})
+
+    # Keep a bounded window of shards ahead of the consumer
+    window = Config.VISION_PDF_SHARD_WORKERS * 2
+    futures = deque()
+    with ThreadPoolExecutor(max_workers=Config.VISION_PDF_SHARD_WORKERS, thread_name_prefix="vision-pdf") as executor:
+        try:
+            for pages in ranges:
+                futures.append(executor.submit(_annotate_file_pages, gcs_file_path, pages, client, mime_type))
+                if len(futures) >= window:
+                    yield [text for text in futures.popleft().result()[0] if text]
+            while futures:
+                yield [text for text in futures.popleft().result()[0] if text]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_pdf_pages(gcs_file_path: str, client, user_id, document_id):
+    """
+    Yields the page texts of a PDF in order as OCR progresses: from concurrent
+    page-range shards, or with VISION_PDF_SHARD_PAGES=0 from a single Vision async
+    batch operation, starting as soon as its first output files land in GCS.
+    """
+    logger.info("Processing PDF", extra={"user_id": user_id, "document_id": document_id})
+
+    if Config.VISION_PDF_SHARD_PAGES > 0:
+        for texts in iter_file_shards(gcs_file_path, client):
+            yield from texts
+        return
+
+    # Ensure proper output folder path (ending with '/')
+    output_folder = f"processed_results/{user_id}/{document_id}/"
+    async_request = _pdf_request(gcs_file_path, output_folder)
+
     operation = client.async_batch_annotate_files(requests=[async_request])
-    print("Waiting for Vision API to process PDF...")
-    operation.result(timeout=600)  # Increase timeout for large PDFs
+    logger.info("Waiting for Vision API to process PDF", extra={"document_id": document_id})
+    yield from iter_extracted_pages(output_folder, operation=operation, timeout=600)  # Increase timeout for large PDFs
 
-    # Fetch all extracted text from multiple output JSON files
-    print("Fetching extracted text from all JSON files in GCS output folder...")
-    extracted_text = get_extracted_text_from_gcs(output_folder)
 
-    return extracted_text
+def submit_pdf_batch(files: list, client):
+    """
+    Submits many PDFs in a single async_batch_annotate_files call.
+
+    Args:
+        files (list): (gcs_file_path, output_folder) pairs, at most VISION_FILE_BATCH_SIZE.
+        client: Google Cloud Vision API client.
+
+    Returns:
+        The long-running operation; read each output_folder once it is done.
+    """
+    requests = [_pdf_request(gcs_file_path, output_folder) for gcs_file_path, output_folder in files]
+    return client.async_batch_annotate_files(requests=requests)
+
+
+def annotate_images_batch(gcs_file_paths: list, client) -> list:
+    """
+    Runs TEXT_DETECTION on several images in one batch_annotate_images call. Vision
+    reads the images straight from GCS, so nothing is downloaded here.
+
+    Args:
+        gcs_file_paths (list): Up to VISION_IMAGE_BATCH_SIZE object paths in the bucket.
+        client: Google Cloud Vision API client.
+
+    Returns:
+        list: Extracted text, or the Exception for that image, in input order.
+    """
+    from google.cloud import vision
+
+    feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+    requests = [
+        vision.AnnotateImageRequest(
+            image=vision.Image(source=vision.ImageSource(image_uri=f"gs://{bucket_name}/{path}")),
+            features=[feature],
+        )
+        for path in gcs_file_paths
+    ]
+    with metrics.span("vision", "batch_annotate_images", images=len(requests)):
+        response = client.batch_annotate_images(requests=requests)
+
+    results = []
+    for image_response in response.responses:
+        if image_response.error.message:
+            results.append(RuntimeError(f"Error in Vision API: {image_response.error.message}"))
+        else:
+            texts = image_response.text_annotations
+            results.append(texts[0].description if texts else "")
+    return results
+
+
+# Leading bytes of the formats Vision accepts, for objects stored without a content type
+_MAGIC_NUMBERS = [
+    (b"%PDF", "application/pdf"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+def resolve_content_type(stored: StoredObject) -> str:
+    """
+    MIME type from GCS metadata, falling back to the file extension and then to the
+    first bytes of the object (one ranged read, not a full download).
+    """
+    content_type = stored.blob.content_type
+
+    # If content_type is None, infer from file extension
+    if content_type is None:
+        content_type = mimetypes.guess_type(stored.path)[0]  # Guess MIME type
+    if content_type is None:
+        head = stored.read_range(0, 15)
+        content_type = next((mime for magic, mime in _MAGIC_NUMBERS if head.startswith(magic)), None)
+        if content_type is None:
+            raise ValueError(f"Could not determine MIME type for {stored.path}")
+    return content_type
 
 
 def process_image(image_content: bytes, client) -> str:
@@ -53,25 +247,25 @@ def process_image(image_content: bytes, client) -> str:
 
     Returns:
         str: Extracted text from the image.
+
+    Raises:
+        RuntimeError: If Vision reports an error for the image. Failures are raised, not
+            returned as empty text, so they are never cached as the OCR result.
     """
-    try:
-        # Send the image content directly to Vision API
-        image = vision.Image(content=image_content)
-        response = client.text_detection(image=image)
+    from google.cloud import vision
 
-        # Check for Vision API errors
-        if response.error.message:
-            raise Exception(f"Error in Vision API: {response.error.message}")
+    # Send the image content directly to Vision API
+    image = vision.Image(content=image_content)
+    with metrics.span("vision", "text_detection", size=len(image_content)):
+        response = client.text_detection(image=image)
 
-        # Extract detected text
-        texts = response.text_annotations
-        extracted_text = texts[0].description if texts else ""
+    # Check for Vision API errors
+    if response.error.message:
+        raise RuntimeError(f"Error in Vision API: {response.error.message}")
 
-        return extracted_text
-
-    except Exception as e:
-        print(f"Error processing image: {str(e)}")
-        return ""
+    # Extract detected text
+    texts = response.text_annotations
+    return texts[0].description if texts else ""
 
 def save_text_to_cloud(text: str, extracted_path: str, bucket):
     """
@@ -87,14 +281,109 @@ def save_text_to_cloud(text: str, extracted_path: str, bucket):
         blob = bucket.blob(extracted_path)
         
         # Upload the extracted text as a plain text file
-        blob.upload_from_string(text, content_type="text/plain")
-        
-        print(f"Extracted text saved successfully at: gs://{bucket.name}/{extracted_path}")
+        with metrics.span("gcs", "write", size=len(text)):
+            blob.upload_from_string(text, content_type="text/plain")
+
+        logger.info("Extracted text saved", extra={"path": f"gs://{bucket.name}/{extracted_path}"})
 
     except Exception as e:
-        print(f"Error saving extracted text to Cloud Storage: {str(e)}")
+        logger.error("Error saving extracted text to Cloud Storage", extra={"path": extracted_path, "error": str(e)})
         raise
 
+_SHARD_NAME_RE = re.compile(r"output-(\d+)-to-(\d+)\.json$")
+
+
+def _shard_range(blob_name: str) -> tuple:
+    """Page range encoded in a Vision output file name, e.g. output-11-to-20.json -> (11, 20)."""
+    match = _SHARD_NAME_RE.search(blob_name)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def _read_shard_pages(stored: StoredObject) -> list:
+    """Downloads one Vision output shard and returns the fullTextAnnotation text of each page."""
+    if ijson is not None:
+        with metrics.span("gcs", "download_shard", path=stored.path):
+            with stored.open() as f:
+                return list(ijson.items(f, "responses.item.fullTextAnnotation.text"))
+
+    response_data = json.loads(stored.read_bytes())
+    return [
+        page_response["fullTextAnnotation"]["text"]
+        for page_response in response_data["responses"]
+        if "fullTextAnnotation" in page_response
+    ]
+
+
+def iter_extracted_pages(processed_gcs_folder: str, operation=None, timeout: float = 600):
+    """
+    Yields page texts from the Vision output JSON files in GCS, in page order.
+
+    Shards are downloaded concurrently (VISION_SHARD_WORKERS). When the running Vision
+    operation is passed, the folder is polled while it runs and contiguous shards are
+    yielded before the operation has finished.
+
+    Args:
+        processed_gcs_folder (str): Path to the processed JSON folder in GCS (e.g., "processed_results/user_id/document_id/").
+        operation: Optional long-running Vision operation still writing to the folder.
+        timeout (float): Seconds to wait for the operation.
+    """
+    bucket = get_bucket(bucket_name)
+
+    shards = {}  # blob name -> (page range, future)
+    yielded = set()
+    next_page = 1
+
+    with ThreadPoolExecutor(max_workers=Config.VISION_SHARD_WORKERS, thread_name_prefix="vision-shards") as executor:
+        def submit_new_shards():
+            for blob in bucket.list_blobs(prefix=processed_gcs_folder):
+                if blob.name not in shards:
+                    logger.debug("Reading OCR output shard", extra={"path": blob.name})
+                    shards[blob.name] = (_shard_range(blob.name), executor.submit(_read_shard_pages, StoredObject(bucket, blob.name, blob)))
+
+        if operation is not None:
+            deadline = time.monotonic() + timeout
+            # Until the operation is seen done; includes time the consumer holds a yielded page
+            waited_since = time.perf_counter()
+            outcome = "error"
+            try:
+                while not operation.done():
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Vision operation did not finish within {timeout}s")
+                    submit_new_shards()
+
+                    # Yield every finished shard that continues the page sequence
+                    progressed = True
+                    while progressed:
+                        progressed = False
+                        for name, (page_range, future) in shards.items():
+                            if name not in yielded and page_range and page_range[0] == next_page and future.done():
+                                yield from future.result()
+                                yielded.add(name)
+                                next_page = page_range[1] + 1
+                                progressed = True
+                    time.sleep(Config.VISION_POLL_INTERVAL)
+                # Surface operation errors before reading the remaining output
+                operation.result()
+                outcome = "ok"
+            finally:
+                metrics.record("vision", "operation_wait", time.perf_counter() - waited_since, outcome,
+                               path=processed_gcs_folder)
+
+        submit_new_shards()
+        if not shards:
+            raise FileNotFoundError(f"No processed text files found in {processed_gcs_folder}")
+
+        # Sort by page range, unknown file names last by name, to maintain page order
+        remaining = sorted(
+            (name for name in shards if name not in yielded),
+            key=lambda name: (shards[name][0] is None, shards[name][0] or (0, 0), name),
+        )
+        for name in remaining:
+            yield from shards[name][1].result()
+
+
 def get_extracted_text_from_gcs(processed_gcs_folder: str) -> str:
     """
     Fetches and combines extracted text from multiple output JSON files in GCS.
@@ -105,87 +394,100 @@ def get_extracted_text_from_gcs(processed_gcs_folder: str) -> str:
     Returns:
         str: Extracted text from all output JSON files.
     """
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    
-    # List all output JSON files in the directory
-    blobs = list(bucket.list_blobs(prefix=processed_gcs_folder))
-
-    if not blobs:
-        raise FileNotFoundError(f"No processed text files found in {processed_gcs_folder}")
-
-    extracted_text = ""
+    return PAGE_BREAK.join(iter_extracted_pages(processed_gcs_folder)).strip()
 
-    # Iterate through all output files and merge extracted text
-    for blob in sorted(blobs, key=lambda x: x.name):  # Sort to maintain page order
-        print(f"Processing file: {blob.name}")  # Debugging output
-        json_content = blob.download_as_text()
-        response_data = json.loads(json_content)
 
-        for page_response in response_data["responses"]:
-            if "fullTextAnnotation" in page_response:
-                extracted_text += page_response["fullTextAnnotation"]["text"] + "\n"
-
-    return extracted_text.strip()
-
-
-def extract_text(file_path: str, extracted_path: str, document_id: str, user_id: str) -> str:
+def iter_extract_text(file_path: str, extracted_path: str, document_id: str, user_id: str, session: StorageSession = None):
     """
-    Extracts text from an image or PDF file stored in Google Cloud Storage using Google Cloud Vision API.
+    Extracts text from an image or PDF file stored in Google Cloud Storage using Google Cloud Vision API,
+    yielding it in page order as OCR progresses so later stages can start before the last page is done.
+    The complete text is cached and saved to extracted_path once every page has been yielded.
 
     Args:
         file_path (str): Path of the file in GCS (e.g., "documents/user_id/document_id").
         extracted_path (str): Path to store the extracted text in GCS.
         document_id (str): Document ID for reference.
         user_id (str): User ID for reference.
+        session (StorageSession): Memoized object metadata shared with the caller.
 
-    Returns:
-        str: Extracted text from the file.
+    Yields:
+        str: Text of the next page (the whole text for images and cache hits).
     """
     try:
-        # Initialize Google Cloud clients
-        vision_client = vision.ImageAnnotatorClient()
-        storage_client = storage.Client()
-        
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(file_path)
+        # Shared Google Cloud clients
+        vision_client = get_vision_client()
+        session = session or StorageSession(get_bucket(bucket_name))
+        bucket = session.bucket
 
-        # Check if the file exists
-        if not blob.exists():
-            raise FileNotFoundError(f"File {file_path} not found in bucket {bucket_name}")
+        # One get_blob call for existence and metadata; raises FileNotFoundError if missing
+        stored = session.get(file_path)
+        blob = stored.blob
 
         # Get MIME type from GCS metadata
-        blob.reload()
-        content_type = blob.content_type
-
-        # Debugging metadata
-        print(f"File metadata for {file_path}: {blob.metadata}, Content-Type: {content_type}")
+        content_type = resolve_content_type(stored)
 
-        # If content_type is None, infer from file extension
-        if content_type is None:
-            _, ext = os.path.splitext(file_path)
-            content_type = mimetypes.guess_type(file_path)[0]  # Guess MIME type
-            if content_type is None:
-                raise ValueError(f"Could not determine MIME type for {file_path}")
+        logger.debug("File metadata", extra={"path": file_path, "metadata": blob.metadata, "content_type": content_type})
 
-        # Read file content directly from GCS
-        content = blob.download_as_bytes()
-        print(f"Processing file of type: {content_type}")
+        # Reuse OCR output for identical content, keyed by the GCS md5/crc32c
+        content_hash = cache.content_key(blob)
+        cached_text = cache.get_extracted_text(content_hash)
+        if cached_text is not None:
+            logger.info("OCR cache hit", extra={"path": file_path, "content_hash": content_hash})
+            save_text_to_cloud(cached_text, extracted_path, bucket)
+            session.forget(extracted_path)
+            yield cached_text
+            return
 
-        extracted_text = ""
+        logger.info("Extracting text", extra={"path": file_path, "content_type": content_type})
+        start = time.perf_counter()
 
         if content_type.startswith("image/"):
-            extracted_text = process_image(content, vision_client)
+            # Read file content directly from GCS; PDFs are read by Vision itself
+            content = stored.read_bytes()
+            if content_type in MULTI_FRAME_TYPES and count_frames(content) > 1:
+                # Multi-page TIFF/GIF: OCR it from GCS page range by page range, like a PDF
+                pages = (text for texts in iter_file_shards(file_path, vision_client, content_type) for text in texts)
+            else:
+                # Downscaled grayscale copy, prepared off-thread in the process pool
+                pages = [process_image(preprocess_image(content), vision_client)]
         elif content_type == "application/pdf":
-            extracted_text = process_pdf(file_path, vision_client, user_id, document_id)  # Pass GCS path for async processing
+            pages = iter_pdf_pages(file_path, vision_client, user_id, document_id)  # Pass GCS path for async processing
         else:
             raise ValueError(f"Unsupported file type: {content_type}")
 
+        texts = []
+        for page in pages:
+            texts.append(page)
+            yield page
+        extracted_text = PAGE_BREAK.join(texts).strip()
+
+        cache.record_compute("ocr", time.perf_counter() - start)
+        if not extracted_text:
+            # Nothing to reuse; a later run may well find text (e.g. after a Vision outage)
+            logger.warning("No text extracted", extra={"path": file_path})
+            return
+        cache.put_extracted_text(content_hash, extracted_text)
+
         # Save extracted text directly to Cloud Storage
         save_text_to_cloud(extracted_text, extracted_path, bucket)
-
-        return extracted_text
+        session.forget(extracted_path)
 
     except Exception as e:
-        print(f"Error extracting text: {str(e)}")
+        logger.error("Error extracting text", extra={"path": file_path, "error": str(e)})
         raise
+
+
+def extract_text(file_path: str, extracted_path: str, document_id: str, user_id: str) -> str:
+    """
+    Extracts text from an image or PDF file stored in Google Cloud Storage using Google Cloud Vision API.
+
+    Args:
+        file_path (str): Path of the file in GCS (e.g., "documents/user_id/document_id").
+        extracted_path (str): Path to store the extracted text in GCS.
+        document_id (str): Document ID for reference.
+        user_id (str): User ID for reference.
+
+    Returns:
+        str: Extracted text from the file.
+    """
+    return PAGE_BREAK.join(iter_extract_text(file_path, extracted_path, document_id, user_id)).strip()
@@ -0,0 +1,108 @@
+# image preprocessing
+#
+# Shrinks images before they are sent to Vision: OCR does not need 12 MP colour photos.
+# Decoding and re-encoding is CPU bound, so it runs in a process pool instead of the
+# request/job threads.
+
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+from utils.logger import get_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = get_logger(__name__)
+
+# Image types that may carry several pages
+MULTI_FRAME_TYPES = ("image/tiff", "image/gif")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def prepare_image(content: bytes, max_dimension: int = None, quality: int = None) -> bytes:
+    """
+    Downscales an image so its longest side is at most max_dimension, converts it to
+    grayscale and re-encodes it as JPEG. Runs inside the process pool.
+
+    :param content: Original image bytes
+    :param max_dimension: Longest side in pixels, defaults to IMAGE_MAX_DIMENSION
+    :param quality: JPEG quality, defaults to IMAGE_JPEG_QUALITY
+    :return: Bytes to send to Vision; the original bytes when re-encoding would not
+             make them smaller or the image has several frames
+    """
+    max_dimension = max_dimension or Config.IMAGE_MAX_DIMENSION
+    quality = quality or Config.IMAGE_JPEG_QUALITY
+
+    with Image.open(io.BytesIO(content)) as image:
+        if getattr(image, "n_frames", 1) > 1:
+            return content
+
+        # JPEG can decode straight to a reduced grayscale size, much cheaper than a full decode
+        image.draft("L", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "L":
+            image = image.convert("L")
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+
+    prepared = output.getvalue()
+    return prepared if len(prepared) < len(content) else content
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs server and client threads is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.IMAGE_PREPROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def preprocess_image(content: bytes) -> bytes:
+    """
+    Prepares image bytes for OCR in the process pool. Images below
+    IMAGE_PREPROCESS_MIN_BYTES, or any image when preprocessing is disabled or Pillow is
+    not installed, are passed through unchanged; so is anything Pillow cannot decode.
+    """
+    if not Config.IMAGE_PREPROCESS_ENABLED or Image is None or len(content) < Config.IMAGE_PREPROCESS_MIN_BYTES:
+        return content
+
+    try:
+        prepared = _get_pool().submit(prepare_image, content).result()
+    except Exception as e:
+        logger.warning("Image preprocessing failed, sending original", extra={"error": str(e)})
+        return content
+
+    if len(prepared) < len(content):
+        logger.debug("Preprocessed image", extra={"original_bytes": len(content), "prepared_bytes": len(prepared)})
+    return prepared
+
+
+def count_frames(content: bytes) -> int:
+    """Number of frames (pages) in an image, 1 if it cannot be determined."""
+    if Image is None:
+        return 1
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            return getattr(image, "n_frames", 1)
+    except Exception:
+        return 1
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,273 @@
+# indexer
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services.clients import get_es, get_bucket
+from services.elasticsearch import ensure_index, ensure_tenant_alias, invalidate_search_cache, DEFAULT_TITLE
+from utils import metrics
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Item statuses worth indexing again later instead of counting as failed
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class BulkIndexer:
+    """
+    Buffers index actions and writes them through the Elasticsearch _bulk API.
+
+    A batch is flushed when it reaches INDEX_BATCH_SIZE documents or INDEX_BATCH_BYTES,
+    or after INDEX_FLUSH_INTERVAL seconds. Rejected items (429) are retried with
+    exponential backoff; items still rejected, or failing with a 5xx, are spilled
+    (see below) instead of dropped. When INDEX_BUFFER_MAX actions are waiting, add()
+    blocks until the flusher catches up, so producers slow down instead of exhausting
+    memory.
+
+    While the cluster is unreachable the flusher backs off between attempts (from
+    INDEX_INITIAL_BACKOFF up to INDEX_MAX_BACKOFF), keeping every action the cluster
+    has not acknowledged. Actions still unwritten at stop() are appended to
+    INDEX_SPILL_PATH and queued again by the next start().
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.stats = {"indexed": 0, "failed": 0, "batches": 0, "last_batch_docs_per_sec": 0.0, "spilled": 0}
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="bulk-indexer", daemon=True)
+                self._thread.start()
+                started = True
+            else:
+                started = False
+        if started:
+            self._replay_spill()
+
+    def add(self, action: dict):
+        size = _estimate_size(action)
+        with self._cond:
+            while len(self._buffer) >= Config.INDEX_BUFFER_MAX and not self._stopping:
+                self._cond.wait()
+            self._buffer.append(action)
+            self._buffer_bytes += size
+            if len(self._buffer) >= Config.INDEX_BATCH_SIZE or self._buffer_bytes >= Config.INDEX_BATCH_BYTES:
+                self._cond.notify_all()
+        self.start()
+
+    def _take_batch(self) -> list:
+        with self._cond:
+            batch, self._buffer, self._buffer_bytes = self._buffer, [], 0
+            self._cond.notify_all()
+        return batch
+
+    def _requeue(self, batch: list):
+        with self._cond:
+            self._buffer[:0] = batch
+            self._buffer_bytes += sum(_estimate_size(action) for action in batch)
+
+    def _run(self):
+        backoff = 0
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < Config.INDEX_BATCH_SIZE \
+                        and self._buffer_bytes < Config.INDEX_BATCH_BYTES:
+                    self._cond.wait(timeout=Config.INDEX_FLUSH_INTERVAL)
+                stopping = self._stopping
+            try:
+                self.flush()
+                backoff = 0
+            except Exception as e:
+                backoff = min(max(backoff * 2, Config.INDEX_INITIAL_BACKOFF), Config.INDEX_MAX_BACKOFF)
+                logger.error("Error flushing bulk index batch", extra={"error": str(e), "retry_in_s": backoff})
+                if not stopping:
+                    self._wait_unless_stopping(backoff)
+            if stopping:
+                return
+
+    def _wait_unless_stopping(self, seconds: float):
+        # add() notifies the condition whenever a batch fills up, so wait out the full delay
+        deadline = time.monotonic() + seconds
+        with self._cond:
+            while not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._cond.wait(timeout=remaining)
+
+    def flush(self):
+        """Writes everything buffered so far. Safe to call from any thread."""
+        from elasticsearch import helpers
+
+        with self._flush_lock:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                ensure_index()
+            except Exception:
+                # Cluster unreachable: keep the batch for the next flush
+                self._requeue(batch)
+                raise
+
+            start = time.perf_counter()
+            indexed = failed = 0
+            unacknowledged = {action["_id"]: action for action in batch}
+            retryable = []
+            try:
+                for ok, item in helpers.streaming_bulk(
+                    get_es(),
+                    batch,
+                    chunk_size=Config.INDEX_BATCH_SIZE,
+                    max_chunk_bytes=Config.INDEX_BATCH_BYTES,
+                    max_retries=Config.INDEX_MAX_RETRIES,
+                    initial_backoff=Config.INDEX_INITIAL_BACKOFF,
+                    max_backoff=Config.INDEX_MAX_BACKOFF,
+                    raise_on_error=False,
+                    raise_on_exception=False,
+                    # Return once the documents are searchable, so the cache invalidation
+                    # below cannot be undone by a search that still sees the old results
+                    refresh="wait_for",
+                ):
+                    (_, result), = item.items()
+                    action = unacknowledged.pop(result.get("_id"), None)
+                    if ok:
+                        indexed += 1
+                    elif result.get("status") in RETRYABLE_STATUSES and action is not None:
+                        retryable.append(action)
+                    else:
+                        failed += 1
+                        logger.error("Error indexing document", extra={"item": item})
+            except Exception:
+                # Connection lost mid-batch: keep whatever was not acknowledged for the next flush
+                metrics.record("elasticsearch", "bulk", time.perf_counter() - start, "error", documents=len(batch))
+                self.stats["indexed"] += indexed
+                self.stats["failed"] += failed
+                self._requeue(retryable + list(unacknowledged.values()))
+                raise
+            elapsed = time.perf_counter() - start
+            metrics.record("elasticsearch", "bulk", elapsed, "error" if failed or retryable else "ok", documents=len(batch))
+            # Still rejected after INDEX_MAX_RETRIES (or 5xx): indexed after the next start()
+            self._spill(retryable)
+
+            # Cached results were computed without these documents
+            for user_id in {action["_source"].get("user_id") for action in batch}:
+                invalidate_search_cache(user_id)
+                if Config.ES_TENANT_ALIASES:
+                    try:
+                        ensure_tenant_alias(user_id)
+                    except Exception as e:
+                        logger.error("Error creating tenant alias", extra={"user_id": user_id, "error": str(e)})
+
+            self.stats["indexed"] += indexed
+            self.stats["failed"] += failed
+            self.stats["batches"] += 1
+            self.stats["last_batch_docs_per_sec"] = round(len(batch) / elapsed, 1) if elapsed else 0.0
+            logger.info("Bulk indexed documents", extra={
+                "indexed": indexed, "failed": failed, "duration_ms": round(elapsed * 1000, 2),
+            })
+
+    def stop(self):
+        """Flushes the remaining buffer and stops the background flusher."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            # Keep shutdown going; the actions are indexed after the next start()
+            logger.error("Error flushing bulk index batch at shutdown", extra={"error": str(e)})
+            self._spill(self._take_batch())
+
+    def _spill(self, actions: list):
+        if not actions:
+            return
+        with self._spill_lock:
+            with open(Config.INDEX_SPILL_PATH, "a", encoding="utf-8") as f:
+                for action in actions:
+                    f.write(json.dumps(action) + "\n")
+        self.stats["spilled"] += len(actions)
+        logger.warning("Spilled unindexed documents", extra={"documents": len(actions), "path": Config.INDEX_SPILL_PATH})
+
+    def _replay_spill(self):
+        replay_path = Config.INDEX_SPILL_PATH + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(Config.INDEX_SPILL_PATH):
+                return
+            os.replace(Config.INDEX_SPILL_PATH, replay_path)
+
+        with open(replay_path, encoding="utf-8") as f:
+            actions = [json.loads(line) for line in f if line.strip()]
+        os.remove(replay_path)
+
+        logger.info("Replaying spilled index actions", extra={"documents": len(actions)})
+        self._requeue(actions)
+        with self._cond:
+            self._cond.notify_all()
+
+
+def _estimate_size(action: dict) -> int:
+    source = action.get("_source", {})
+    return sum(len(value) for value in source.values() if isinstance(value, str)) + 256
+
+
+_indexer = BulkIndexer()
+
+
+def get_indexer() -> BulkIndexer:
+    return _indexer
+
+
+def reindex_from_gcs(job, user_id: str = None) -> dict:
+    """
+    Backfills the index from the extracted text (and summaries) stored in GCS.
+
+    :param job: services.jobs.Job used to report progress
+    :param user_id: Only reindex this user's documents when given
+    """
+    bucket = get_bucket()
+    prefix = f"extracted_documents/{user_id}/" if user_id else "extracted_documents/"
+    summary_prefix = f"summary/{user_id}/" if user_id else "summary/"
+
+    with job.stage("list"):
+        extracted_blobs = [blob for blob in bucket.list_blobs(prefix=prefix) if not blob.name.endswith("/")]
+        # One listing instead of an exists() call per document
+        summary_paths = {blob.name for blob in bucket.list_blobs(prefix=summary_prefix)}
+
+    def load(blob):
+        _, owner, document_id = blob.name.split("/", 2)
+        summary_path = f"summary/{owner}/{document_id}"
+        summary = bucket.blob(summary_path).download_as_text() if summary_path in summary_paths else ""
+        return owner, document_id, blob.download_as_text(), summary
+
+    from services.search_backend import get_search_backend
+
+    backend = get_search_backend()
+    done = 0
+    with job.stage("index"):
+        # Download in windows so a slow cluster does not let downloaded text pile up
+        window = Config.REINDEX_DOWNLOAD_WORKERS * 4
+        with ThreadPoolExecutor(max_workers=Config.REINDEX_DOWNLOAD_WORKERS, thread_name_prefix="reindex") as executor:
+            for offset in range(0, len(extracted_blobs), window):
+                for owner, document_id, extracted_text, summary in executor.map(load, extracted_blobs[offset:offset + window]):
+                    backend.index_document(document_id, owner, DEFAULT_TITLE, extracted_text, summary)
+                    done += 1
+                    job.set_progress("index", done, len(extracted_blobs))
+        backend.flush()
+
+    return {"documents": done, "backend": backend.name, "indexer": dict(get_indexer().stats)}
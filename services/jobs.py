@@ -0,0 +1,241 @@
+# jobs
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import Config
+from utils import metrics
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+JOBS = metrics.gauge("documind_jobs", "Processing jobs waiting for a worker or running.", ("state",))
+JOB_SECONDS = metrics.histogram("documind_job_seconds", "Processing job duration.", ("status",))
+STAGE_SECONDS = metrics.histogram("documind_job_stage_seconds", "Processing stage duration.", ("stage", "status"))
+JOBS_REJECTED = metrics.counter("documind_jobs_rejected_total", "Jobs refused because the processing queue was full.")
+JOBS_ATTACHED = metrics.counter(
+    "documind_jobs_attached_total", "Requests that joined a job already processing the same document.",
+)
+
+
+class QueueFullError(Exception):
+    """Raised when the processing queue has no room for another job."""
+
+
+class Job:
+    """
+    A unit of background work with per-stage status and timings.
+    """
+
+    def __init__(self, user_id: str, document_id: str, stages: list):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.document_id = document_id
+        self.status = "queued"
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.duration_ms = None
+        self.result = None
+        self.error = None
+        self.dedupe_key = None
+        self.attached = 0
+        self.events = []
+        self._listeners = []
+        self.stages = OrderedDict(
+            (name, {"status": "pending", "started_at": None, "duration_ms": None})
+            for name in stages
+        )
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Marks a stage as running for the duration of the block."""
+        with self._lock:
+            stage = self.stages.setdefault(name, {"status": "pending", "started_at": None, "duration_ms": None})
+            stage["status"] = "running"
+            stage["started_at"] = datetime.now(timezone.utc).isoformat()
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._end_stage(name, "failed", start)
+            raise
+        self._end_stage(name, "completed", start)
+
+    def skip_stage(self, name: str):
+        with self._lock:
+            if name in self.stages:
+                self.stages[name]["status"] = "skipped"
+
+    def set_progress(self, name: str, done: int, total: int):
+        with self._lock:
+            if name in self.stages:
+                self.stages[name]["progress"] = {"done": done, "total": total}
+
+    def _end_stage(self, name: str, status: str, start: float):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stages[name]["status"] = status
+            self.stages[name]["duration_ms"] = round(elapsed * 1000, 2)
+        STAGE_SECONDS.observe(elapsed, stage=name, status=status)
+
+    def emit(self, event: dict):
+        """Records a progress event and forwards it to the current subscribers."""
+        with self._lock:
+            self.events.append(event)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+
+    def subscribe(self, listener):
+        """Replays the events emitted so far to listener(event), then forwards new ones."""
+        with self._lock:
+            for event in self.events:
+                listener(event)
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Blocks until the job has finished. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "user_id": self.user_id,
+                "document_id": self.document_id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "duration_ms": self.duration_ms,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+                "attached_requests": self.attached,
+            }
+
+
+_executor = None
+_jobs = OrderedDict()
+_inflight = {}  # dedupe key -> queued or running Job
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=Config.PROCESSING_WORKERS,
+            thread_name_prefix="processing",
+        )
+    return _executor
+
+
+def _run(job: Job, fn, args: tuple):
+    global _pending
+    JOBS.dec(state="queued")
+    JOBS.inc(state="running")
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
+    try:
+        job.result = fn(job, *args)
+        job.status = "completed"
+    except Exception as e:
+        logger.error("Job failed", extra={"job_id": job.id, "document_id": job.document_id, "error": str(e)})
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        elapsed = time.perf_counter() - start
+        JOBS.dec(state="running")
+        JOB_SECONDS.observe(elapsed, status=job.status)
+        job.duration_ms = round(elapsed * 1000, 2)
+        job.finished_at = datetime.now(timezone.utc).isoformat()
+        with _lock:
+            _pending -= 1
+            if job.dedupe_key is not None and _inflight.get(job.dedupe_key) is job:
+                del _inflight[job.dedupe_key]
+        job._done.set()
+
+
+def submit_job(fn, user_id: str, document_id: str, stages: list, *args, dedupe_key=None) -> Job:
+    """
+    Queues fn(job, *args) on the processing worker pool and returns the job immediately.
+
+    :param fn: Callable run in a worker thread; its return value becomes job.result
+    :param user_id: Owner of the document being processed
+    :param document_id: Document being processed
+    :param stages: Ordered stage names reported by the status endpoint
+    :param dedupe_key: If a job with this key is still queued or running, it is returned
+                       instead of starting another one, so callers share its result
+    :raises QueueFullError: If PROCESSING_QUEUE_SIZE jobs are already waiting or running
+    """
+    global _pending
+    job = Job(user_id, document_id, stages)
+    with _lock:
+        if dedupe_key is not None:
+            running = _inflight.get(dedupe_key)
+            if running is not None:
+                running.attached += 1
+                JOBS_ATTACHED.inc()
+                return running
+        if _pending >= Config.PROCESSING_QUEUE_SIZE:
+            JOBS_REJECTED.inc()
+            raise QueueFullError("Processing queue is full, retry later")
+        _pending += 1
+        JOBS.inc(state="queued")
+        _jobs[job.id] = job
+        if dedupe_key is not None:
+            job.dedupe_key = dedupe_key
+            _inflight[dedupe_key] = job
+        _evict_finished()
+    try:
+        _get_executor().submit(_run, job, fn, args)
+    except Exception:
+        JOBS.dec(state="queued")
+        with _lock:
+            _pending -= 1
+            _jobs.pop(job.id, None)
+            if dedupe_key is not None:
+                _inflight.pop(dedupe_key, None)
+        raise
+    return job
+
+
+def _evict_finished():
+    # Keep at most JOB_HISTORY_LIMIT jobs, dropping the oldest finished ones first
+    excess = len(_jobs) - Config.JOB_HISTORY_LIMIT
+    if excess <= 0:
+        return
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished][:excess]:
+        del _jobs[job_id]
+
+
+def get_job(job_id: str):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def shutdown(wait: bool = True):
+    """Stops accepting work and waits for running jobs to finish."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=not wait)
+        _executor = None
@@ -0,0 +1,143 @@
+# pipeline
+
+import threading
+import time
+from config import Config
+from services.gcp_vision import iter_extract_text
+from services.gcp_summarization import summarize_stream, PAGE_BREAK
+from services.elasticsearch import DEFAULT_TITLE
+from services.search_backend import get_search_backend
+from services.storage import save_text_to_file, StorageSession
+from services.bigquery import log_document_activity
+from services.firestore import update_document_status
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PIPELINE_STAGES = ["ocr", "summarize", "index"]
+
+_lease = None
+_lease_lock = threading.Lock()
+
+
+def get_lease():
+    """Cross-replica lease configured by LEASE_BACKEND, or None when disabled."""
+    global _lease
+    if Config.LEASE_BACKEND != "sqlite":
+        return None
+    with _lease_lock:
+        if _lease is None:
+            from utils.lease import SQLiteLease
+            _lease = SQLiteLease(Config.LEASE_PATH, Config.LEASE_TTL, Config.LEASE_POLL_INTERVAL)
+        return _lease
+
+
+def dedupe_key(user_id: str, document_id: str) -> tuple:
+    """Concurrent requests for the same document attach to one job (services.jobs.submit_job)."""
+    return ("process", user_id, document_id)
+
+
+def process_document(job, user_id: str, document_id: str) -> dict:
+    """
+    Runs OCR -> summarize -> index for one document. Executed on the processing worker pool.
+    Status, progress and summary token events are published with job.emit, ending with
+    a "done" or "error" event.
+
+    With a lease backend configured, a replica that finds the document already being
+    processed elsewhere waits for it and then reuses the stored summary.
+
+    :param job: services.jobs.Job used to report per-stage status
+    :param user_id: ID of the user who uploaded the document
+    :param document_id: Unique document ID
+    :return: Result stored on the job
+    """
+    emit = job.emit
+    start = time.perf_counter()
+    lease = get_lease()
+    try:
+        if lease is None:
+            result = _run_stages(job, user_id, document_id, emit)
+        else:
+            with lease.hold(f"process:{user_id}:{document_id}", owner=job.id) as waited:
+                if waited:
+                    logger.info("Document was processed by another replica, reusing its output", extra={"document_id": document_id})
+                result = _run_stages(job, user_id, document_id, emit)
+    except Exception as e:
+        update_document_status(user_id, document_id, {"status": "failed", "error": str(e)})
+        emit({"type": "error", "error": str(e)})
+        raise
+
+    # Step 5: Log activity in BigQuery (buffered, off the request path)
+    duration_ms = round((time.perf_counter() - start) * 1000, 2)
+    log_document_activity(user_id, document_id, "processed", duration_ms)
+
+    emit({"type": "done", "duration_ms": duration_ms, **result})
+    return result
+
+
+def _run_stages(job, user_id: str, document_id: str, emit) -> dict:
+    file_path = f"documents/{user_id}/{document_id}"
+    extracted_path = f"extracted_documents/{user_id}/{document_id}"
+    summary_path = f"summary/{user_id}/{document_id}"
+
+    # Object metadata is fetched once per path for the whole job
+    session = StorageSession()
+    stored_summary = session.get(summary_path)
+    if not stored_summary.exists:
+        pages = []
+
+        def on_progress(done, total):
+            job.set_progress("summarize", done, total)
+            emit({"type": "progress", "stage": "summarize", "done": done, "total": total})
+
+        def ocr_pages():
+            # Step 1: Extract text using GCP Vision, handing pages on as they arrive
+            update_document_status(user_id, document_id, {"status": "extracting"})
+            emit({"type": "status", "status": "extracting"})
+            with job.stage("ocr"):
+                for page in iter_extract_text(file_path, extracted_path, document_id, user_id, session):
+                    pages.append(page)
+                    emit({"type": "progress", "stage": "ocr", "pages": len(pages)})
+                    yield page
+            logger.info("Text extracted", extra={"document_id": document_id, "pages": len(pages)})
+            update_document_status(user_id, document_id, {"status": "summarizing"})
+            emit({"type": "status", "status": "summarizing"})
+
+        # Step 2: Summarize text using Gemini. Large documents are summarized chunk
+        # by chunk while OCR of the later pages is still running.
+        with job.stage("summarize"):
+            summary = summarize_stream(
+                ocr_pages(),
+                on_progress=on_progress,
+                on_token=lambda text: emit({"type": "summary", "text": text}),
+            )
+            # Failures come back as text; a saved error would be reused as the summary forever
+            if summary.startswith("Error:"):
+                raise RuntimeError(summary)
+            # The full summary is persisted once streaming has finished
+            save_text_to_file(summary, summary_path)
+        extracted_text = PAGE_BREAK.join(pages).strip()
+    else:
+        # Already processed, reuse the stored text and summary
+        job.skip_stage("ocr")
+        job.skip_stage("summarize")
+        summary = stored_summary.read_text()
+        stored_extracted = session.get(extracted_path)
+        extracted_text = stored_extracted.read_text() if stored_extracted.exists else ""
+        emit({"type": "summary", "text": summary})
+
+    # Step 3: Index document in Elasticsearch
+    update_document_status(user_id, document_id, {"status": "indexing"})
+    emit({"type": "status", "status": "indexing"})
+    with job.stage("index"):
+        get_search_backend().index_document(document_id, user_id, DEFAULT_TITLE, extracted_text, summary)
+
+    # Step 4: Update Firestore document status. The OCR text stays in GCS
+    # (extracted_path) so list views and the 1 MiB document limit are not affected.
+    update_document_status(user_id, document_id, {
+        "summary": summary,
+        "extracted_path": extracted_path,
+        "status": "processed"
+    })
+
+    return {"summary": summary, "extracted_text_length": len(extracted_text)}
@@ -0,0 +1,200 @@
+# search backend
+#
+# Indexing and search go through get_search_backend(), selected by SEARCH_BACKEND:
+#   elasticsearch  the cluster only (default)
+#   sqlite         embedded SQLite FTS5 only, for tests and single-node deployments
+#   dual           writes to both; reads from Elasticsearch and fall back to SQLite
+#                  while the cluster is failing or slow
+
+import asyncio
+import base64
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SearchBackend(ABC):
+    """Operations the routes and the processing pipeline need from a search engine."""
+
+    name = None
+
+    @abstractmethod
+    def index_document(self, document_id: str, user_id: str, title: str, extracted_text: str, summary: str):
+        pass
+
+    def flush(self):
+        """Writes buffered documents now."""
+
+    def stop(self):
+        self.flush()
+
+    @abstractmethod
+    async def search(self, query: str, filters: dict = None, size: int = None, cursor: str = None) -> dict:
+        """{"documents", "suggestions", "next_cursor"}; raises on backend errors."""
+
+    @abstractmethod
+    async def suggest(self, prefix: str, user_id: str, mode: str = "completion", size: int = 5) -> list:
+        pass
+
+    @abstractmethod
+    async def get_document(self, user_id: str, document_id: str):
+        pass
+
+
+class ElasticsearchBackend(SearchBackend):
+    name = "elasticsearch"
+
+    def index_document(self, document_id, user_id, title, extracted_text, summary):
+        from services.elasticsearch import index_document
+
+        index_document(document_id, user_id, title, extracted_text, summary)
+
+    def flush(self):
+        from services.indexer import get_indexer
+
+        get_indexer().flush()
+
+    def stop(self):
+        from services.indexer import get_indexer
+
+        get_indexer().stop()
+
+    async def search(self, query, filters=None, size=None, cursor=None):
+        from services.elasticsearch import search_documents
+
+        return await search_documents(query, filters, size, cursor, raise_on_error=True)
+
+    async def suggest(self, prefix, user_id, mode="completion", size=5):
+        from services.elasticsearch import suggest_titles
+
+        return await suggest_titles(prefix, user_id, mode, size, raise_on_error=True)
+
+    async def get_document(self, user_id, document_id):
+        from services.elasticsearch import get_document_text
+
+        return await get_document_text(user_id, document_id)
+
+
+class SQLiteBackend(SearchBackend):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        from services.sqlite_search import SQLiteSearchIndex
+
+        self.index = SQLiteSearchIndex(path)
+
+    def index_document(self, document_id, user_id, title, extracted_text, summary):
+        self.index.index_document(document_id, user_id, title, extracted_text, summary)
+
+    def flush(self):
+        self.index.flush()
+
+    # SQLite calls are blocking; keep them off the event loop
+    async def search(self, query, filters=None, size=None, cursor=None):
+        return await asyncio.to_thread(self.index.search, query, filters, size, cursor)
+
+    async def suggest(self, prefix, user_id, mode="completion", size=5):
+        return await asyncio.to_thread(self.index.suggest, prefix, user_id, mode, size)
+
+    async def get_document(self, user_id, document_id):
+        return await asyncio.to_thread(self.index.get, user_id, document_id)
+
+
+def _is_sqlite_cursor(cursor: str) -> bool:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode())).get("backend") == "sqlite"
+    except Exception:
+        return False
+
+
+class FallbackBackend(SearchBackend):
+    """
+    Writes every document to both backends. Reads go to the primary, bounded by
+    SEARCH_FALLBACK_TIMEOUT; on an error or timeout the secondary answers, and the
+    primary is skipped for SEARCH_FALLBACK_COOLDOWN seconds so an incident does not
+    add the timeout to every request.
+    """
+
+    name = "dual"
+
+    def __init__(self, primary: SearchBackend, secondary: SearchBackend):
+        self.primary = primary
+        self.secondary = secondary
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"primary_reads": 0, "fallback_reads": 0, "primary_failures": 0}
+
+    def index_document(self, document_id, user_id, title, extracted_text, summary):
+        self.secondary.index_document(document_id, user_id, title, extracted_text, summary)
+        self.primary.index_document(document_id, user_id, title, extracted_text, summary)
+
+    def flush(self):
+        self.secondary.flush()
+        self.primary.flush()
+
+    def stop(self):
+        self.secondary.stop()
+        self.primary.stop()
+
+    async def _read(self, method: str, *args):
+        if time.monotonic() >= self._down_until:
+            try:
+                result = await asyncio.wait_for(getattr(self.primary, method)(*args), Config.SEARCH_FALLBACK_TIMEOUT)
+                with self._lock:
+                    self.stats["primary_reads"] += 1
+                return result
+            except ValueError:
+                raise
+            except Exception as e:
+                logger.warning("Search backend failed, using fallback", extra={
+                    "backend": self.primary.name, "fallback": self.secondary.name, "operation": method, "error": repr(e),
+                })
+                with self._lock:
+                    self.stats["primary_failures"] += 1
+                    self._down_until = time.monotonic() + Config.SEARCH_FALLBACK_COOLDOWN
+        with self._lock:
+            self.stats["fallback_reads"] += 1
+        return await getattr(self.secondary, method)(*args)
+
+    async def search(self, query, filters=None, size=None, cursor=None):
+        # A cursor handed out by the fallback keeps paging there
+        if cursor and _is_sqlite_cursor(cursor):
+            return await self.secondary.search(query, filters, size, cursor)
+        return await self._read("search", query, filters, size, cursor)
+
+    async def suggest(self, prefix, user_id, mode="completion", size=5):
+        return await self._read("suggest", prefix, user_id, mode, size)
+
+    async def get_document(self, user_id, document_id):
+        return await self._read("get_document", user_id, document_id)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _build_backend() -> SearchBackend:
+    if Config.SEARCH_BACKEND == "sqlite":
+        return SQLiteBackend(Config.SQLITE_SEARCH_PATH)
+    if Config.SEARCH_BACKEND == "dual":
+        return FallbackBackend(ElasticsearchBackend(), SQLiteBackend(Config.SQLITE_SEARCH_PATH))
+    if Config.SEARCH_BACKEND != "elasticsearch":
+        raise ValueError(f"Unknown SEARCH_BACKEND: {Config.SEARCH_BACKEND}")
+    return ElasticsearchBackend()
+
+
+def get_search_backend() -> SearchBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _build_backend()
+        return _backend
+
+
+def uses_elasticsearch() -> bool:
+    return Config.SEARCH_BACKEND in ("elasticsearch", "dual")
@@ -0,0 +1,238 @@
+# sqlite search
+#
+# Embedded full-text search on SQLite FTS5: BM25 ranking, prefix matching, user and
+# date filters. Used on single-node deployments and in tests (SEARCH_BACKEND=sqlite),
+# and as the read fallback while Elasticsearch is unavailable (SEARCH_BACKEND=dual).
+
+import base64
+import json
+import re
+import sqlite3
+import threading
+from config import Config
+from services.elasticsearch import build_document
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    title TEXT,
+    content TEXT,
+    summary TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_user_time ON documents (user_id, timestamp);
+
+-- External-content FTS table: the text is stored once, in documents
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, summary, content,
+    content='documents', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, title, summary, content) VALUES (new.rowid, new.title, new.summary, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, summary, content) VALUES ('delete', old.rowid, old.title, old.summary, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, summary, content) VALUES ('delete', old.rowid, old.title, old.summary, old.content);
+    INSERT INTO documents_fts (rowid, title, summary, content) VALUES (new.rowid, new.title, new.summary, new.content);
+END;
+"""
+
+UPSERT = """
+INSERT INTO documents (id, user_id, document_id, title, content, summary, timestamp)
+VALUES (:unique_id, :user_id, :document_id, :title, :content, :summary, :timestamp)
+ON CONFLICT (id) DO UPDATE SET
+    title = excluded.title, content = excluded.content,
+    summary = excluded.summary, timestamp = excluded.timestamp
+"""
+
+# Column weights for bm25(), in FTS column order; mirrors EXACT_FIELDS in services.elasticsearch
+BM25_WEIGHTS = (3.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query: str, columns: str = None) -> str:
+    """
+    FTS5 MATCH expression requiring every word of the query, each as a prefix.
+    Words are quoted, so FTS5 operators in user input are matched literally.
+    """
+    terms = " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(query.lower()))
+    if not terms:
+        return None
+    return f"{{{columns}}}: ({terms})" if columns else terms
+
+
+def _encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"backend": "sqlite", **state}).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if state.get("backend") != "sqlite" or not isinstance(state.get("offset"), int):
+            raise ValueError
+        return state
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+
+class SQLiteSearchIndex:
+    """
+    Thread-safe FTS5 index in a single SQLite file. Writes are buffered and committed
+    in one transaction per INDEX_BATCH_SIZE documents (or on flush()); reads flush
+    first so a document is searchable as soon as it was added.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._pending = []
+        with self._write_lock:
+            self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, document: dict):
+        """Queues a document body (services.elasticsearch.build_document) for insertion."""
+        with self._write_lock:
+            self._pending.append(document)
+            full = len(self._pending) >= Config.INDEX_BATCH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            conn = self._connection()
+            with conn:
+                conn.executemany(UPSERT, batch)
+
+    def search(self, query: str, filters: dict = None, size: int = None, cursor: str = None) -> dict:
+        """Same result shape as services.elasticsearch.search_documents."""
+        size = size or Config.SEARCH_PAGE_SIZE
+        state = _decode_cursor(cursor) if cursor else {"offset": 0, "cutoff": None}
+        expression = match_expression(query or "")
+        if expression is None or len(query) < 2:
+            return {"documents": [], "suggestions": [], "next_cursor": None}
+        self.flush()
+
+        where = ["documents_fts MATCH ?"]
+        params = [expression]
+        for key, value in (filters or {}).items():
+            if key not in ("user_id", "document_id", "timestamp"):
+                continue
+            if isinstance(value, dict):  # Date range filter, ISO strings compare in order
+                if "gte" in value:
+                    where.append(f"documents.{key} >= ?")
+                    params.append(value["gte"])
+                if "lte" in value:
+                    # Date-only bounds include the whole day
+                    where.append(f"documents.{key} <= ?")
+                    params.append(value["lte"] + "\uffff" if len(value["lte"]) == 10 else value["lte"])
+            else:
+                where.append(f"documents.{key} = ?")
+                params.append(value)
+
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+        sql = f"""
+            SELECT documents.document_id, documents.user_id, documents.title, documents.timestamp,
+                   -bm25(documents_fts, {weights}) AS score,
+                   snippet(documents_fts, 2, '<em>', '</em>', '...', 24) AS content_snippet,
+                   snippet(documents_fts, 1, '<em>', '</em>', '...', 32) AS summary_snippet
+            FROM documents_fts JOIN documents ON documents.rowid = documents_fts.rowid
+            WHERE {" AND ".join(where)}
+            ORDER BY bm25(documents_fts, {weights}), documents.id
+            LIMIT ? OFFSET ?
+        """
+        rows = self._connection().execute(sql, params + [size, state["offset"]]).fetchall()
+
+        # Same relative relevance cutoff as the Elasticsearch backend
+        cutoff = state["cutoff"]
+        if cutoff is None and rows:
+            cutoff = rows[0]["score"] * Config.SEARCH_RELATIVE_SCORE
+        hits = [row for row in rows if cutoff is None or row["score"] >= cutoff]
+
+        documents = [
+            {
+                "document_id": row["document_id"],
+                "user_id": row["user_id"],
+                "title": row["title"],
+                "timestamp": row["timestamp"],
+                "score": row["score"],
+                "highlights": {
+                    "content": [row["content_snippet"]] if row["content_snippet"] else [],
+                    "summary": [row["summary_snippet"]] if row["summary_snippet"] else [],
+                },
+            }
+            for row in hits
+        ]
+        next_cursor = None
+        if hits and len(rows) == size and len(hits) == len(rows):
+            next_cursor = _encode_cursor({"offset": state["offset"] + size, "cutoff": cutoff})
+        return {"documents": documents, "suggestions": [], "next_cursor": next_cursor}
+
+    def suggest(self, prefix: str, user_id: str, mode: str = "completion", size: int = 5) -> list:
+        """
+        Title autocomplete over one user's documents: titles starting with prefix, or
+        (mode="prefix") titles containing words starting with it.
+        """
+        if not user_id:
+            raise ValueError("Suggestions are scoped to a user; user_id is required")
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        self.flush()
+
+        if mode == "prefix":
+            expression = match_expression(prefix, "title")
+            if expression is None:
+                return []
+            sql = """
+                SELECT DISTINCT documents.title, documents.document_id
+                FROM documents_fts JOIN documents ON documents.rowid = documents_fts.rowid
+                WHERE documents_fts MATCH ? AND documents.user_id = ?
+                ORDER BY bm25(documents_fts) LIMIT ?
+            """
+            params = [expression, user_id, size]
+        else:
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            sql = """
+                SELECT documents.title, documents.document_id FROM documents
+                WHERE documents.title LIKE ? ESCAPE '\\' AND documents.user_id = ?
+                GROUP BY documents.title ORDER BY MAX(documents.timestamp) DESC LIMIT ?
+            """
+            params = [escaped + "%", user_id, size]
+
+        return [
+            {"text": row["title"], "document_id": row["document_id"]}
+            for row in self._connection().execute(sql, params).fetchall()
+        ]
+
+    def get(self, user_id: str, document_id: str):
+        self.flush()
+        row = self._connection().execute(
+            "SELECT document_id, user_id, title, content, summary, timestamp FROM documents WHERE id = ?",
+            (f"{user_id}_{document_id}",),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def index_document(self, document_id: str, user_id: str, title: str, extracted_text: str, summary: str):
+        self.add(build_document(document_id, user_id, title, extracted_text, summary))
@@ -1,17 +1,98 @@
-from google.cloud import storage
 from config import Config
+from services.clients import get_bucket
+from utils.logger import get_logger
+from utils.metrics import span
+
+logger = get_logger(__name__)
+
+
+class StoredObject:
+    """
+    Lazy handle on one GCS object. Metadata is fetched with a single get_blob call the
+    first time it is needed; the payload is only downloaded by the read methods.
+    Objects that were already listed can pass their blob to skip that call.
+    """
+
+    def __init__(self, bucket, path: str, blob=None):
+        self.path = path
+        self._bucket = bucket
+        self._blob = blob
+        self._fetched = blob is not None
+
+    def _load(self):
+        if not self._fetched:
+            with span("gcs", "get_metadata"):
+                self._blob = self._bucket.get_blob(self.path)
+            self._fetched = True
+        return self._blob
+
+    @property
+    def exists(self) -> bool:
+        return self._load() is not None
+
+    @property
+    def blob(self):
+        """The blob with its metadata loaded. Raises FileNotFoundError if it does not exist."""
+        blob = self._load()
+        if blob is None:
+            raise FileNotFoundError(f"File {self.path} not found in bucket {self._bucket.name}")
+        return blob
+
+    @property
+    def size(self) -> int:
+        return self.blob.size
+
+    def read_bytes(self) -> bytes:
+        blob = self.blob
+        with span("gcs", "read", size=blob.size):
+            return blob.download_as_bytes()
+
+    def read_text(self) -> str:
+        blob = self.blob
+        with span("gcs", "read", size=blob.size):
+            return blob.download_as_text()
+
+    def read_range(self, start: int, end: int) -> bytes:
+        """Bytes start..end inclusive, in one ranged request."""
+        blob = self.blob
+        with span("gcs", "read_range", size=end - start + 1):
+            return blob.download_as_bytes(start=start, end=end)
+
+    def open(self):
+        """Buffered file-like reader that fetches GCS_STREAM_CHUNK_BYTES at a time."""
+        return self.blob.open("rb", chunk_size=Config.GCS_STREAM_CHUNK_BYTES)
+
+
+class StorageSession:
+    """
+    Per-request (or per-job) view of the bucket: each path's metadata is fetched at
+    most once, however many steps look at it.
+    """
+
+    def __init__(self, bucket=None):
+        self.bucket = bucket or get_bucket()
+        self._objects = {}
+
+    def get(self, path: str) -> StoredObject:
+        stored = self._objects.get(path)
+        if stored is None:
+            stored = self._objects[path] = StoredObject(self.bucket, path)
+        return stored
+
+    def forget(self, path: str):
+        """Drops memoized metadata after the object was written."""
+        self._objects.pop(path, None)
 
-storage_client = storage.Client()
-bucket = storage_client.bucket(Config.STORAGE_BUCKET)
 
 def save_text_to_file(content: str, file_path: str):
     """
     Saves a given text content as a file in Google Cloud Storage.
     """
     try:
-        blob = bucket.blob(file_path)
-        blob.upload_from_string(content, content_type="text/plain")
-        print(f"Summary saved at {file_path}")
+        blob = get_bucket().blob(file_path)
+        with span("gcs", "write", size=len(content)):
+            blob.upload_from_string(content, content_type="text/plain")
+        logger.info("Summary saved", extra={"path": file_path})
     except Exception as e:
-        print(f"Error saving summary: {str(e)}")
+        logger.error("Error saving summary", extra={"path": file_path, "error": str(e)})
         raise
@@ -0,0 +1,67 @@
+# conftest
+#
+# Tests run against the in-memory backends from benchmarks/fakes.py: nothing here
+# talks to GCP or a real Elasticsearch cluster.
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix="documind-tests-")
+
+# Read when config is imported, so set before any application module is loaded
+os.environ.update({
+    "STORAGE_BUCKET": "test-bucket",
+    "GCP_PROJECT_ID": "test",
+    "BIGQUERY_DATASET": "test",
+    "ELASTICSEARCH_URL": "http://elasticsearch.test:9200",
+    "GEMINI_API_KEY": "test",
+    "ANALYTICS_ROLLUP_INTERVAL": "0",
+    "WARMUP_BACKENDS": "",
+    "LOG_LEVEL": "WARNING",
+    "SQLITE_SEARCH_PATH": os.path.join(_workdir, "search.db"),
+    "LEASE_PATH": os.path.join(_workdir, "leases.db"),
+    "ACTIVITY_SPILL_PATH": os.path.join(_workdir, "activity_spill.ndjson"),
+    "ACTIVITY_DEAD_LETTER_PATH": os.path.join(_workdir, "activity_dead_letter.ndjson"),
+})
+
+import pytest
+
+
+@pytest.fixture
+def backends():
+    """Fake GCS, Vision, Gemini, Elasticsearch, Firestore and BigQuery clients, by registry name."""
+    from benchmarks import fakes
+    from services import clients, elasticsearch
+    from services.gcp_summarization import MODEL_NAME
+
+    installed = fakes.install({}, fakes.vocabulary(), [MODEL_NAME])
+    elasticsearch._index_ready = False
+    elasticsearch._result_cache.clear()
+    yield installed
+    with clients._lock:
+        clients._clients.clear()
+        clients._stats.clear()
+    elasticsearch._index_ready = False
+    elasticsearch._result_cache.clear()
+
+
+@pytest.fixture
+def indexed(monkeypatch, tmp_path, backends):
+    """Two users' documents in the fake cluster."""
+    from config import Config
+    from services import elasticsearch, indexer
+
+    monkeypatch.setattr(Config, "INDEX_SPILL_PATH", str(tmp_path / "index_spill.ndjson"))
+    bulk = indexer.BulkIndexer()
+    for user_id, document_id, title in [
+        ("alice", "a1", "Quarterly report"),
+        ("alice", "a2", "Quality handbook"),
+        ("bob", "b1", "Quarterly forecast"),
+    ]:
+        bulk.add(elasticsearch.build_index_action(document_id, user_id, title, f"{title} text", f"{title} summary"))
+    bulk.stop()
+    return backends
@@ -0,0 +1,118 @@
+import json
+import os
+import pytest
+from config import Config
+from services import bigquery, clients
+
+
+class ScriptedBigQuery:
+    """insert_rows_json stand-in: raises while down, otherwise rejects the scripted row ids with their reason."""
+
+    project = "test"
+
+    def __init__(self):
+        self.down = False
+        self.rejected = {}
+        self.calls = []
+        self.rows = {}
+
+    def insert_rows_json(self, table: str, rows: list, row_ids: list = None) -> list:
+        if self.down:
+            raise ConnectionError("BigQuery unavailable")
+        self.calls.append(len(rows))
+        errors = []
+        for index, (row, row_id) in enumerate(zip(rows, row_ids)):
+            if row_id in self.rejected:
+                errors.append({"index": index, "errors": [{"reason": self.rejected[row_id]}]})
+            else:
+                self.rows[row_id] = row
+        return errors
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, backends):
+    monkeypatch.setattr(Config, "ACTIVITY_SPILL_PATH", str(tmp_path / "activity_spill.ndjson"))
+    monkeypatch.setattr(Config, "ACTIVITY_DEAD_LETTER_PATH", str(tmp_path / "activity_dead_letter.ndjson"))
+    monkeypatch.setattr(Config, "ACTIVITY_BATCH_SIZE", 2)
+    monkeypatch.setattr(Config, "ACTIVITY_FLUSH_INTERVAL", 0.05)
+    scripted = ScriptedBigQuery()
+    clients.install("bigquery", scripted)
+    return scripted
+
+
+def _log(activity: bigquery.ActivityLogger, count: int, start: int = 0):
+    for index in range(start, start + count):
+        activity.log({"insert_id": f"row-{index}", "user_id": "user-1", "document_id": f"doc-{index}", "status": "processed"})
+
+
+def test_rows_are_inserted_in_batches_on_stop(client):
+    activity = bigquery.ActivityLogger()
+    _log(activity, 5)
+    activity.stop()
+
+    assert sorted(client.rows) == [f"row-{index}" for index in range(5)]
+    assert max(client.calls) <= 2
+    # insertId goes to row_ids, not into the row
+    assert "insert_id" not in client.rows["row-0"]
+
+
+def test_rows_spilled_while_bigquery_is_down_are_replayed(client):
+    client.down = True
+    activity = bigquery.ActivityLogger()
+    _log(activity, 3)
+    activity.stop()
+
+    assert client.rows == {}
+    assert activity.stats["spilled"] == 3
+
+    client.down = False
+    recovered = bigquery.ActivityLogger()
+    _log(recovered, 1, start=3)
+    recovered.stop()
+
+    assert sorted(client.rows) == ["row-0", "row-1", "row-2", "row-3"]
+    assert recovered.stats["replayed"] == 3
+    assert not os.path.exists(Config.ACTIVITY_SPILL_PATH)
+
+
+def _lines(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_only_rejected_rows_are_spilled(client):
+    client.rejected = {"row-1": "stopped"}
+    activity = bigquery.ActivityLogger()
+    _log(activity, 3)
+    activity.stop()
+
+    assert sorted(client.rows) == ["row-0", "row-2"]
+    assert activity.stats["inserted"] == 2
+    assert [row["insert_id"] for row in _lines(Config.ACTIVITY_SPILL_PATH)] == ["row-1"]
+
+
+def test_invalid_rows_are_dead_lettered_instead_of_replayed(client):
+    client.rejected = {"row-1": "invalid"}
+    activity = bigquery.ActivityLogger()
+    _log(activity, 3)
+    activity.stop()
+
+    assert not os.path.exists(Config.ACTIVITY_SPILL_PATH)
+    dead = _lines(Config.ACTIVITY_DEAD_LETTER_PATH)
+    assert [(row["insert_id"], row["errors"]) for row in dead] == [("row-1", [{"reason": "invalid"}])]
+    assert activity.stats["dead_lettered"] == 1
+
+
+def test_replays_of_a_rejected_row_are_capped(monkeypatch, client):
+    monkeypatch.setattr(Config, "ACTIVITY_MAX_REPLAYS", 2)
+    monkeypatch.setattr(Config, "ACTIVITY_BATCH_SIZE", 1)
+    client.rejected = {"row-0": "stopped"}
+    activity = bigquery.ActivityLogger()
+    _log(activity, 5)
+    activity.stop()
+
+    # Rejected once on insert, then on two replays; after that it stops costing insert calls
+    assert activity.stats["dead_lettered"] == 1
+    assert not os.path.exists(Config.ACTIVITY_SPILL_PATH)
+    assert [row["attempts"] for row in _lines(Config.ACTIVITY_DEAD_LETTER_PATH)] == [2]
+    assert "attempts" not in client.rows["row-1"]
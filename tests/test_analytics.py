@@ -0,0 +1,74 @@
+import threading
+import time
+import pytest
+from config import Config
+from services import analytics
+
+
+@pytest.fixture
+def rollup(monkeypatch):
+    """Stubs BigQuery: the rollup table row count, and the ranges refresh_rollups rebuilds."""
+    state = {"row_count": 0, "refreshed": []}
+    monkeypatch.setattr(analytics, "_run_query", lambda sql, params: [{"row_count": state["row_count"]}])
+    monkeypatch.setattr(analytics, "refresh_rollups", lambda days=None: state["refreshed"].append(days))
+    monkeypatch.setattr(analytics, "_rollup_table", lambda: "`test.test.document_activity_daily`")
+    return state
+
+
+def test_backfill_fills_an_empty_rollup(rollup):
+    assert analytics.backfill_rollups() is True
+    assert rollup["refreshed"] == [365]
+
+
+def test_backfill_skips_a_populated_rollup(rollup):
+    rollup["row_count"] = 42
+
+    assert analytics.backfill_rollups() is False
+    assert rollup["refreshed"] == []
+
+
+def test_backfill_with_days_always_rebuilds(rollup):
+    rollup["row_count"] = 42
+
+    assert analytics.backfill_rollups(days=30) is True
+    assert rollup["refreshed"] == [30]
+
+
+def test_concurrent_dashboard_loads_share_one_query(monkeypatch):
+    analytics._cache.clear()
+    calls = []
+
+    def compute(user_id, days):
+        calls.append((user_id, days))
+        time.sleep(0.1)
+        return {"days": days, "user_id": user_id}
+
+    monkeypatch.setattr(analytics, "_compute_analytics", compute)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(analytics.get_analytics("user-1", 7))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [("user-1", 7)]
+    assert results == [{"days": 7, "user_id": "user-1"}] * 8
+    assert analytics.get_analytics("user-1", 7) == {"days": 7, "user_id": "user-1"}
+    assert len(calls) == 1
+    analytics._cache.clear()
+
+
+def test_rollups_do_not_start_unless_enabled(monkeypatch):
+    runs = []
+    monkeypatch.setattr(analytics, "_rollup_thread", None)
+    monkeypatch.setattr(analytics, "_rollup_loop", lambda: runs.append(1))
+    monkeypatch.setattr(Config, "ANALYTICS_ROLLUP_INTERVAL", 900)
+
+    monkeypatch.setattr(Config, "ANALYTICS_ROLLUPS_ENABLED", False)
+    analytics.start_rollups()
+    assert analytics._rollup_thread is None
+
+    monkeypatch.setattr(Config, "ANALYTICS_ROLLUPS_ENABLED", True)
+    analytics.start_rollups()
+    analytics._rollup_thread.join(5)
+    assert runs == [1]
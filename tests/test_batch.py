@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from config import Config
+from routes.processing import process_documents_batch
+from schemas.models import BatchProcessRequest
+from services import batch
+from services.jobs import Job
+from utils.lru import LRUCache
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.indexed = []
+
+    def index_document(self, document_id, user_id, title, text, summary):
+        self.indexed.append(document_id)
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def run_batch(monkeypatch, backends):
+    """Runs process_batch over the fake backends, recording status updates and activity rows."""
+    recorded = {"status": {}, "activity": [], "backend": RecordingBackend()}
+    monkeypatch.setattr(batch, "get_search_backend", lambda: recorded["backend"])
+    monkeypatch.setattr(batch, "update_document_status",
+                        lambda user_id, document_id, data: recorded["status"].__setitem__(document_id, data["status"]))
+    monkeypatch.setattr(batch, "log_document_activity",
+                        lambda user_id, document_id, status, duration_ms=None: recorded["activity"].append((document_id, duration_ms)))
+
+    def run(document_ids=None, prefix=None, count=3):
+        for index in range(count):
+            backends["bucket"].put(f"documents/user-1/scan-{index}.png", f"image {index}".encode(), "image/png")
+        job = Job("user-1", None, batch.BATCH_STAGES)
+        recorded["result"] = batch.process_batch(job, "user-1", document_ids, prefix)
+        return recorded
+    return run
+
+
+def test_batch_processes_every_document(run_batch):
+    recorded = run_batch(prefix="scan-")
+
+    assert recorded["result"] == {"total": 3, "processed": 3, "failed": {}, "skipped": []}
+    assert sorted(recorded["backend"].indexed) == ["scan-0.png", "scan-1.png", "scan-2.png"]
+    assert set(recorded["status"].values()) == {"processed"}
+
+
+def test_prefix_past_the_limit_reports_skipped_documents(monkeypatch, run_batch):
+    monkeypatch.setattr(Config, "BATCH_MAX_DOCUMENTS", 2)
+
+    recorded = run_batch(prefix="scan-")
+
+    assert recorded["result"]["total"] == 2
+    assert recorded["result"]["skipped"] == ["scan-2.png"]
+    assert "scan-2.png" not in recorded["status"]
+
+
+def test_missing_documents_fail_individually(run_batch):
+    recorded = run_batch(document_ids=["scan-0.png", "missing.png"], count=1)
+
+    assert recorded["result"]["processed"] == 1
+    assert list(recorded["result"]["failed"]) == ["missing.png"]
+    assert recorded["status"] == {"scan-0.png": "processed", "missing.png": "failed"}
+
+
+def test_batch_activity_has_no_per_document_duration(run_batch):
+    recorded = run_batch(prefix="scan-")
+
+    assert sorted(recorded["activity"]) == [("scan-0.png", None), ("scan-1.png", None), ("scan-2.png", None)]
+
+
+def test_route_rejects_too_many_document_ids(monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_MAX_DOCUMENTS", 2)
+    request = BatchProcessRequest(user_id="user-1", document_ids=["a", "b", "c"])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(process_documents_batch(request))
+    assert error.value.status_code == 400
+
+
+def test_only_fresh_ocr_results_are_written(monkeypatch, run_batch, backends):
+    monkeypatch.setattr(batch.cache, "_memory", LRUCache(maxsize=16))
+    writes = []
+    put = batch.cache.put_extracted_text
+    monkeypatch.setattr(batch.cache, "put_extracted_text", lambda key, text: (writes.append("cache"), put(key, text)))
+    save = batch.save_text_to_cloud
+    monkeypatch.setattr(batch, "save_text_to_cloud", lambda text, path, bucket: (writes.append(path), save(text, path, bucket)))
+
+    run_batch(prefix="scan-", count=2)
+    assert sorted(writes) == ["cache", "cache", "extracted_documents/user-1/scan-0.png", "extracted_documents/user-1/scan-1.png"]
+
+    # Cache hits whose text is already saved write nothing; a new copy of a file only gets its own text
+    writes.clear()
+    backends["bucket"].put("documents/user-1/scan-copy.png", b"image 0", "image/png")
+    recorded = run_batch(prefix="scan-", count=2)
+    assert recorded["result"]["processed"] == 3
+    assert writes == ["extracted_documents/user-1/scan-copy.png"]
@@ -0,0 +1,54 @@
+import copy
+import json
+import pytest
+from benchmarks import fakes, pipeline
+
+
+@pytest.fixture
+def baseline():
+    with open(pipeline.baseline_path("smoke", "realistic"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_percentiles_use_the_nearest_rank():
+    summary = pipeline.percentiles(list(range(1, 101)))
+
+    assert summary == {"count": 100, "p50": 50, "p95": 95, "p99": 99, "max": 100}
+    assert pipeline.percentiles([7.0]) == {"count": 1, "p50": 7.0, "p95": 7.0, "p99": 7.0, "max": 7.0}
+    assert pipeline.percentiles([]) == {"count": 0}
+
+
+def test_a_run_equal_to_the_baseline_has_no_regressions(baseline):
+    assert pipeline.compare(copy.deepcopy(baseline), baseline) == []
+
+
+def test_lower_throughput_and_slower_stages_are_regressions(baseline):
+    result = copy.deepcopy(baseline)
+    result["documents"]["docs_per_sec"] = baseline["documents"]["docs_per_sec"] * 0.5
+    stage = next(name for name, values in baseline["stages_ms"].items() if values.get("p95", 0) > 50)
+    result["stages_ms"][stage]["p95"] = baseline["stages_ms"][stage]["p95"] * 2
+
+    regressed = {regression["metric"] for regression in pipeline.compare(result, baseline)}
+
+    assert regressed == {"documents.docs_per_sec", f"stages_ms.{stage}.p95"}
+
+
+def test_small_latency_changes_are_noise(baseline):
+    result = copy.deepcopy(baseline)
+    name, values = next((name, values) for name, values in baseline["stages_ms"].items() if 0 < values.get("p95", 0) < 20)
+    result["stages_ms"][name]["p95"] = values["p95"] + 5
+
+    assert pipeline.compare(result, baseline, min_delta_ms=10) == []
+
+
+def test_latency_profile_is_deterministic_with_a_seed():
+    first, second = fakes.LatencyProfile(100, 10, seed=3), fakes.LatencyProfile(100, 10, seed=3)
+
+    assert [first.delay(2) for _ in range(5)] == [second.delay(2) for _ in range(5)]
+    assert fakes.LatencyProfile(100, 10, jitter=0).delay(2) == pytest.approx(0.12)
+
+
+def test_synthetic_pdfs_round_trip_through_the_fake_ocr():
+    pages = ["first page\nwith (parentheses)", "second page"]
+
+    assert fakes.pdf_pages(fakes.synthetic_pdf(pages)) == pages
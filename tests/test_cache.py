@@ -0,0 +1,91 @@
+import base64
+import hashlib
+from types import SimpleNamespace
+import pytest
+from config import Config
+from services import cache
+from utils.lru import LRUCache
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch, backends):
+    monkeypatch.setattr(cache, "_memory", LRUCache(maxsize=16))
+    monkeypatch.setattr(cache, "_stats", {
+        namespace: {"memory_hits": 0, "gcs_hits": 0, "misses": 0, "compute_seconds": 0.0, "computed": 0}
+        for namespace in ("ocr", "summary")
+    })
+    return backends
+
+
+def test_content_key_uses_md5_then_crc32c():
+    md5 = base64.b64encode(hashlib.md5(b"scan").digest()).decode()
+    crc = base64.b64encode(b"\x01\x02\x03\x04").decode()
+
+    assert cache.content_key(SimpleNamespace(md5_hash=md5, crc32c=crc, size=4)) == "md5-" + hashlib.md5(b"scan").hexdigest()
+    assert cache.content_key(SimpleNamespace(md5_hash=None, crc32c=crc, size=4)) == "crc32c-01020304-4"
+    assert cache.content_key(SimpleNamespace(md5_hash=None, crc32c=None, size=4)) is None
+
+
+def test_extracted_text_is_served_from_memory_then_gcs(fresh_cache):
+    assert cache.get_extracted_text("md5-abc") is None
+
+    cache.put_extracted_text("md5-abc", "page one")
+    assert cache.get_extracted_text("md5-abc") == "page one"
+    assert fresh_cache["bucket"].read("cache/md5-abc/extracted_text.txt") == b"page one"
+
+    # Another instance (or an evicted entry) falls back to the GCS copy
+    cache._memory.clear()
+    assert cache.get_extracted_text("md5-abc") == "page one"
+
+    stats = cache.get_stats()["ocr"]
+    assert (stats["misses"], stats["memory_hits"], stats["gcs_hits"]) == (1, 1, 1)
+
+
+def test_summaries_are_keyed_by_type_and_language(fresh_cache):
+    cache.put_summary("sha256-text", "short", "English", "A short summary")
+
+    assert cache.get_summary("sha256-text", "short", "English") == "A short summary"
+    assert cache.get_summary("sha256-text", "short", "German") is None
+    assert cache.get_summary("sha256-text", "detailed", "English") is None
+
+
+def test_time_saved_is_estimated_from_computed_misses(fresh_cache):
+    cache.record_compute("ocr", 2.0)
+    cache.put_extracted_text("md5-abc", "page one")
+    cache.get_extracted_text("md5-abc")
+    cache.get_extracted_text("md5-abc")
+
+    stats = cache.get_stats()["ocr"]
+    assert stats["api_calls_saved"] == 2
+    assert stats["estimated_seconds_saved"] == 4.0
+
+
+def test_disabled_cache_never_reads(monkeypatch, fresh_cache):
+    cache.put_extracted_text("md5-abc", "page one")
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+
+    assert cache.get_extracted_text("md5-abc") is None
+
+
+def test_empty_text_is_never_a_cache_entry(fresh_cache):
+    cache.put_extracted_text("md5-abc", "")
+    assert cache.get_extracted_text("md5-abc") is None
+
+    # An empty object left behind by an older version is a miss too
+    fresh_cache["bucket"].put("cache/md5-def/extracted_text.txt", b"", "text/plain")
+    assert cache.get_extracted_text("md5-def") is None
+
+
+def test_failed_image_ocr_is_neither_cached_nor_saved(monkeypatch, fresh_cache):
+    from google.cloud import vision
+    from services import gcp_vision
+
+    bucket = fresh_cache["bucket"]
+    bucket.put("documents/user-1/doc-1", b"\x89PNG scan", "image/png")
+    monkeypatch.setattr(fresh_cache["vision"], "text_detection",
+                        lambda image=None, **kwargs: vision.AnnotateImageResponse(error={"message": "quota exceeded"}))
+
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        gcp_vision.extract_text("documents/user-1/doc-1", "extracted_documents/user-1/doc-1", "doc-1", "user-1")
+
+    assert [path for path in bucket._objects if not path.startswith("documents/")] == []
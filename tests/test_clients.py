@@ -0,0 +1,74 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from services import clients
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    with clients._lock:
+        saved = dict(clients._clients), dict(clients._stats)
+        clients._clients.clear()
+        clients._stats.clear()
+    yield
+    with clients._lock:
+        clients._clients.clear()
+        clients._stats.clear()
+        clients._clients.update(saved[0])
+        clients._stats.update(saved[1])
+
+
+def test_concurrent_callers_share_one_client():
+    built = []
+
+    def factory():
+        time.sleep(0.05)
+        built.append(object())
+        return built[-1]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(clients._get_or_create("storage", factory)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert all(client is built[0] for client in results)
+    stats = clients.get_stats()["clients"]["storage"]
+    assert (stats["created"], stats["reused"]) == (1, 7)
+
+
+def test_installed_clients_are_used_instead_of_building_one():
+    fake = object()
+    clients.install("vision", fake)
+
+    assert clients.get_vision_client() is fake
+    assert clients.get_stats()["clients"]["vision"]["created"] == 0
+
+
+def test_bucket_handles_come_from_the_shared_client(backends):
+    assert clients.get_bucket() is backends["bucket"]
+    assert clients.get_bucket("other").name == "other"
+
+
+def test_shutdown_closes_pooled_connections():
+    closed = []
+
+    class Closable:
+        def __init__(self, name):
+            self.name = name
+
+        def close(self):
+            closed.append(self.name)
+
+    clients.install("storage", SimpleNamespace(_http=Closable("storage")))
+    clients.install("vision", SimpleNamespace(transport=Closable("vision")))
+    clients.install("elasticsearch", Closable("elasticsearch"))
+
+    clients.shutdown()
+
+    assert sorted(closed) == ["elasticsearch", "storage", "vision"]
+    assert clients._clients == {}
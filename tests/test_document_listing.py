@@ -0,0 +1,115 @@
+import asyncio
+import json
+import pytest
+from services import firestore
+
+
+class Snapshot:
+    def __init__(self, doc_id: str, data: dict):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self) -> dict:
+        return dict(self._data)
+
+
+class Query:
+    """The part of the async Firestore query API the listing uses, over a dict of documents."""
+
+    def __init__(self, documents: dict, fields: list = None, after: str = None, limit: int = None):
+        self.documents = documents
+        self.fields = fields
+        self.after = after
+        self._limit = limit
+
+    def select(self, fields: list):
+        return Query(self.documents, list(fields), self.after, self._limit)
+
+    def order_by(self, field: str):
+        assert field == "__name__"
+        return self
+
+    def start_after(self, snapshot: Snapshot):
+        return Query(self.documents, self.fields, snapshot.id, self._limit)
+
+    def limit(self, count: int):
+        return Query(self.documents, self.fields, self.after, count)
+
+    async def stream(self):
+        doc_ids = [doc_id for doc_id in sorted(self.documents) if self.after is None or doc_id > self.after]
+        for doc_id in doc_ids[:self._limit]:
+            data = self.documents[doc_id]
+            yield Snapshot(doc_id, {field: data[field] for field in self.fields if field in data})
+
+
+class Reference:
+    def __init__(self, doc_id: str, subcollection: dict = None):
+        self.doc_id = doc_id
+        self.subcollection = subcollection
+
+    def collection(self, name: str):
+        return Collection(self.subcollection)
+
+    async def get(self, field_paths: list = None):
+        assert field_paths == []
+        return Snapshot(self.doc_id, {})
+
+
+class Collection:
+    def __init__(self, documents: dict, subcollection: dict = None):
+        self.documents = documents
+        self.subcollection = subcollection
+
+    def document(self, doc_id: str):
+        return Reference(doc_id, self.subcollection)
+
+    def select(self, fields: list):
+        return Query(self.documents).select(fields)
+
+
+class AsyncDb:
+    """Every users/{user_id}/documents collection holds the given documents."""
+
+    def __init__(self, documents: dict):
+        self.documents = documents
+
+    def collection(self, name: str):
+        return Collection({}, subcollection=self.documents)
+
+
+@pytest.fixture
+def documents(monkeypatch):
+    documents = {
+        f"doc-{index}": {"file_name": f"scan-{index}.pdf", "status": "processed", "ocr_text": "x" * 1000}
+        for index in range(5)
+    }
+    monkeypatch.setattr(firestore, "get_async_db", lambda: AsyncDb(documents))
+    return documents
+
+
+def test_pages_follow_the_cursor(documents):
+    first = asyncio.run(firestore.list_user_documents("user-1", limit=2))
+    second = asyncio.run(firestore.list_user_documents("user-1", limit=2, start_after=first["next_cursor"]))
+    last = asyncio.run(firestore.list_user_documents("user-1", limit=2, start_after=second["next_cursor"]))
+
+    assert [doc["id"] for doc in first["documents"] + second["documents"] + last["documents"]] == sorted(documents)
+    assert last["next_cursor"] is None
+
+
+def test_list_views_leave_out_the_ocr_text(documents):
+    page = asyncio.run(firestore.list_user_documents("user-1", limit=1))
+    assert page["documents"] == [{"file_name": "scan-0.pdf", "status": "processed", "id": "doc-0"}]
+
+    page = asyncio.run(firestore.list_user_documents("user-1", limit=1, fields=["ocr_text"]))
+    assert set(page["documents"][0]) == {"ocr_text", "id"}
+
+
+def test_stream_yields_every_document_as_ndjson(documents):
+    async def collect():
+        return [line async for line in firestore.stream_user_documents("user-1", ["file_name"])]
+
+    lines = asyncio.run(collect())
+
+    assert [json.loads(line) for line in lines] == [
+        {"file_name": f"scan-{index}.pdf", "id": f"doc-{index}"} for index in range(5)
+    ]
@@ -0,0 +1,53 @@
+import pytest
+from config import Config
+from services import elasticsearch, es_migrations
+from services.elasticsearch import INDEX_NAME, MAPPING_VERSION, MappingVersionError, versioned_index_name
+
+
+def _alias(es, *indices):
+    for index in indices:
+        es.indices.create(index=index, body=elasticsearch.INDEX_SETTINGS)
+    es.indices.update_aliases(body={"actions": [{"add": {"index": index, "alias": INDEX_NAME}} for index in indices]})
+
+
+def test_index_version():
+    assert elasticsearch.index_version(versioned_index_name(12)) == 12
+    assert elasticsearch.index_version(INDEX_NAME) == 0
+
+
+def test_current_index_compares_versions_numerically(backends):
+    _alias(backends["elasticsearch"], versioned_index_name(9), versioned_index_name(10))
+
+    assert es_migrations.current_index() == versioned_index_name(10)
+
+
+def test_ensure_index_creates_the_first_index(backends):
+    elasticsearch.ensure_index()
+
+    assert es_migrations.current_index() == versioned_index_name()
+
+
+def test_ensure_index_refuses_an_old_mapping_by_default(monkeypatch, backends):
+    monkeypatch.setattr(Config, "ES_AUTO_MIGRATE", False)
+    _alias(backends["elasticsearch"], versioned_index_name(MAPPING_VERSION - 1))
+
+    with pytest.raises(MappingVersionError):
+        elasticsearch.ensure_index()
+    assert es_migrations.current_index() == versioned_index_name(MAPPING_VERSION - 1)
+
+
+def test_ensure_index_migrates_when_enabled(monkeypatch, backends):
+    monkeypatch.setattr(Config, "ES_AUTO_MIGRATE", True)
+    _alias(backends["elasticsearch"], versioned_index_name(MAPPING_VERSION - 1))
+
+    elasticsearch.ensure_index()
+
+    assert es_migrations.current_index() == versioned_index_name()
+
+
+def test_newer_mapping_is_left_alone(backends):
+    _alias(backends["elasticsearch"], versioned_index_name(MAPPING_VERSION + 1))
+
+    elasticsearch.ensure_index()
+
+    assert es_migrations.current_index() == versioned_index_name(MAPPING_VERSION + 1)
@@ -0,0 +1,55 @@
+import io
+import pytest
+from PIL import Image
+from config import Config
+from services import image_preprocessing
+
+
+def _image(size: tuple, mode: str = "RGB", format: str = "PNG", frames: int = 1) -> bytes:
+    output = io.BytesIO()
+    images = [Image.effect_noise(size, 64 + 16 * index).convert(mode) for index in range(frames)]
+    images[0].save(output, format=format, save_all=frames > 1, append_images=images[1:])
+    return output.getvalue()
+
+
+def test_large_images_are_downscaled_to_grayscale_jpeg():
+    original = _image((1600, 800))
+
+    prepared = image_preprocessing.prepare_image(original, max_dimension=400)
+
+    with Image.open(io.BytesIO(prepared)) as image:
+        assert (image.format, image.mode, image.size) == ("JPEG", "L", (400, 200))
+    assert len(prepared) < len(original)
+
+
+def test_multi_frame_images_are_left_alone():
+    tiff = _image((200, 200), format="TIFF", frames=3)
+
+    assert image_preprocessing.count_frames(tiff) == 3
+    assert image_preprocessing.prepare_image(tiff) == tiff
+
+
+def test_small_and_undecodable_images_pass_through(monkeypatch):
+    small = _image((20, 20))
+    assert image_preprocessing.preprocess_image(small) == small
+
+    monkeypatch.setattr(Config, "IMAGE_PREPROCESS_MIN_BYTES", 0)
+    assert image_preprocessing.count_frames(b"not an image") == 1
+    try:
+        assert image_preprocessing.preprocess_image(b"not an image") == b"not an image"
+    finally:
+        image_preprocessing.shutdown()
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_preprocessing_can_be_disabled(monkeypatch, enabled):
+    monkeypatch.setattr(Config, "IMAGE_PREPROCESS_ENABLED", enabled)
+    monkeypatch.setattr(Config, "IMAGE_PREPROCESS_MIN_BYTES", 0)
+    original = _image((1200, 1200))
+
+    try:
+        prepared = image_preprocessing.preprocess_image(original)
+    finally:
+        image_preprocessing.shutdown()
+
+    assert (len(prepared) < len(original)) is enabled
@@ -0,0 +1,126 @@
+import json
+import time
+import pytest
+from config import Config
+from services import indexer
+from services.elasticsearch import build_index_action
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "INDEX_SPILL_PATH", str(tmp_path / "index_spill.ndjson"))
+    monkeypatch.setattr(Config, "INDEX_BATCH_SIZE", 2)
+    monkeypatch.setattr(Config, "INDEX_FLUSH_INTERVAL", 0.05)
+    monkeypatch.setattr(Config, "INDEX_INITIAL_BACKOFF", 0.2)
+    monkeypatch.setattr(Config, "INDEX_MAX_BACKOFF", 1)
+
+
+def _actions(count: int) -> list:
+    return [build_index_action(f"doc-{index}", "user-1", "Untitled", f"text {index}", "summary") for index in range(count)]
+
+
+def _indexed(backends) -> dict:
+    cluster = backends["cluster"]
+    return {doc_id: source for index in cluster.indices.values() for doc_id, source in index["docs"].items()}
+
+
+def test_bulk_indexer_writes_batches(backends):
+    bulk = indexer.BulkIndexer()
+    for action in _actions(5):
+        bulk.add(action)
+    bulk.stop()
+
+    assert bulk.stats["indexed"] == 5
+    assert bulk.stats["failed"] == 0
+    assert len(_indexed(backends)) == 5
+
+
+def test_flusher_backs_off_while_cluster_is_down(monkeypatch):
+    attempts = []
+
+    def unreachable():
+        attempts.append(time.monotonic())
+        raise ConnectionError("cluster unreachable")
+
+    monkeypatch.setattr(indexer, "ensure_index", unreachable)
+    bulk = indexer.BulkIndexer()
+    # A full batch skips the flush interval, so only the backoff slows the retries
+    for action in _actions(4):
+        bulk.add(action)
+    time.sleep(0.7)
+    retries = len(attempts)
+    bulk.stop()
+
+    # 0.2s then 0.4s between attempts, instead of retrying in a tight loop
+    assert 2 <= retries <= 3
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_stop_spills_unwritten_actions_and_start_replays_them(monkeypatch, backends):
+    def unreachable():
+        raise ConnectionError("cluster unreachable")
+
+    ensure_index = indexer.ensure_index
+    monkeypatch.setattr(indexer, "ensure_index", unreachable)
+    down = indexer.BulkIndexer()
+    down.add(_actions(1)[0])
+    down.stop()  # Does not raise
+
+    assert down.stats["spilled"] == 1
+
+    monkeypatch.setattr(indexer, "ensure_index", ensure_index)
+    recovered = indexer.BulkIndexer()
+    recovered.start()
+    recovered.stop()
+
+    assert recovered.stats["indexed"] == 1
+    assert list(_indexed(backends)) == ["user-1_doc-0"]
+
+
+def test_actions_survive_a_bulk_request_that_fails(monkeypatch, backends):
+    from elastic_transport import ConnectionError as TransportConnectionError
+    from elasticsearch import Elasticsearch
+
+    def unreachable(self, *args, **kwargs):
+        raise TransportConnectionError("connection reset")
+
+    bulk_call = Elasticsearch.bulk
+    monkeypatch.setattr(Elasticsearch, "bulk", unreachable)
+    down = indexer.BulkIndexer()
+    for action in _actions(3):
+        down.add(action)
+    down.stop()
+
+    assert down.stats["spilled"] == 3
+    assert _indexed(backends) == {}
+
+    monkeypatch.setattr(Elasticsearch, "bulk", bulk_call)
+    recovered = indexer.BulkIndexer()
+    recovered.start()
+    recovered.stop()
+
+    assert recovered.stats["indexed"] == 3
+
+
+def test_items_failing_with_a_retryable_status_are_spilled(monkeypatch, backends):
+    cluster = backends["cluster"]
+    store = cluster._bulk
+
+    def unavailable_for_doc_1(body, default_index):
+        status, response = store(body, default_index)
+        for item in response["items"]:
+            result = item["index"]
+            if result["_id"] == "user-1_doc-1":
+                result.update(status=503, error={"type": "unavailable_shards_exception"})
+                cluster.indices[result["_index"]]["docs"].pop("user-1_doc-1")
+        return status, {**response, "errors": True}
+
+    monkeypatch.setattr(cluster, "_bulk", unavailable_for_doc_1)
+    bulk = indexer.BulkIndexer()
+    for action in _actions(2):
+        bulk.add(action)
+    bulk.stop()
+
+    assert (bulk.stats["indexed"], bulk.stats["failed"], bulk.stats["spilled"]) == (1, 0, 1)
+    with open(Config.INDEX_SPILL_PATH, encoding="utf-8") as f:
+        assert [json.loads(line)["_id"] for line in f] == ["user-1_doc-1"]
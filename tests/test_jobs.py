@@ -0,0 +1,82 @@
+import threading
+import pytest
+from config import Config
+from services import jobs
+
+
+def _blocked(release: threading.Event):
+    def run(job):
+        release.wait(5)
+        return "done"
+    return run
+
+
+def test_job_runs_in_the_background_and_reports_stages():
+    release = threading.Event()
+
+    def run(job):
+        with job.stage("ocr"):
+            release.wait(5)
+        job.skip_stage("summarize")
+        return {"pages": 3}
+
+    job = jobs.submit_job(run, "user-1", "doc-1", ["ocr", "summarize"])
+    assert jobs.get_job(job.id) is job
+    assert job.status in ("queued", "running")
+
+    release.set()
+    assert job.wait(5)
+    status = job.to_dict()
+    assert status["status"] == "completed"
+    assert status["result"] == {"pages": 3}
+    assert status["stages"]["ocr"]["status"] == "completed"
+    assert status["stages"]["ocr"]["duration_ms"] is not None
+    assert status["stages"]["summarize"]["status"] == "skipped"
+
+
+def test_failures_are_recorded_on_the_job():
+    def run(job):
+        with job.stage("ocr"):
+            raise ValueError("Unsupported file type: text/plain")
+
+    job = jobs.submit_job(run, "user-1", "doc-1", ["ocr"])
+
+    assert job.wait(5)
+    assert job.status == "failed"
+    assert job.error == "Unsupported file type: text/plain"
+    assert job.stages["ocr"]["status"] == "failed"
+
+
+def test_full_queue_rejects_new_jobs(monkeypatch):
+    monkeypatch.setattr(Config, "PROCESSING_QUEUE_SIZE", 1)
+    release = threading.Event()
+    running = jobs.submit_job(_blocked(release), "user-1", "doc-1", [])
+
+    try:
+        with pytest.raises(jobs.QueueFullError):
+            jobs.submit_job(_blocked(release), "user-1", "doc-2", [])
+    finally:
+        release.set()
+        running.wait(5)
+
+    # Room again once the running job has finished
+    assert jobs.submit_job(lambda job: None, "user-1", "doc-2", []).wait(5)
+
+
+def test_concurrent_requests_for_a_document_share_one_job():
+    release = threading.Event()
+    key = ("process", "user-1", "doc-1")
+    first = jobs.submit_job(_blocked(release), "user-1", "doc-1", [], dedupe_key=key)
+    second = jobs.submit_job(_blocked(release), "user-1", "doc-1", [], dedupe_key=key)
+    other = jobs.submit_job(_blocked(release), "user-1", "doc-2", [], dedupe_key=("process", "user-1", "doc-2"))
+
+    release.set()
+    assert first.wait(5) and other.wait(5)
+    assert second is first
+    assert first.to_dict()["attached_requests"] == 1
+    assert other is not first
+
+    # Once finished, a new request starts a new job
+    again = jobs.submit_job(lambda job: None, "user-1", "doc-1", [], dedupe_key=key)
+    assert again is not first
+    assert again.wait(5)
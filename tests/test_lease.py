@@ -0,0 +1,75 @@
+import threading
+import time
+import pytest
+from utils.lease import SQLiteLease
+from utils.singleflight import SingleFlight
+
+
+@pytest.fixture
+def lease(tmp_path):
+    return SQLiteLease(str(tmp_path / "leases.db"), ttl=0.3, poll_interval=0.02)
+
+
+def test_a_lease_has_one_holder_until_released(lease):
+    assert lease.acquire("process:user-1:doc-1", "replica-a")
+    assert not lease.acquire("process:user-1:doc-1", "replica-b")
+    assert lease.acquire("process:user-1:doc-2", "replica-b")
+
+    lease.release("process:user-1:doc-1", "replica-a")
+    assert lease.acquire("process:user-1:doc-1", "replica-b")
+
+
+def test_an_abandoned_lease_expires(lease):
+    assert lease.acquire("process:user-1:doc-1", "replica-a")
+    time.sleep(0.35)
+
+    assert lease.acquire("process:user-1:doc-1", "replica-b")
+
+
+def test_hold_waits_for_the_other_holder_and_renews(lease):
+    order = []
+
+    def replica(name: str, seconds: float):
+        with lease.hold("process:user-1:doc-1", owner=name) as waited:
+            order.append((name, waited))
+            time.sleep(seconds)
+
+    # Holding past the ttl only works if the heartbeat renews the lease
+    first = threading.Thread(target=replica, args=("replica-a", 0.5))
+    first.start()
+    time.sleep(0.05)
+    replica("replica-b", 0)
+    first.join()
+
+    assert order == [("replica-a", False), ("replica-b", True)]
+
+
+def test_single_flight_shares_results_and_errors():
+    flight = SingleFlight()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        time.sleep(0.1)
+        if value == "bad":
+            raise ValueError(value)
+        return value.upper()
+
+    results, errors = [], []
+
+    def call(value):
+        try:
+            results.append(flight.do(value, slow, value))
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call, args=(value,)) for value in ["ok"] * 4 + ["bad"] * 3]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(calls) == ["bad", "ok"]
+    assert results == ["OK"] * 4
+    assert errors == ["bad"] * 3
+    assert not flight.in_flight("ok")
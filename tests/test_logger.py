@@ -0,0 +1,38 @@
+import json
+import logging
+import sys
+from utils import logger
+
+
+def _record(**extra) -> logging.LogRecord:
+    record = logging.LogRecord("documind.tests", logging.ERROR, __file__, 1, "Indexed %d documents", (3,), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_lines_carry_extra_fields():
+    entry = json.loads(logger.JsonFormatter().format(_record(document_id="doc-1", duration_ms=12.5)))
+
+    assert entry["message"] == "Indexed 3 documents"
+    assert entry["level"] == "ERROR"
+    assert (entry["document_id"], entry["duration_ms"]) == ("doc-1", 12.5)
+
+
+def test_text_lines_append_extra_fields():
+    line = logger.TextFormatter().format(_record(document_id="doc-1"))
+
+    assert line.endswith("Indexed 3 documents document_id=doc-1")
+
+
+def test_queued_records_are_resolved_when_logged():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record()
+        record.exc_info = sys.exc_info()
+
+    prepared = logger._QueueHandler(None).prepare(record)
+
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ("Indexed 3 documents", None, None)
+    assert "ValueError: boom" in prepared.exc_text
+    assert "ValueError: boom" in json.loads(logger.JsonFormatter().format(prepared))["exception"]
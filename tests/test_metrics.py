@@ -0,0 +1,74 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from utils import metrics
+
+
+def _routes() -> set:
+    return set(metrics.HTTP_REQUEST_SECONDS._values)
+
+
+@pytest.fixture
+def client():
+    router = APIRouter()
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"item_id": item_id}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.add_middleware(metrics.RequestMetricsMiddleware)
+    metrics.HTTP_REQUEST_SECONDS._values.clear()
+    yield TestClient(app)
+    metrics.HTTP_REQUEST_SECONDS._values.clear()
+
+
+def test_requests_are_labelled_with_the_prefixed_route_template(client):
+    client.get("/api/items/42")
+    # A parameter equal to a literal segment must not rewrite that segment
+    client.get("/api/items/items")
+
+    assert _routes() == {("GET", "/api/items/{item_id}", "200")}
+
+
+def test_unmatched_requests_share_one_series(client):
+    client.get("/api/nothing/1")
+    client.get("/elsewhere")
+
+    assert _routes() == {("GET", "unmatched", "404")}
+
+
+def test_span_records_the_outcome():
+    metrics.EXTERNAL_CALL_SECONDS._values.clear()
+
+    with metrics.span("gcs", "read"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("gcs", "read"):
+            raise ValueError("boom")
+
+    counts = {key: series["count"] for key, series in metrics.EXTERNAL_CALL_SECONDS._values.items()}
+    assert counts == {("gcs", "read", "ok"): 1, ("gcs", "read", "error"): 1}
+    assert metrics.EXTERNAL_CALLS_IN_FLIGHT._values[("gcs", "read")] == 0
+
+
+def test_histograms_render_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test durations.", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, route='/api/"quoted"')
+
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds Test durations.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/api/\\"quoted\\"",le="0.1"} 1',
+        'test_seconds_bucket{route="/api/\\"quoted\\"",le="1"} 3',
+        'test_seconds_bucket{route="/api/\\"quoted\\"",le="+Inf"} 4',
+        'test_seconds_sum{route="/api/\\"quoted\\""} 4.25',
+        'test_seconds_count{route="/api/\\"quoted\\""} 4',
+    ]
+
+
+def test_registered_metrics_are_exposed():
+    assert metrics.counter("documind_jobs_rejected_total", "ignored") is metrics.counter("documind_jobs_rejected_total", "")
+    assert "# TYPE documind_external_call_seconds histogram" in metrics.render()
@@ -0,0 +1,50 @@
+import pytest
+from benchmarks import fakes
+from config import Config
+from services import gcp_vision
+
+PATH = "documents/user-1/long.pdf"
+
+
+@pytest.fixture
+def pdf(backends):
+    pages = [f"page {number}" for number in range(1, 13)]
+    backends["bucket"].put(PATH, fakes.synthetic_pdf(pages), "application/pdf")
+    return pages
+
+
+def test_shards_are_yielded_in_page_order(monkeypatch, pdf, backends):
+    monkeypatch.setattr(Config, "VISION_PDF_SHARD_PAGES", 5)
+    monkeypatch.setattr(Config, "VISION_PDF_SHARD_WORKERS", 2)
+    requested = []
+    annotate = backends["vision"].batch_annotate_files
+
+    def recording(requests):
+        requested.extend(list(request.pages) for request in requests)
+        return annotate(requests)
+
+    monkeypatch.setattr(backends["vision"], "batch_annotate_files", recording)
+
+    shards = list(gcp_vision.iter_file_shards(PATH, backends["vision"]))
+
+    assert [text for texts in shards for text in texts] == pdf
+    # The first request learns the page count; the rest are page ranges of at most 5 pages
+    assert sorted(requested) == [[], [6, 7, 8, 9, 10], [11, 12]]
+
+
+def test_blank_pages_are_dropped(monkeypatch, backends):
+    monkeypatch.setattr(Config, "VISION_PDF_SHARD_PAGES", 2)
+    backends["bucket"].put(PATH, fakes.synthetic_pdf(["cover", "", "body"]), "application/pdf")
+
+    pages = list(gcp_vision.iter_pdf_pages(PATH, backends["vision"], "user-1", "long.pdf"))
+
+    assert pages == ["cover", "body"]
+
+
+def test_single_async_operation_when_sharding_is_off(monkeypatch, pdf, backends):
+    monkeypatch.setattr(Config, "VISION_PDF_SHARD_PAGES", 0)
+    monkeypatch.setattr(Config, "VISION_POLL_INTERVAL", 0.01)
+
+    pages = list(gcp_vision.iter_pdf_pages(PATH, backends["vision"], "user-1", "long.pdf"))
+
+    assert pages == pdf
@@ -0,0 +1,55 @@
+import pytest
+from services import pipeline
+from services.jobs import Job
+
+
+@pytest.fixture
+def recorded(monkeypatch, backends):
+    """Runs the pipeline stages on fake OCR output, recording what they persist."""
+    calls = {"saved": [], "indexed": [], "statuses": []}
+
+    class Backend:
+        def index_document(self, document_id, user_id, title, extracted_text, summary):
+            calls["indexed"].append((document_id, summary))
+
+    monkeypatch.setattr(pipeline, "get_lease", lambda: None)
+    monkeypatch.setattr(pipeline, "iter_extract_text", lambda *args: iter(["page one", "page two"]))
+    monkeypatch.setattr(pipeline, "save_text_to_file", lambda text, path: calls["saved"].append((path, text)))
+    monkeypatch.setattr(pipeline, "get_search_backend", Backend)
+    monkeypatch.setattr(pipeline, "update_document_status", lambda user_id, document_id, data: calls["statuses"].append(data))
+    monkeypatch.setattr(pipeline, "log_document_activity", lambda *args: None)
+    return calls
+
+
+def _summarize_as(summary):
+    def summarize_stream(pieces, **kwargs):
+        list(pieces)
+        return summary
+    return summarize_stream
+
+
+def test_process_document_saves_and_indexes_summary(monkeypatch, recorded):
+    monkeypatch.setattr(pipeline, "summarize_stream", _summarize_as("A short summary"))
+    job = Job("user-1", "doc-1", pipeline.PIPELINE_STAGES)
+
+    result = pipeline.process_document(job, "user-1", "doc-1")
+
+    assert result["summary"] == "A short summary"
+    assert recorded["saved"] == [("summary/user-1/doc-1", "A short summary")]
+    assert recorded["indexed"] == [("doc-1", "A short summary")]
+    assert recorded["statuses"][-1]["status"] == "processed"
+    assert job.events[-1]["type"] == "done"
+
+
+def test_summary_error_fails_the_job_without_saving_or_indexing(monkeypatch, recorded):
+    monkeypatch.setattr(pipeline, "summarize_stream", _summarize_as("Error: quota exceeded"))
+    job = Job("user-1", "doc-1", pipeline.PIPELINE_STAGES)
+
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        pipeline.process_document(job, "user-1", "doc-1")
+
+    assert recorded["saved"] == []
+    assert recorded["indexed"] == []
+    assert recorded["statuses"][-1] == {"status": "failed", "error": "Error: quota exceeded"}
+    assert job.stages["summarize"]["status"] == "failed"
+    assert job.events[-1]["type"] == "error"
@@ -0,0 +1,63 @@
+import asyncio
+from collections import Counter
+import pytest
+from config import Config
+from services import elasticsearch, indexer
+
+
+@pytest.fixture
+def splits(monkeypatch):
+    monkeypatch.setattr(Config, "ES_TENANT_SPLITS", {"big-tenant": 3})
+
+
+def test_java_string_hash_matches_java():
+    # "hello".hashCode() and "polygenelubricants".hashCode() in Java
+    assert elasticsearch._java_string_hash("hello") == 99162322
+    assert elasticsearch._java_string_hash("polygenelubricants") == -2147483648
+
+
+def test_documents_are_routed_by_user(splits):
+    assert elasticsearch.document_routing("alice", "doc-1") == "alice"
+    assert elasticsearch.user_routing("alice") == "alice"
+
+
+def test_large_tenants_are_spread_over_their_splits(splits):
+    routes = Counter(elasticsearch.document_routing("big-tenant", f"doc-{number}") for number in range(300))
+
+    assert set(routes) == {"big-tenant", "big-tenant#1", "big-tenant#2"}
+    assert min(routes.values()) > 50
+    assert elasticsearch.user_routing("big-tenant") == "big-tenant,big-tenant#1,big-tenant#2"
+
+
+def test_tenant_alias_names_keep_mixed_case_ids_apart():
+    lower, mixed = elasticsearch.tenant_alias_name("abc"), elasticsearch.tenant_alias_name("ABC")
+
+    assert lower == elasticsearch.TENANT_ALIAS_PREFIX + "abc"
+    assert mixed.startswith(lower + "_")
+    assert mixed == mixed.lower()
+
+
+def test_tenant_alias_action(splits):
+    single = elasticsearch.tenant_alias_action("alice", "documents_v3")["add"]
+    split = elasticsearch.tenant_alias_action("big-tenant", "documents_v3")["add"]
+
+    assert single["filter"] == {"term": {"user_id": "alice"}}
+    assert (single["search_routing"], single["index_routing"]) == ("alice", "alice")
+    # Writes to a split tenant need a per-document routing, so its alias has none
+    assert "index_routing" not in split
+
+
+def test_indexing_creates_the_tenant_alias_once(monkeypatch, tmp_path, backends):
+    monkeypatch.setattr(Config, "INDEX_SPILL_PATH", str(tmp_path / "index_spill.ndjson"))
+    monkeypatch.setattr(Config, "ES_TENANT_ALIASES", True)
+    monkeypatch.setattr(elasticsearch, "_tenant_aliases", set())
+
+    bulk = indexer.BulkIndexer()
+    for document_id in ["a1", "a2"]:
+        bulk.add(elasticsearch.build_index_action(document_id, "alice", "Quarterly report", "text", "summary"))
+    bulk.stop()
+
+    alias = elasticsearch.tenant_alias_name("alice")
+    assert alias in backends["cluster"].aliases
+    results = asyncio.run(elasticsearch.search_documents("quarterly", {"user_id": "alice"}, raise_on_error=True))
+    assert sorted(hit["document_id"] for hit in results["documents"]) == ["a1", "a2"]
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from services import elasticsearch
+
+
+@pytest.fixture
+def searches(monkeypatch, indexed):
+    """Counts the search requests that reach the cluster."""
+    client = indexed["async_elasticsearch"]
+    search = client.search
+    calls = []
+
+    async def counted(**kwargs):
+        calls.append(kwargs)
+        return await search(**kwargs)
+
+    monkeypatch.setattr(client, "search", counted)
+    return calls
+
+
+def _search(query: str, filters: dict = None) -> dict:
+    return asyncio.run(elasticsearch.search_documents(query, filters, raise_on_error=True))
+
+
+def test_repeated_queries_are_served_from_the_cache(searches):
+    first = _search("quarterly", {"user_id": "alice"})
+    again = _search("  Quarterly ", {"user_id": "alice"})
+
+    assert [hit["document_id"] for hit in first["documents"]] == ["a1"]
+    assert again == first
+    assert len(searches) == 1
+
+
+def test_indexing_invalidates_only_that_users_results(searches):
+    _search("quarterly", {"user_id": "alice"})
+    _search("quarterly", {"user_id": "bob"})
+
+    elasticsearch.invalidate_search_cache("alice")
+    _search("quarterly", {"user_id": "alice"})
+    _search("quarterly", {"user_id": "bob"})
+
+    assert [call["routing"] for call in searches] == [
+        elasticsearch.user_routing("alice"), elasticsearch.user_routing("bob"), elasticsearch.user_routing("alice"),
+    ]
+
+
+def test_cluster_errors_return_empty_results(monkeypatch, backends):
+    async def unreachable(**kwargs):
+        raise ConnectionError("cluster unreachable")
+
+    monkeypatch.setattr(backends["async_elasticsearch"], "search", unreachable)
+
+    assert asyncio.run(elasticsearch.search_documents("quarterly")) == {"documents": [], "suggestions": [], "next_cursor": None}
+    with pytest.raises(ConnectionError):
+        _search("quarterly")
+
+
+def test_results_are_invalidated_once_new_documents_are_searchable(monkeypatch, tmp_path, searches, indexed):
+    from config import Config
+    from services import indexer
+
+    monkeypatch.setattr(Config, "INDEX_SPILL_PATH", str(tmp_path / "index_spill.ndjson"))
+    monkeypatch.setattr(Config, "INDEX_FLUSH_INTERVAL", 60)
+    cluster = indexed["cluster"]
+    handle, bulk_targets = cluster.handle, []
+
+    def recording(method, target, body):
+        if "_bulk" in target:
+            bulk_targets.append(target)
+        return handle(method, target, body)
+
+    monkeypatch.setattr(cluster, "handle", recording)
+    _search("quarterly", {"user_id": "alice"})
+
+    bulk = indexer.BulkIndexer()
+    bulk.add(elasticsearch.build_index_action("a3", "alice", "Quarterly plan", "text", "summary"))
+    # Queued but not yet written: the cached results are still current
+    _search("quarterly", {"user_id": "alice"})
+    assert len(searches) == 1
+
+    bulk.stop()
+    results = _search("quarterly", {"user_id": "alice"})
+
+    assert bulk_targets
+    assert all("refresh=wait_for" in target for target in bulk_targets)
+    assert sorted(hit["document_id"] for hit in results["documents"]) == ["a1", "a3"]
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from config import Config
+from services import elasticsearch, indexer
+
+
+@pytest.fixture
+def contracts(monkeypatch, tmp_path, backends):
+    """Five equally relevant documents of one user."""
+    monkeypatch.setattr(Config, "INDEX_SPILL_PATH", str(tmp_path / "index_spill.ndjson"))
+    bulk = indexer.BulkIndexer()
+    for number in range(5):
+        text = f"Supply contract number {number}. " + "Terms and conditions apply. " * 40
+        bulk.add(elasticsearch.build_index_action(f"c{number}", "alice", f"Contract {number}", text, "A supply contract"))
+    bulk.stop()
+    return backends
+
+
+def _search(query: str, size: int, cursor: str = None) -> dict:
+    return asyncio.run(elasticsearch.search_documents(query, {"user_id": "alice"}, size=size, cursor=cursor, raise_on_error=True))
+
+
+def test_cursor_pages_cover_every_hit_once(contracts):
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = _search("contract", size=2, cursor=cursor)
+        seen.extend(hit["document_id"] for hit in page["documents"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(seen) == ["c0", "c1", "c2", "c3", "c4"]
+    assert pages == 3
+    # The point in time is closed with the last page
+    assert contracts["cluster"].pits == {}
+
+
+def test_hits_carry_highlights_instead_of_the_full_text(contracts):
+    hit = _search("contract", size=1)["documents"][0]
+
+    assert set(hit) == set(elasticsearch.RESULT_FIELDS) | {"score", "highlights"}
+    assert any("contract" in fragment.lower() for fragment in hit["highlights"]["content"])
+    assert all(len(fragment) < 400 for fragment in hit["highlights"]["content"])
+
+
+def test_malformed_cursors_are_rejected(contracts):
+    with pytest.raises(ValueError):
+        _search("contract", size=2, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        elasticsearch.decode_cursor(elasticsearch.encode_cursor({"after": "c1"}))
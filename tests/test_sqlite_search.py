@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from config import Config
+from services.search_backend import FallbackBackend, SearchBackend, SQLiteBackend
+from services.sqlite_search import SQLiteSearchIndex, match_expression
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SQLiteSearchIndex(str(tmp_path / "search.db"))
+    for user_id, document_id, title in [
+        ("alice", "a1", "Quarterly report"),
+        ("alice", "a2", "Quality handbook"),
+        ("bob", "b1", "Quarterly forecast"),
+    ]:
+        index.index_document(document_id, user_id, title, f"{title} text about revenue", f"{title} summary")
+    return index
+
+
+def _ids(results: dict) -> list:
+    return sorted(hit["document_id"] for hit in results["documents"])
+
+
+def test_match_expression_quotes_user_input():
+    assert match_expression("Quart NOT report") == '"quart"* "not"* "report"*'
+    assert match_expression("report", "title") == '{title}: ("report"*)'
+    assert match_expression("***") is None
+
+
+def test_search_matches_word_prefixes_within_a_user(index):
+    assert _ids(index.search("quart", {"user_id": "alice"})) == ["a1"]
+    assert _ids(index.search("quart")) == ["a1", "b1"]
+    # Quotes and parentheses in the query are not FTS5 syntax errors
+    assert _ids(index.search('"quarterly (', {"user_id": "alice"})) == ["a1"]
+
+
+def test_reindexing_replaces_the_document(index):
+    index.index_document("a1", "alice", "Annual report", "new text", "new summary")
+
+    assert _ids(index.search("quarterly", {"user_id": "alice"})) == []
+    assert index.get("alice", "a1")["title"] == "Annual report"
+
+
+def test_cursor_pages(index, monkeypatch):
+    monkeypatch.setattr(Config, "SEARCH_RELATIVE_SCORE", 0)
+    first = index.search("revenue", size=2)
+    second = index.search("revenue", size=2, cursor=first["next_cursor"])
+
+    assert sorted(_ids(first) + _ids(second)) == ["a1", "a2", "b1"]
+    assert second["next_cursor"] is None
+    with pytest.raises(ValueError):
+        index.search("revenue", cursor="not-a-cursor")
+
+
+def test_suggestions(index):
+    assert sorted(suggestion["text"] for suggestion in index.suggest("qua", user_id="alice")) == ["Quality handbook", "Quarterly report"]
+    assert [suggestion["text"] for suggestion in index.suggest("forec", user_id="alice", mode="prefix")] == []
+    assert [suggestion["text"] for suggestion in index.suggest("handb", user_id="alice", mode="prefix")] == ["Quality handbook"]
+    with pytest.raises(ValueError):
+        index.suggest("qua", user_id=None)
+
+
+class FailingBackend(SearchBackend):
+    name = "failing"
+
+    def __init__(self):
+        self.calls = 0
+
+    def index_document(self, document_id, user_id, title, extracted_text, summary):
+        pass
+
+    async def search(self, query, filters=None, size=None, cursor=None):
+        self.calls += 1
+        raise ConnectionError("cluster unreachable")
+
+    async def suggest(self, prefix, user_id, mode="completion", size=5):
+        raise ConnectionError("cluster unreachable")
+
+    async def get_document(self, user_id, document_id):
+        raise ConnectionError("cluster unreachable")
+
+
+def test_incomplete_backends_cannot_be_built():
+    class SearchOnly(SearchBackend):
+        async def search(self, query, filters=None, size=None, cursor=None):
+            return {"documents": [], "suggestions": [], "next_cursor": None}
+
+    with pytest.raises(TypeError):
+        SearchOnly()
+
+
+def test_fallback_serves_reads_and_skips_the_primary_while_it_is_down(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SEARCH_FALLBACK_COOLDOWN", 60)
+    primary, secondary = FailingBackend(), SQLiteBackend(str(tmp_path / "search.db"))
+    secondary.index_document("a1", "alice", "Quarterly report", "text", "summary")
+    backend = FallbackBackend(primary, secondary)
+
+    for _ in range(3):
+        results = asyncio.run(backend.search("quarterly", {"user_id": "alice"}))
+        assert _ids(results) == ["a1"]
+
+    assert primary.calls == 1
+    assert backend.stats == {"primary_reads": 0, "fallback_reads": 3, "primary_failures": 1}
@@ -0,0 +1,68 @@
+import json
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from config import Config
+from routes import processing
+
+
+def _events(response) -> list:
+    events = []
+    for block in response.text.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(processing.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_stream_forwards_status_summary_and_done_events(monkeypatch, client):
+    def run(job, user_id, document_id):
+        job.emit({"type": "status", "status": "summarizing"})
+        for text in ["A short", " summary"]:
+            job.emit({"type": "summary", "text": text})
+        job.emit({"type": "done", "summary": "A short summary"})
+        return {"summary": "A short summary"}
+
+    monkeypatch.setattr(processing, "run_pipeline", run)
+
+    response = client.get("/api/process/stream", params={"user_id": "user-1", "document_id": "doc-sse-1"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response)
+    assert [name for name, _ in events] == ["queued", "status", "summary", "summary", "done"]
+    assert "".join(data["text"] for name, data in events if name == "summary") == "A short summary"
+
+
+def test_stream_ends_with_an_error_event(monkeypatch, client):
+    def run(job, user_id, document_id):
+        job.emit({"type": "error", "error": "Unsupported file type: text/plain"})
+        raise ValueError("Unsupported file type: text/plain")
+
+    monkeypatch.setattr(processing, "run_pipeline", run)
+
+    events = _events(client.get("/api/process/stream", params={"user_id": "user-1", "document_id": "doc-sse-2"}))
+
+    assert events[-1] == ("error", {"type": "error", "error": "Unsupported file type: text/plain"})
+
+
+def test_keepalives_until_a_silent_job_finishes(monkeypatch, client):
+    monkeypatch.setattr(Config, "SSE_KEEPALIVE_SECONDS", 0.05)
+
+    def run(job, user_id, document_id):
+        time.sleep(0.2)
+        raise RuntimeError("worker crashed")
+
+    monkeypatch.setattr(processing, "run_pipeline", run)
+
+    response = client.get("/api/process/stream", params={"user_id": "user-1", "document_id": "doc-sse-3"})
+
+    assert ": keepalive" in response.text
+    assert _events(response)[-1] == ("error", {"type": "error", "error": "worker crashed"})
@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+from services import clients
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SDKS = ("elasticsearch", "firebase_admin", "google.cloud.bigquery", "google.cloud.storage",
+        "google.cloud.vision", "google.generativeai")
+
+
+def test_importing_the_app_builds_no_clients():
+    # A fresh interpreter, since other tests have already imported the SDKs
+    script = (
+        "import json, sys, main\n"
+        "from services import clients\n"
+        "from utils import profiling\n"
+        f"print(json.dumps({{'clients': list(clients._clients), 'sdks': [m for m in {SDKS!r} if m in sys.modules],"
+        " 'report': profiling.report()}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=dict(os.environ),
+                            capture_output=True, text=True, check=True).stdout
+    loaded = json.loads(output.strip().splitlines()[-1])
+
+    assert loaded["clients"] == []
+    assert loaded["sdks"] == []
+    assert "imports" in loaded["report"]["phases_ms"]
+    assert "services.clients" in loaded["report"]["imports_ms"]
+
+
+def test_warmup_skips_unknown_and_failing_backends(monkeypatch):
+    built = []
+
+    def unavailable():
+        raise ConnectionError("no credentials")
+
+    monkeypatch.setitem(clients._WARMUP, "storage", lambda: built.append("storage"))
+    monkeypatch.setitem(clients._WARMUP, "vision", unavailable)
+
+    clients.startup(["storage", "vision", "nosuch"])
+
+    assert built == ["storage"]
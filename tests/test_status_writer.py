@@ -0,0 +1,101 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from google.rpc import code_pb2
+from benchmarks.fakes import _FakeReference
+from services import firestore
+
+
+class ScriptedBulkWriter:
+    """BulkWriter stand-in: each document path fails with the scripted codes, in order, then succeeds."""
+
+    def __init__(self, db):
+        self.db = db
+        self._callback = None
+        self._writes = []
+
+    def on_write_error(self, callback):
+        self._callback = callback
+
+    def update(self, reference, data: dict):
+        self._writes.append((reference, data))
+
+    def close(self):
+        for reference, data in self._writes:
+            codes = list(self.db.failures.get(reference.path, []))
+            attempts = 0
+            while True:
+                attempts += 1
+                self.db.attempts[reference.path] = attempts
+                if not codes:
+                    self.db.documents.setdefault(reference.path, {}).update(data)
+                    break
+                failure = SimpleNamespace(
+                    code=codes.pop(0), message="write failed", attempts=attempts,
+                    operation=SimpleNamespace(reference=reference),
+                )
+                if not self._callback(failure, self):
+                    break
+
+
+class ScriptedFirestore:
+    def __init__(self, failures: dict):
+        self.failures = failures
+        self.attempts = {}
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str):
+        return _FakeReference(name)
+
+    def bulk_writer(self, options=None):
+        return ScriptedBulkWriter(self)
+
+
+@pytest.fixture
+def write(monkeypatch):
+    def run(failures: dict, updates: list):
+        db = ScriptedFirestore(failures)
+        monkeypatch.setattr(firestore, "get_db", lambda: db)
+        writer = firestore.StatusWriter()
+        for user_id, document_id, data in updates:
+            writer.update(user_id, document_id, data)
+        writer.stop()
+        return db, writer
+    return run
+
+
+def test_updates_to_one_document_are_coalesced(write):
+    db, writer = write({}, [
+        ("user-1", "doc-1", {"status": "extracting"}),
+        ("user-1", "doc-1", {"status": "summarizing"}),
+        ("user-1", "doc-1", {"summary": "done", "status": "processed"}),
+    ])
+
+    assert db.documents == {"users/user-1/documents/doc-1": {"status": "processed", "summary": "done"}}
+    assert writer.stats["writes"] == 1
+
+
+def test_transient_errors_are_retried(write):
+    path = "users/user-1/documents/doc-1"
+    db, writer = write(
+        {path: [code_pb2.UNAVAILABLE, code_pb2.RESOURCE_EXHAUSTED]},
+        [("user-1", "doc-1", {"status": "processed"})],
+    )
+
+    assert db.attempts[path] == 3
+    assert db.documents[path] == {"status": "processed"}
+    assert writer.stats["failed"] == 0
+
+
+def test_permanent_errors_are_dropped_without_retrying(write):
+    missing, valid = "users/user-1/documents/deleted", "users/user-1/documents/doc-1"
+    db, writer = write(
+        {missing: [code_pb2.NOT_FOUND] * 10},
+        [("user-1", "deleted", {"status": "processed"}), ("user-1", "doc-1", {"status": "processed"})],
+    )
+
+    assert db.attempts[missing] == 1
+    assert missing not in db.documents
+    assert db.documents[valid] == {"status": "processed"}
+    assert (writer.stats["writes"], writer.stats["failed"]) == (1, 1)
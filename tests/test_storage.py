@@ -0,0 +1,69 @@
+import pytest
+from services.gcp_vision import resolve_content_type
+from services.storage import StorageSession, StoredObject
+
+
+class CountingBucket:
+    """Wraps the fake bucket, counting metadata calls and ranged reads."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.name = bucket.name
+        self.get_blob_calls = 0
+        self.reads = []
+
+    def get_blob(self, path: str):
+        self.get_blob_calls += 1
+        blob = self.bucket.get_blob(path)
+        if blob is not None:
+            download = blob.download_as_bytes
+
+            def counted(start=None, end=None):
+                self.reads.append((start, end))
+                return download(start=start, end=end)
+            blob.download_as_bytes = counted
+        return blob
+
+
+@pytest.fixture
+def bucket(backends):
+    backends["bucket"].put("documents/user-1/report", b"%PDF-1.4 synthetic report body", None)
+    backends["bucket"].put("documents/user-1/notes.txt", b"plain notes", "text/plain")
+    return CountingBucket(backends["bucket"])
+
+
+def test_session_fetches_metadata_once_per_path(bucket):
+    session = StorageSession(bucket)
+
+    assert session.get("documents/user-1/notes.txt").exists
+    assert session.get("documents/user-1/notes.txt").size == 11
+    assert session.get("documents/user-1/notes.txt").read_text() == "plain notes"
+    assert bucket.get_blob_calls == 1
+
+
+def test_missing_object_raises_file_not_found(bucket):
+    stored = StoredObject(bucket, "documents/user-1/missing")
+
+    assert not stored.exists
+    with pytest.raises(FileNotFoundError):
+        stored.read_bytes()
+
+
+def test_listed_blob_skips_the_metadata_call(bucket):
+    blob = next(bucket.bucket.list_blobs(prefix="documents/user-1/notes"))
+    stored = StoredObject(bucket, blob.name, blob)
+
+    assert stored.read_text() == "plain notes"
+    assert bucket.get_blob_calls == 0
+
+
+def test_content_type_is_sniffed_with_one_ranged_read(bucket):
+    stored = StoredObject(bucket, "documents/user-1/report")
+
+    assert resolve_content_type(stored) == "application/pdf"
+    assert bucket.reads == [(0, 15)]
+
+
+def test_content_type_prefers_metadata(bucket):
+    assert resolve_content_type(StoredObject(bucket, "documents/user-1/notes.txt")) == "text/plain"
+    assert bucket.reads == []
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from services import elasticsearch
+
+
+def test_search_query_only_asks_for_completions_with_a_user():
+    assert "suggest" not in elasticsearch.build_search_query("quarterly")
+
+    completion = elasticsearch.build_search_query("quarterly", {"user_id": "alice"})["suggest"]["doc-suggest"]["completion"]
+    assert completion["contexts"] == {"user_id": ["alice"]}
+
+
+def test_completion_suggestions_are_scoped_to_the_user(indexed):
+    titles = asyncio.run(elasticsearch.suggest_titles("qua", user_id="alice", raise_on_error=True))
+
+    assert sorted(suggestion["text"] for suggestion in titles) == ["Quality handbook", "Quarterly report"]
+
+
+def test_prefix_suggestions_are_scoped_to_the_user(indexed):
+    titles = asyncio.run(elasticsearch.suggest_titles("quarterly", "alice", mode="prefix", raise_on_error=True))
+
+    assert [suggestion["text"] for suggestion in titles] == ["Quarterly report"]
+
+
+def test_suggest_endpoint_requires_a_user(indexed):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from routes import search
+
+    app = FastAPI()
+    app.include_router(search.router, prefix="/api")
+    client = TestClient(app)
+
+    assert client.get("/api/search/suggest", params={"prefix": "qua"}).status_code == 422
+    with pytest.raises(ValueError):
+        asyncio.run(elasticsearch.suggest_titles("qua", None))
+
+
+def test_search_without_a_user_does_not_fail(indexed):
+    results = asyncio.run(elasticsearch.search_documents("quarterly", raise_on_error=True))
+
+    assert {hit["document_id"] for hit in results["documents"]} == {"a1", "b1"}
+    assert results["suggestions"] == []
+
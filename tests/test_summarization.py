@@ -0,0 +1,82 @@
+import threading
+import pytest
+from config import Config
+from services import gcp_summarization
+from services.gcp_summarization import PAGE_BREAK, SUMMARY_PROMPTS, split_text
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Replaces Gemini with a stub that records every prompt and answers with its first words."""
+    sent = []
+    lock = threading.Lock()
+
+    def generate(prompt, on_token=None):
+        with lock:
+            sent.append(prompt)
+        summary = " ".join(prompt.split("\n\n", 1)[1].split()[:3])
+        if on_token:
+            on_token(summary)
+        return summary
+
+    monkeypatch.setattr(gcp_summarization, "_generate", generate)
+    return sent
+
+
+def _page(word: str, words: int = 100) -> str:
+    return " ".join([word] * words)
+
+
+def test_split_text_keeps_pages_together():
+    pages = [_page("alpha"), _page("beta"), _page("gamma")]
+
+    # Room for one page per chunk, but not two
+    chunks = split_text(PAGE_BREAK.join(pages), max_tokens=200)
+
+    assert chunks == pages
+
+
+def test_split_text_cuts_oversized_paragraphs_at_whitespace():
+    chunks = split_text(_page("word", 500), max_tokens=100)
+
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert " ".join(chunks).split() == ["word"] * 500
+
+
+def test_reduce_summaries_uses_combine_prompt_for_intermediate_levels(monkeypatch, prompts):
+    monkeypatch.setattr(Config, "SUMMARY_CHUNK_TOKENS", 50)
+    monkeypatch.setattr(Config, "SUMMARY_REDUCE_FANIN", 2)
+    partials = [_page(f"part{index}", 30) for index in range(6)]
+
+    summary = gcp_summarization.reduce_summaries(partials, SUMMARY_PROMPTS["short"])
+
+    *intermediate, final = prompts
+    assert intermediate
+    assert all(prompt.startswith(SUMMARY_PROMPTS["combine"]) for prompt in intermediate)
+    assert final.startswith(SUMMARY_PROMPTS["short"])
+    assert summary
+
+
+def test_summarize_stream_chunks_at_page_boundaries(monkeypatch, backends, prompts):
+    monkeypatch.setattr(Config, "SUMMARY_CHUNK_TOKENS", 200)
+    pages = [_page(f"page{index}") for index in range(5)]
+
+    summary = gcp_summarization.summarize_stream(iter(pages))
+
+    chunk_prompts = [prompt for prompt in prompts if prompt.startswith(SUMMARY_PROMPTS["chunked"])]
+    assert sorted(prompt.split("\n\n", 1)[1] for prompt in chunk_prompts) == pages
+    assert prompts[-1].startswith(SUMMARY_PROMPTS["basic"])
+    assert not summary.startswith("Error:")
+
+
+def test_summarize_stream_reports_failures_as_error_text(monkeypatch, backends):
+    monkeypatch.setattr(Config, "SUMMARY_CHUNK_TOKENS", 200)
+
+    def fail(prompt, on_token=None):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(gcp_summarization, "_generate", fail)
+
+    summary = gcp_summarization.summarize_stream(iter([_page(f"page{index}") for index in range(5)]))
+
+    assert summary == "Error: quota exceeded"
@@ -0,0 +1,66 @@
+import json
+import pytest
+from config import Config
+from services import gcp_vision
+
+FOLDER = "processed_results/user-1/doc-1/"
+
+
+def _write_shard(bucket, first: int, last: int):
+    responses = [{"fullTextAnnotation": {"text": f"page {page}"}} for page in range(first, last + 1)]
+    responses.insert(1, {"context": {"pageNumber": 0}})  # Pages without text are skipped
+    bucket.put(f"{FOLDER}output-{first}-to-{last}.json", json.dumps({"responses": responses}).encode(), "application/json")
+
+
+class Operation:
+    def __init__(self, finished: bool = True, error: Exception = None):
+        self.finished = finished
+        self.error = error
+
+    def done(self) -> bool:
+        return self.finished
+
+    def result(self, timeout: float = None):
+        if self.error is not None:
+            raise self.error
+
+
+def test_shard_range():
+    assert gcp_vision._shard_range(f"{FOLDER}output-11-to-20.json") == (11, 20)
+    assert gcp_vision._shard_range(f"{FOLDER}notes.json") is None
+
+
+def test_pages_are_yielded_in_page_order(backends):
+    # Listed by name, output-11-to-20 sorts before output-2-to-10
+    for first, last in [(11, 20), (1, 1), (2, 10)]:
+        _write_shard(backends["bucket"], first, last)
+
+    pages = list(gcp_vision.iter_extracted_pages(FOLDER))
+
+    assert pages == [f"page {page}" for page in range(1, 21)]
+    assert gcp_vision.get_extracted_text_from_gcs(FOLDER).split(gcp_vision.PAGE_BREAK)[:2] == ["page 1", "page 2"]
+
+
+def test_missing_output_raises(backends):
+    with pytest.raises(FileNotFoundError):
+        list(gcp_vision.iter_extracted_pages(FOLDER))
+
+
+def test_operation_errors_surface_before_reading_output(backends):
+    _write_shard(backends["bucket"], 1, 2)
+
+    with pytest.raises(RuntimeError, match="quota"):
+        list(gcp_vision.iter_extracted_pages(FOLDER, operation=Operation(error=RuntimeError("quota exceeded"))))
+
+
+def test_pages_are_yielded_while_the_operation_runs(monkeypatch, backends):
+    monkeypatch.setattr(Config, "VISION_POLL_INTERVAL", 0.01)
+    operation = Operation(finished=False)
+    _write_shard(backends["bucket"], 1, 1)
+
+    pages = gcp_vision.iter_extracted_pages(FOLDER, operation=operation, timeout=5)
+    assert next(pages) == "page 1"
+
+    _write_shard(backends["bucket"], 2, 3)
+    operation.finished = True
+    assert list(pages) == ["page 2", "page 3"]
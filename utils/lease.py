@@ -0,0 +1,95 @@
+# lease
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SQLiteLease:
+    """
+    Expiring named leases in a SQLite file, so replicas sharing the file (or processes
+    on one host) do not run the same work twice. A holder that dies stops renewing and
+    its lease expires after ttl seconds.
+    """
+
+    def __init__(self, path: str, ttl: float = 120, poll_interval: float = 2):
+        self.path = path
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def acquire(self, key: str, owner: str) -> bool:
+        """Takes the lease if it is free or expired. Returns False while someone else holds it."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + self.ttl),
+            )
+            row = conn.execute("SELECT owner FROM leases WHERE key = ?", (key,)).fetchone()
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return row is not None and row[0] == owner
+
+    def renew(self, key: str, owner: str) -> bool:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ?",
+                (time.time() + self.ttl, key, owner),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self, key: str, owner: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+        finally:
+            conn.close()
+
+    @contextmanager
+    def hold(self, key: str, owner: str = None):
+        """
+        Waits until the lease is acquired, keeps it renewed while the block runs and
+        releases it afterwards. Yields True if another holder had to finish first.
+        """
+        owner = owner or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        waited = False
+        while not self.acquire(key, owner):
+            waited = True
+            time.sleep(self.poll_interval)
+
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.ttl / 3):
+                if not self.renew(key, owner):
+                    logger.warning("Lost lease", extra={"lease": key})
+                    return
+
+        thread = threading.Thread(target=heartbeat, name="lease-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield waited
+        finally:
+            stop.set()
+            thread.join()
+            self.release(key, owner)
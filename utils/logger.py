@@ -0,0 +1,112 @@
+# logger
+#
+# Structured logging that never blocks the caller. Loggers from get_logger() only put
+# the record on a queue (logging.handlers.QueueHandler); one listener thread formats it
+# (one JSON object per line with LOG_FORMAT=json) and writes it to stderr. Fields passed
+# with extra={...} become keys of the JSON object.
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from config import Config
+
+ROOT_LOGGER = "documind"
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_handler = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        return f"{line} {fields}" if fields else line
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now, while the arguments are still current;
+        # unlike the default, keep them apart so the listener can format them as fields
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup():
+    """Attaches the queue handler and starts the listener thread. Safe to call repeatedly."""
+    global _listener, _handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if Config.LOG_FORMAT == "json" else TextFormatter())
+
+        records = queue.SimpleQueue()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(Config.LOG_LEVEL)
+        if _handler is not None:
+            root.removeHandler(_handler)
+        _handler = _QueueHandler(records)
+        root.addHandler(_handler)
+        root.propagate = False
+
+        _listener = QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """
+    Writes every queued record and stops the listener thread. Records logged afterwards
+    (late in interpreter shutdown) are written synchronously.
+    """
+    global _listener, _handler
+    with _setup_lock:
+        listener, _listener = _listener, None
+        if listener is None:
+            return
+        listener.stop()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.removeHandler(_handler)
+        _handler = listener.handlers[0]
+        root.addHandler(_handler)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module (pass __name__), under the queued "documind" logger."""
+    setup()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
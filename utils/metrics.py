@@ -0,0 +1,255 @@
+# metrics
+#
+# Process-local Prometheus metrics: counters, gauges and histograms with labels, and
+# render() for the text exposition format served at GET /metrics. Each uvicorn worker
+# process keeps its own series, so scrape every worker (or aggregate by instance).
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds: from ES and GCS metadata calls (ms) to Vision operations on long PDFs (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> list:
+        """(suffix, label values, extra labels, value) for every series."""
+        with self._lock:
+            return [("", key, (), value) for key, value in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Counts the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list:
+        samples = []
+        with self._lock:
+            for key, series in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    cumulative += count
+                    samples.append(("_bucket", key, (("le", _number(bound)),), cumulative))
+                samples.append(("_sum", key, (), series["sum"]))
+                samples.append(("_count", key, (), series["count"]))
+        return samples
+
+
+def _register(cls, name: str, documentation: str, labelnames: tuple, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, documentation, labelnames, **kwargs)
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format (version 0.0.4)."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+EXTERNAL_CALL_SECONDS = histogram(
+    "documind_external_call_seconds", "Duration of calls to GCS, Vision, Gemini, Elasticsearch and other backends.",
+    ("backend", "operation", "outcome"),
+)
+EXTERNAL_CALLS_IN_FLIGHT = gauge(
+    "documind_external_calls_in_flight", "Calls to external backends currently waiting for a response.",
+    ("backend", "operation"),
+)
+
+
+@contextmanager
+def span(backend: str, operation: str, **fields):
+    """
+    Times one external call: records its duration by outcome ("ok" or "error"), counts
+    it as in flight while it runs and logs it at DEBUG with the given fields.
+    """
+    EXTERNAL_CALLS_IN_FLIGHT.inc(backend=backend, operation=operation)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        EXTERNAL_CALLS_IN_FLIGHT.dec(backend=backend, operation=operation)
+        record(backend, operation, elapsed, outcome, **fields)
+
+
+def record(backend: str, operation: str, seconds: float, outcome: str = "ok", **fields):
+    """Records an external call timed by the caller (e.g. a long-running operation)."""
+    EXTERNAL_CALL_SECONDS.observe(seconds, backend=backend, operation=operation, outcome=outcome)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("external call", extra={
+            "backend": backend, "operation": operation, "outcome": outcome,
+            "duration_ms": round(seconds * 1000, 2), **fields,
+        })
+
+
+HTTP_REQUEST_SECONDS = histogram(
+    "documind_http_request_seconds", "Time from receiving an HTTP request to sending the last byte of the response.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = gauge("documind_http_requests_in_flight", "HTTP requests being handled.", ("method",))
+
+
+def _route_template(scope) -> str:
+    """
+    The matched route's path template, e.g. /api/process/{job_id}. Newer FastAPI
+    versions keep the route of an included router without its prefix and put the
+    prefixed one in the effective route context.
+    """
+    route = (scope.get("fastapi") or {}).get("effective_route_context") or scope.get("route")
+    if route is None:
+        # 404s keep one series whatever was requested
+        return "unmatched"
+    return route.path_format
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template (e.g.
+    /api/process/{job_id}, so ids do not create new series), method and status.
+    Streaming responses are timed until the stream ends.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec(method=method)
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=method, route=_route_template(scope), status=str(status))
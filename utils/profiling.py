@@ -0,0 +1,80 @@
+# profiling
+
+import importlib.abc
+import sys
+import time
+
+# First-party top-level modules whose import cost (including what they pull in) is recorded
+_TRACKED = {"config", "database", "routes", "schemas", "services", "utils"}
+
+_process_start = time.perf_counter()
+_imports = {}
+_phases = {}
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, name: str):
+        self._loader = loader
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            _imports[self._name] = round((time.perf_counter() - start) * 1000, 2)
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        if fullname.split(".")[0] not in _TRACKED:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, fullname)
+                return spec
+        return None
+
+
+_timer = _ImportTimer()
+
+
+def install():
+    """Starts timing first-party imports. Call before importing routes/services."""
+    if _timer not in sys.meta_path:
+        sys.meta_path.insert(0, _timer)
+
+
+def uninstall():
+    if _timer in sys.meta_path:
+        sys.meta_path.remove(_timer)
+
+
+def mark(phase: str):
+    """Records milliseconds since profiling started for a named startup phase."""
+    _phases[phase] = round((time.perf_counter() - _process_start) * 1000, 2)
+
+
+def report() -> dict:
+    """
+    Startup cost report: inclusive import time per first-party module,
+    startup phase timestamps and per-backend client init time.
+    """
+    from services.clients import get_stats
+
+    backends = {name: stats["init_ms"] for name, stats in get_stats()["clients"].items()}
+    return {
+        "phases_ms": dict(_phases),
+        "imports_ms": dict(sorted(_imports.items(), key=lambda item: item[1], reverse=True)),
+        "backend_init_ms": backends,
+    }
@@ -0,0 +1,32 @@
+# ratelimit
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: acquire() blocks until a token is available.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int = None):
+        self.rate = rate_per_second
+        self.capacity = burst or max(1, int(rate_per_second))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)